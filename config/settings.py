@@ -79,8 +79,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.QueryCountMiddleware',  # En-têtes X-DB-Query-Count (si QUERY_COUNT_HEADERS=True)
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',  # WhiteNoise pour les statiques
+    'core.middleware.AsyncWhiteNoiseMiddleware',  # WhiteNoise pour les statiques (compatible ASGI)
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.locale.LocaleMiddleware',  # Pour l'internationalisation
     'corsheaders.middleware.CorsMiddleware',
@@ -139,6 +140,22 @@ else:
     }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/ref/settings/#caches
+
+# Cache partagé entre les processus (workers gunicorn/uvicorn) : jetons de kiosque à usage unique,
+# anti-rebond des scans, générations de l'index des badges et du calendrier, statistiques en cache.
+# Sans REDIS_URL, chaque processus a son propre cache (LocMemCache) : à réserver à un seul worker
+# (voir la vérification core.W001, python manage.py check --deploy)
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -298,4 +315,46 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
-}
\ No newline at end of file
+}
+
+# Kiosque : durée de vie maximale (en secondes) de l'index en mémoire des badges NFC/QR ; les
+# invalidations passent par une génération dans le cache Django (à partager entre workers, ex: Redis)
+CREDENTIAL_INDEX_TTL = int(os.getenv('CREDENTIAL_INDEX_TTL', 300))
+# Kiosque : nombre maximal de scans par envoi groupé et avance tolérée de l'horloge d'un kiosque (secondes)
+KIOSK_BATCH_MAX_SCANS = int(os.getenv('KIOSK_BATCH_MAX_SCANS', 500))
+KIOSK_MAX_CLOCK_SKEW = int(os.getenv('KIOSK_MAX_CLOCK_SKEW', 300))
+# Kiosque : ancienneté maximale (en secondes) d'un scan envoyé en différé ; les scans plus anciens sont refusés
+KIOSK_MAX_BACKDATE = int(os.getenv('KIOSK_MAX_BACKDATE', 24 * 3600))
+# Kiosque : secret des clés de kiosque (commande kiosk_key) ; le changer révoque toutes les clés (défaut: SECRET_KEY)
+KIOSK_KEY_SECRET = os.getenv('KIOSK_KEY_SECRET') or None
+# Kiosque : durée de validité (en secondes) du jeton signé délivré après un scan, valable pour un seul pointage
+KIOSK_TOKEN_MAX_AGE = int(os.getenv('KIOSK_TOKEN_MAX_AGE', 10))
+# Kiosque : servir les API de scan avec les vues asynchrones (déploiement ASGI, voir entrypoint.sh)
+KIOSK_ASYNC_VIEWS = os.getenv('KIOSK_ASYNC_VIEWS', 'False') == 'True'
+# Ajoute aux réponses le nombre de requêtes SQL exécutées (utilisé par la commande kiosk_loadtest)
+QUERY_COUNT_HEADERS = os.getenv('QUERY_COUNT_HEADERS', 'False') == 'True'
+# Kiosque : fenêtre anti-rebond (en secondes) pendant laquelle un même badge scanné sur le même kiosque
+# reçoit la réponse précédente, servie depuis le cache (0 pour désactiver)
+KIOSK_SCAN_DEBOUNCE_WINDOW = int(os.getenv('KIOSK_SCAN_DEBOUNCE_WINDOW', 3))
+# Kiosque : mode write-behind, les pointages sont confirmés dès leur ajout à une file locale (fichier SQLite)
+# puis transférés par lots dans la base principale par le processus flush_punch_queue
+PUNCH_WRITE_BEHIND = os.getenv('PUNCH_WRITE_BEHIND', 'False') == 'True'
+PUNCH_QUEUE_PATH = os.getenv('PUNCH_QUEUE_PATH', str(BASE_DIR / 'punch_queue.sqlite3'))
+# Tableau de bord employé : durée de vie (en secondes) des statistiques en cache, supprimées à chaque
+# pointage ou changement de demande de congé (0 pour désactiver le cache)
+STATS_CACHE_TTL = int(os.getenv('STATS_CACHE_TTL', 3600))
+# Tableau de bord employé : calcul en parallèle (threads) des sections de /api/dashboard/
+DASHBOARD_PARALLEL_SECTIONS = os.getenv('DASHBOARD_PARALLEL_SECTIONS', 'True') == 'True'
+# Nombre de threads du pool partagé des sections du tableau de bord (0 : calcul séquentiel)
+DASHBOARD_MAX_WORKERS = int(os.getenv('DASHBOARD_MAX_WORKERS', 4))
+# Calendrier des jours ouvrés : durée de vie maximale (en secondes) des jours fériés gardés en mémoire
+# par chaque processus (le cache est aussi vidé à chaque modification d'un jour férié)
+WORK_CALENDAR_TTL = int(os.getenv('WORK_CALENDAR_TTL', 3600))
+# Congés : quota annuel (en jours) des employés dont le rôle n'a pas de quota propre
+LEAVE_ANNUAL_QUOTA = int(os.getenv('LEAVE_ANNUAL_QUOTA', 25))
+# QR codes des badges : nombre d'images gardées en mémoire par processus (cache LRU) et durée de
+# conservation (en secondes) dans le cache Django, utile avec un cache partagé (0 pour désactiver)
+QR_RENDER_CACHE_SIZE = int(os.getenv('QR_RENDER_CACHE_SIZE', 512))
+QR_RENDER_CACHE_TIMEOUT = int(os.getenv('QR_RENDER_CACHE_TIMEOUT', 0))
+# Badges : nombre de processus utilisés pour rendre les planches de badges imprimables
+BADGE_SHEET_WORKERS = int(os.getenv('BADGE_SHEET_WORKERS', 4))
@@ -10,19 +10,26 @@ from django.contrib import admin
 admin.site.site_header = "buskoguard Système de Gestion de Présence"
 admin.site.site_title = "Administration"
 admin.site.index_title = "Tableau de Bord"
+from django.conf import settings
+from django.contrib import messages
 from django.contrib.auth.admin import UserAdmin
 from django.utils.html import format_html
 from django.urls import reverse
+from django.http import HttpResponse
 from django.utils import timezone
+from django.db import transaction
 from django.db.models import Count
 import uuid
-import qrcode
-from io import BytesIO
 from django.core.files.base import ContentFile
-import base64
 
 # Importation des modèles
-from .models import Department, Role, User, Employee, Schedule, AttendanceRecord, LeaveRequest
+from .models import Department, Role, User, Employee, Schedule, AttendanceRecord, PresenceState, AttendanceDaySummary, LeaveRequest, LeaveBalance, Holiday
+from .utils import badge_sheets
+from .utils import data_version
+from .utils import generate_qr_code
+from .utils import leave_balance
+from .utils import qr_badge
+from .utils import stats_cache
 
 # --- Section 1: Inlines pour afficher des données liées ---
 
@@ -84,7 +91,7 @@ class DepartmentAdmin(admin.ModelAdmin):
 @admin.register(Role)
 class RoleAdmin(admin.ModelAdmin):
     """Configuration de l'interface d'administration pour les rôles."""
-    list_display = ('name', 'description', 'employee_count')
+    list_display = ('name', 'description', 'annual_leave_quota', 'employee_count')
     search_fields = ('name', 'description')
     
     def employee_count(self, obj):
@@ -130,7 +137,7 @@ class EmployeeAdmin(admin.ModelAdmin):
     list_display = ('employee_id', 'get_full_name', 'department', 'role', 'get_email', 'get_phone', 'has_nfc', 'has_qrcode')
     list_filter = ('department', 'role', 'user__is_active')
     search_fields = ('employee_id', 'user__username', 'user__first_name', 'user__last_name', 'user__email', 'nfc_id')
-    readonly_fields = ('nfc_id', 'qr_code', 'qr_code_display')
+    readonly_fields = ('nfc_id', 'qr_code', 'qr_code_badge', 'qr_code_display')
     inlines = [ScheduleInline, LeaveRequestInline, AttendanceRecordInline]
     
     fieldsets = (
@@ -138,7 +145,7 @@ class EmployeeAdmin(admin.ModelAdmin):
             'fields': ('user', 'employee_id', 'department', 'role')
         }),
         ('Identification (générée automatiquement)', {
-            'fields': ('nfc_id', 'qr_code', 'qr_code_display')
+            'fields': ('nfc_id', 'qr_code', 'qr_code_badge', 'qr_code_display')
         }),
     )
     
@@ -152,7 +159,15 @@ class EmployeeAdmin(admin.ModelAdmin):
             obj.nfc_id = f"NFC-{uuid.uuid4().hex[:12].upper()}"
             
             # Génération d'un QR code unique
-            obj.qr_code = f"EMP-{obj.employee_id}-{uuid.uuid4().hex[:8].upper()}"
+            obj.qr_code = qr_badge.new_qr_code(obj)
+        
+        # Image du QR code rendue une fois dans le stockage (servie par URL aux applications) ;
+        # l'image précédente n'est supprimée qu'après la validation de la sauvegarde
+        try:
+            qr_badge.render_badge(obj)
+        except Exception as e:
+            # L'image sera rendue par la commande render_qr_badges
+            self.message_user(request, f"Image du QR code non enregistrée : {e}", level=messages.WARNING)
             
         # Sauvegarde le modèle
         super().save_model(request, obj, form, change)
@@ -189,28 +204,47 @@ class EmployeeAdmin(admin.ModelAdmin):
     def qr_code_display(self, obj):
         """Affiche le QR code de l'employé s'il existe."""
         if obj.qr_code:
-            # Création d'un QR code pour l'affichage
-            qr = qrcode.QRCode(
-                version=1,
-                error_correction=qrcode.constants.ERROR_CORRECT_L,
-                box_size=10,
-                border=4,
-            )
-            qr.add_data(obj.qr_code)
-            qr.make(fit=True)
-            
-            # Création d'une image à partir du QR code
-            img = qr.make_image(fill_color="black", back_color="white")
-            buffer = BytesIO()
-            img.save(buffer, format="PNG")
-            img_str = base64.b64encode(buffer.getvalue()).decode('utf-8')
-            
-            # Renvoie une image HTML
-            return format_html('<img src="data:image/png;base64,{}" width="150" height="150"/>', img_str)
+            # Image mémorisée par le service de rendu des QR codes
+            return generate_qr_code.generate_qr_code(obj.qr_code, as_html=True)
         return "Aucun QR code généré"
     qr_code_display.short_description = 'Aperçu du QR Code'
     
     # Note: Les actions de génération manuelle sont supprimées car la génération est maintenant automatique
+    actions = ['rotate_qr_codes', 'print_badge_sheets_pdf', 'print_badge_sheets_png']
+    
+    def rotate_qr_codes(self, request, queryset):
+        """Action pour renouveler le QR code des employés sélectionnés (ex: badge perdu)."""
+        count = 0
+        for employee in queryset:
+            qr_badge.rotate(employee)
+            count += 1
+        self.message_user(request, f"{count} QR code(s) renouvelé(s). Les anciens badges ne sont plus valides.")
+    rotate_qr_codes.short_description = "Renouveler le QR code des employés sélectionnés"
+    
+    def _badge_sheets_response(self, request, queryset, fmt):
+        """Planches de badges des employés sélectionnés, en téléchargement."""
+        records = badge_sheets.badge_records(
+            queryset.select_related('user', 'department').order_by('department__name', 'employee_id')
+        )
+        if not records:
+            self.message_user(request, "Aucun employé sélectionné.", level=messages.WARNING)
+            return None
+        workers = getattr(settings, 'BADGE_SHEET_WORKERS', badge_sheets.DEFAULT_WORKERS)
+        content, extension = badge_sheets.build_sheets(records, fmt, workers)
+        content_types = {'pdf': 'application/pdf', 'png': 'image/png', 'zip': 'application/zip'}
+        response = HttpResponse(content, content_type=content_types[extension])
+        response['Content-Disposition'] = f'attachment; filename="badges-{timezone.localdate():%Y%m%d}.{extension}"'
+        return response
+    
+    def print_badge_sheets_pdf(self, request, queryset):
+        """Action pour imprimer les badges des employés sélectionnés (PDF de plusieurs pages)."""
+        return self._badge_sheets_response(request, queryset, badge_sheets.PDF)
+    print_badge_sheets_pdf.short_description = "Imprimer les badges sélectionnés (PDF)"
+    
+    def print_badge_sheets_png(self, request, queryset):
+        """Action pour imprimer les badges des employés sélectionnés (une image PNG par page)."""
+        return self._badge_sheets_response(request, queryset, badge_sheets.PNG)
+    print_badge_sheets_png.short_description = "Imprimer les badges sélectionnés (PNG)"
 
 # --- Section 5: Configuration du modèle Schedule (Horaires) ---
 
@@ -251,7 +285,7 @@ class ScheduleAdmin(admin.ModelAdmin):
 @admin.register(AttendanceRecord)
 class AttendanceRecordAdmin(admin.ModelAdmin):
     """Configuration de l'interface d'administration pour les pointages."""
-    list_display = ('employee', 'timestamp', 'record_type', 'location')
+    list_display = ('employee', 'timestamp', 'record_type', 'location', 'kiosk_id')
     list_filter = ('record_type', 'timestamp', 'employee__department')
     search_fields = ('employee__employee_id', 'employee__user__first_name', 'employee__user__last_name', 'location', 'note')
     date_hierarchy = 'timestamp'
@@ -265,6 +299,41 @@ class AttendanceRecordAdmin(admin.ModelAdmin):
         self.message_user(request, f"{count} enregistrement(s) marqué(s) pour export. L'export sera disponible prochainement.")
     export_attendance_records.short_description = "Exporter les pointages sélectionnés"
 
+@admin.register(PresenceState)
+class PresenceStateAdmin(admin.ModelAdmin):
+    """
+    Consultation de l'état de présence courant des employés.
+    Cet état est maintenu automatiquement à partir des pointages : il n'est pas modifiable.
+    """
+    list_display = ('employee', 'state', 'last_timestamp')
+    list_filter = ('state', 'employee__department')
+    search_fields = ('employee__employee_id', 'employee__user__first_name', 'employee__user__last_name')
+    list_select_related = ('employee__user',)
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+@admin.register(AttendanceDaySummary)
+class AttendanceDaySummaryAdmin(admin.ModelAdmin):
+    """
+    Consultation des résumés journaliers de présence.
+    Ils sont recalculés automatiquement à partir des pointages : ils ne sont pas modifiables.
+    """
+    list_display = ('employee', 'date', 'first_in', 'last_out', 'worked_seconds', 'break_seconds', 'record_count')
+    list_filter = ('date', 'employee__department')
+    search_fields = ('employee__employee_id', 'employee__user__first_name', 'employee__user__last_name')
+    date_hierarchy = 'date'
+    list_select_related = ('employee__user',)
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
 # --- Section 7: Configuration du modèle LeaveRequest (Demandes de congé) ---
 
 @admin.register(LeaveRequest)
@@ -288,11 +357,30 @@ class LeaveRequestAdmin(admin.ModelAdmin):
     actions = ['approve_leave_requests', 'reject_leave_requests']
     
     def duration_days(self, obj):
-        """Calcule la durée en jours de la demande de congé."""
-        delta = obj.end_date - obj.start_date
-        # +1 car on compte le jour de début et le jour de fin
-        return delta.days + 1
-    duration_days.short_description = 'Durée (jours)'
+        """Calcule la durée en jours ouvrés de la demande de congé (jours de début et de fin inclus)."""
+        return leave_balance.leave_days(obj.start_date, obj.end_date)
+    duration_days.short_description = 'Durée (jours ouvrés)'
+    
+    def _respond_to_pending(self, queryset, status, admin_employee):
+        """
+        Applique un statut aux demandes en attente sélectionnées et met à jour les soldes
+        de congés dans la même transaction. Retourne le nombre de demandes mises à jour
+        et les employés concernés.
+        """
+        with transaction.atomic():
+            pending = queryset.filter(status='PENDING').select_for_update()
+            leaves = list(pending.values_list('pk', 'employee_id', 'start_date', 'end_date'))
+            updated = LeaveRequest.objects.filter(pk__in=[leave[0] for leave in leaves]).update(
+                status=status,
+                response_date=timezone.now(),
+                response_by=admin_employee
+            )
+            changes = leave_balance.new_changes()
+            for _, employee_pk, start_date, end_date in leaves:
+                leave_balance.add_change(changes, employee_pk, start_date, end_date, 'PENDING', sign=-1)
+                leave_balance.add_change(changes, employee_pk, start_date, end_date, status)
+            leave_balance.apply_changes(changes)
+        return updated, {leave[1] for leave in leaves}
     
     def approve_leave_requests(self, request, queryset):
         """Action pour approuver les demandes de congé sélectionnées."""
@@ -302,11 +390,11 @@ class LeaveRequestAdmin(admin.ModelAdmin):
             admin_employee = request.user.employee_profile
         
         # Mise à jour des demandes sélectionnées
-        updated = queryset.filter(status='PENDING').update(
-            status='APPROVED',
-            response_date=timezone.now(),
-            response_by=admin_employee
-        )
+        updated, employee_pks = self._respond_to_pending(queryset, 'APPROVED', admin_employee)
+        # update() ne déclenche pas les signaux : version des données et cache des
+        # statistiques mis à jour ici
+        data_version.bump(employee_pks)
+        stats_cache.invalidate(employee_pks)
         
         self.message_user(request, f"{updated} demande(s) de congé approuvée(s) avec succès.")
     approve_leave_requests.short_description = "Approuver les demandes sélectionnées"
@@ -319,11 +407,46 @@ class LeaveRequestAdmin(admin.ModelAdmin):
             admin_employee = request.user.employee_profile
         
         # Mise à jour des demandes sélectionnées
-        updated = queryset.filter(status='PENDING').update(
-            status='REJECTED',
-            response_date=timezone.now(),
-            response_by=admin_employee
-        )
+        updated, employee_pks = self._respond_to_pending(queryset, 'REJECTED', admin_employee)
+        # update() ne déclenche pas les signaux : version des données et cache des
+        # statistiques mis à jour ici
+        data_version.bump(employee_pks)
+        stats_cache.invalidate(employee_pks)
         
         self.message_user(request, f"{updated} demande(s) de congé rejetée(s).")
-    reject_leave_requests.short_description = "Rejeter les demandes sélectionnées"
\ No newline at end of file
+    reject_leave_requests.short_description = "Rejeter les demandes sélectionnées"
+
+@admin.register(LeaveBalance)
+class LeaveBalanceAdmin(admin.ModelAdmin):
+    """
+    Consultation des soldes de congés par employé et par année.
+    Ils sont mis à jour automatiquement à chaque changement de statut d'une demande : ils ne sont pas modifiables.
+    """
+    list_display = ('employee', 'year', 'quota', 'days_used', 'days_remaining', 'days_pending', 'pending_count')
+    list_filter = ('year', 'employee__department', 'employee__role')
+    search_fields = ('employee__employee_id', 'employee__user__first_name', 'employee__user__last_name')
+    list_select_related = ('employee__user',)
+    
+    def days_remaining(self, obj):
+        """Jours de congé restants pour l'année."""
+        return obj.days_remaining
+    days_remaining.short_description = 'Jours restants'
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+# --- Section 8: Configuration du modèle Holiday (Jours fériés) ---
+
+@admin.register(Holiday)
+class HolidayAdmin(admin.ModelAdmin):
+    """
+    Configuration de l'interface d'administration pour les jours fériés.
+    Les jours ouvrés (statistiques de présence) sont recalculés après chaque modification.
+    """
+    list_display = ('date', 'name', 'recurring')
+    list_filter = ('recurring',)
+    search_fields = ('name',)
+    date_hierarchy = 'date'
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "core"
+
+    def ready(self):
+        # Enregistrement des récepteurs de signaux
+        from . import signals  # noqa: F401
+        # Enregistrement des vérifications du système (python manage.py check)
+        from . import checks  # noqa: F401
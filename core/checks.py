@@ -0,0 +1,36 @@
+# Fichier : checks.py
+#
+# Description : Vérifications du système (python manage.py check) propres à l'application core.
+#
+#               Les jetons de kiosque à usage unique, l'anti-rebond des scans, les
+#               invalidations de l'index des badges et du calendrier et les statistiques
+#               en cache reposent sur le cache Django par défaut. Un cache propre à chaque
+#               processus (LocMemCache) ne les partage pas entre les workers : un jeton
+#               peut alors être rejoué une fois sur chaque worker. La vérification est
+#               faite au déploiement (check --deploy, lancé par entrypoint.sh).
+
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+# Caches propres à chaque processus (ou sans stockage)
+LOCAL_CACHE_BACKENDS = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """Signale un cache par défaut qui n'est pas partagé entre les processus."""
+    backend = settings.CACHES.get('default', {}).get('BACKEND')
+    if backend not in LOCAL_CACHE_BACKENDS:
+        return []
+    return [Warning(
+        f"Le cache par défaut ({backend}) n'est pas partagé entre les processus.",
+        hint=(
+            "Avec plusieurs workers, les jetons de kiosque peuvent être rejoués une fois par worker "
+            "et les invalidations (badges, calendrier, statistiques) ne sont vues que localement. "
+            "Définir REDIS_URL (ou CACHES) pour un cache partagé."
+        ),
+        id='core.W001',
+    )]
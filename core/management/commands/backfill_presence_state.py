@@ -0,0 +1,59 @@
+# Fichier : backfill_presence_state.py
+#
+# Description : Commande de gestion qui (re)construit la table PresenceState
+#               à partir de l'historique des pointages.
+#
+# Utilisation : python manage.py backfill_presence_state [--batch-size 500]
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+
+from core.models import Employee, AttendanceRecord, PresenceState
+from core.utils.presence import STATE_BY_RECORD_TYPE
+
+
+class Command(BaseCommand):
+    help = "Reconstruit l'état de présence courant de chaque employé à partir de ses pointages."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help="Nombre de lignes insérées par requête (défaut: 500)."
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        # Dernier pointage de chaque employé, obtenu en une seule requête
+        latest = AttendanceRecord.objects.filter(
+            employee=OuterRef('pk')
+        ).order_by('-timestamp', '-id')
+        employees = Employee.objects.annotate(
+            last_record_id=Subquery(latest.values('id')[:1])
+        ).values_list('pk', 'last_record_id')
+
+        last_record_ids = {pk: record_id for pk, record_id in employees}
+        records = AttendanceRecord.objects.only('id', 'timestamp', 'record_type').in_bulk(
+            [record_id for record_id in last_record_ids.values() if record_id is not None]
+        )
+
+        states = []
+        for employee_pk, record_id in last_record_ids.items():
+            record = records.get(record_id)
+            states.append(PresenceState(
+                employee_id=employee_pk,
+                state=STATE_BY_RECORD_TYPE[record.record_type] if record else 'OUT',
+                last_record=record,
+                last_timestamp=record.timestamp if record else None,
+            ))
+
+        with transaction.atomic():
+            PresenceState.objects.all().delete()
+            PresenceState.objects.bulk_create(states, batch_size=batch_size)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"État de présence reconstruit pour {len(states)} employé(s)."
+        ))
@@ -0,0 +1,166 @@
+# Fichier : bench_history_engine.py
+#
+# Description : Micro-benchmark du calcul des durées de l'historique des pointages
+#               (AttendanceHistoryView), sur une année de pointages synthétiques
+#               générés en mémoire (aucun accès à la base).
+#
+#               - ancien calcul : instances du modèle, regroupement par jour avec
+#                 strftime, tri des pointages de chaque jour, puis strptime des heures
+#                 pour calculer les écarts ;
+#               - nouveau calcul : un seul passage sur des tuples (values_list) avec
+#                 core/utils/durations.py.
+#
+#               Affiche le meilleur temps sur --repeat exécutions et le pic de mémoire
+#               allouée (tracemalloc) de chaque calcul.
+#
+# Utilisation : python manage.py bench_history_engine [--days 365] [--repeat 5] [--seed 42]
+
+import random
+import time
+import tracemalloc
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.models import AttendanceRecord
+from core.utils.durations import DayDurations
+
+
+def generate_rows(days, seed):
+    """
+    Pointages (id, horodatage, type, lieu, note) d'un employé sur `days` jours
+    ouvrés : entrée vers 8h, une pause, sortie vers 17h.
+    """
+    rng = random.Random(seed)
+    tz = timezone.get_current_timezone()
+    first_day = timezone.localdate() - timedelta(days=days)
+    rows = []
+    for offset in range(days):
+        day = first_day + timedelta(days=offset)
+        if day.weekday() >= 5:
+            continue
+        start = timezone.make_aware(datetime.combine(day, datetime.min.time()), tz) + timedelta(hours=8)
+        break_start = 4 * 3600 + rng.gauss(0, 900)
+        punches = [
+            ('IN', rng.gauss(0, 600)),
+            ('BREAK_START', break_start),
+            ('BREAK_END', break_start + 1800 + rng.gauss(0, 300)),
+            ('OUT', 9 * 3600 + rng.gauss(0, 1200)),
+        ]
+        for record_type, seconds in punches:
+            rows.append((len(rows) + 1, start + timedelta(seconds=round(seconds)), record_type, 'Entrée principale', None))
+    return rows
+
+
+def legacy_history(rows):
+    """Ancien calcul de AttendanceHistoryView, y compris l'instanciation des modèles par l'ORM."""
+    records = [
+        AttendanceRecord(id=record_id, employee_id=1, timestamp=timestamp, record_type=record_type,
+                         location=location, note=note)
+        for record_id, timestamp, record_type, location, note in rows
+    ]
+    days_data = defaultdict(list)
+    for record in records:
+        local_timestamp = timezone.localtime(record.timestamp)
+        days_data[local_timestamp.strftime('%Y-%m-%d')].append({
+            'id': record.id,
+            'time': local_timestamp.strftime('%H:%M:%S'),
+            'type': record.record_type,
+            'type_display': record.get_record_type_display(),
+            'location': record.location or '',
+            'note': record.note or ''
+        })
+    totals = {}
+    for day, day_records in days_data.items():
+        total_duration = 0
+        in_time = None
+        break_start = None
+        for record in sorted(day_records, key=lambda x: x['time']):
+            if record['type'] == 'IN':
+                in_time = datetime.strptime(record['time'], '%H:%M:%S')
+            elif record['type'] == 'OUT' and in_time is not None:
+                total_duration += (datetime.strptime(record['time'], '%H:%M:%S') - in_time).total_seconds()
+                in_time = None
+            elif record['type'] == 'BREAK_START':
+                break_start = datetime.strptime(record['time'], '%H:%M:%S')
+            elif record['type'] == 'BREAK_END' and break_start is not None:
+                total_duration -= (datetime.strptime(record['time'], '%H:%M:%S') - break_start).total_seconds()
+                break_start = None
+        totals[day] = total_duration
+    for day in sorted(days_data, reverse=True):
+        day_date = datetime.strptime(day, '%Y-%m-%d')
+        day_date.strftime('%A')
+        sorted(days_data[day], key=lambda x: x['time'])
+    return totals
+
+
+def engine_history(rows):
+    """Nouveau calcul : un seul passage sur les tuples."""
+    durations = DayDurations()
+    tz = durations.tz
+    type_labels = dict(AttendanceRecord.RECORD_TYPES)
+    days_data = {}
+    for record_id, timestamp, record_type, location, note in rows:
+        local_timestamp = timestamp.astimezone(tz)
+        day = local_timestamp.date()
+        durations.add(timestamp, record_type, day)
+        day_records = days_data.get(day)
+        if day_records is None:
+            day_records = days_data[day] = []
+        day_records.append({
+            'id': record_id,
+            'time': local_timestamp.strftime('%H:%M:%S'),
+            'type': record_type,
+            'type_display': type_labels.get(record_type, record_type),
+            'location': location or '',
+            'note': note or ''
+        })
+    totals = {}
+    for day in sorted(days_data, reverse=True):
+        day.strftime('%A')
+        totals[day.strftime('%Y-%m-%d')] = durations.worked.get(day, 0) - durations.breaks.get(day, 0)
+    return totals
+
+
+class Command(BaseCommand):
+    help = "Micro-benchmark du calcul des durées de l'historique des pointages (ancien calcul / nouveau calcul)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=365, help="Nombre de jours d'historique (défaut: 365).")
+        parser.add_argument('--repeat', type=int, default=5, help="Nombre d'exécutions de chaque calcul (défaut: 5).")
+        parser.add_argument('--seed', type=int, default=42, help="Graine du générateur de pointages.")
+
+    def handle(self, *args, **options):
+        if options['days'] < 1 or options['repeat'] < 1:
+            raise CommandError("--days et --repeat doivent être positifs.")
+
+        rows = generate_rows(options['days'], options['seed'])
+        self.stdout.write(f"{len(rows)} pointage(s) sur {options['days']} jour(s).")
+
+        legacy = legacy_history(rows)
+        engine = engine_history(rows)
+        if legacy.keys() != engine.keys() or any(abs(legacy[day] - engine[day]) >= 1 for day in legacy):
+            raise CommandError("Les deux calculs ne donnent pas les mêmes durées.")
+
+        results = {}
+        for name, func in (('ancien calcul', legacy_history), ('nouveau calcul', engine_history)):
+            timings = []
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                func(rows)
+                timings.append(time.perf_counter() - started)
+            tracemalloc.start()
+            func(rows)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            results[name] = min(timings)
+            self.stdout.write(
+                f"{name:<15} meilleur temps {min(timings) * 1000:8.2f} ms   "
+                f"pic mémoire {peak / 1024:8.1f} Kio"
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Accélération : x{results['ancien calcul'] / results['nouveau calcul']:.1f}"
+        ))
@@ -0,0 +1,264 @@
+# Fichier : bench_qr.py
+#
+# Description : Benchmark du rendu des QR codes des badges (core/utils/generate_qr_code.py)
+#               et des API de profil qui les renvoient.
+#
+#               - rendu : pour chaque combinaison niveau de correction d'erreur (L, M, Q, H)
+#                 x taille des modules (--box-sizes) x format (PNG, SVG, matrice), rendu
+#                 sans cache : meilleur temps sur --repeat exécutions, pic de mémoire
+#                 allouée (tracemalloc), taille du rendu et taille dans une réponse JSON
+#                 (URL data: en base64 pour le PNG). La version du QR code (nombre de
+#                 modules) et la part de modules récupérables indiquent la robustesse
+#                 à la lecture : plus de correction d'erreur donne un QR code plus dense ;
+#               - cache : coût d'un rendu déjà mémorisé (cache LRU du processus) ;
+#               - API : /api/profile/ (png, svg, matrix) et /employee/profile/ (sans et avec
+#                 image en base64), pour un employé de test créé dans une transaction
+#                 annulée à la fin ; les images sont écrites dans un dossier temporaire.
+#
+#               --save enregistre les résultats comme référence (--baseline, par défaut
+#               benchmarks/qr_baseline.json). Sinon, si la référence existe, les résultats
+#               y sont comparés et la commande échoue en cas de régression : rendu plus
+#               volumineux, QR code plus dense, temps ou mémoire au-delà des tolérances.
+#               Les temps dépendent de la machine : enregistrer la référence sur la
+#               machine qui fait la comparaison (ex: l'intégration continue).
+#
+# Utilisation : python manage.py bench_qr [--repeat 20] [--box-sizes 4,10] [--skip-api]
+#               python manage.py bench_qr --save
+
+import json
+import math
+import platform
+import tempfile
+import time
+import tracemalloc
+import uuid
+from importlib.metadata import version
+from pathlib import Path
+
+import PIL
+import qrcode
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from core.models import User, Employee
+from core.utils import generate_qr_code, qr_badge
+
+# Contenu de QR code de même forme que ceux des badges (voir qr_badge.new_qr_code)
+DEFAULT_PAYLOAD = 'EMP-BENCH1-1A2B3C4D'
+
+DEFAULT_BASELINE = Path(settings.BASE_DIR) / 'benchmarks' / 'qr_baseline.json'
+
+# Niveaux de correction d'erreur et part des modules récupérables
+ERROR_CORRECTIONS = {
+    'L': (qrcode.constants.ERROR_CORRECT_L, 7),
+    'M': (qrcode.constants.ERROR_CORRECT_M, 15),
+    'Q': (qrcode.constants.ERROR_CORRECT_Q, 25),
+    'H': (qrcode.constants.ERROR_CORRECT_H, 30),
+}
+
+# Appels d'API mesurés : (nom de l'URL, paramètres)
+API_CALLS = [
+    ('api_profile', {'qr_format': 'png'}),
+    ('api_profile', {'qr_format': 'svg'}),
+    ('api_profile', {'qr_format': 'matrix'}),
+    ('employee_profile', {}),
+    ('employee_profile', {'qr_inline': '1'}),
+]
+
+# Nombre d'appels par mesure du cache (un appel est trop court pour être chronométré seul)
+CACHE_CALLS = 1000
+
+
+def render_uncached(payload, box_size, fmt, error_correction):
+    """Rendu sans passer par le cache du service."""
+    if fmt == generate_qr_code.PNG:
+        return generate_qr_code._render_png(payload, box_size, error_correction)
+    if fmt == generate_qr_code.SVG:
+        return generate_qr_code._render_svg(payload, box_size, error_correction)
+    return generate_qr_code._render_matrix(payload, error_correction)
+
+
+def json_size(fmt, output):
+    """Taille du rendu dans une réponse JSON (URL data: en base64 pour le PNG)."""
+    if fmt == generate_qr_code.PNG:
+        return len('data:image/png;base64,') + 4 * math.ceil(len(output) / 3)
+    return len(json.dumps(output))
+
+
+def measure(func, repeat):
+    """Meilleur temps (ms) sur `repeat` exécutions, pic de mémoire (Kio) et résultat d'une exécution."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    tracemalloc.start()
+    try:
+        result = func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return min(timings) * 1000, peak / 1024, result
+
+
+def find_regressions(results, baseline, time_tolerance, memory_tolerance, size_tolerance):
+    """
+    Écarts des résultats par rapport à la référence. Les rendus sont déterministes :
+    toute augmentation de taille ou de version est une régression ; la taille des
+    réponses d'API (identifiants, etc.) est comparée avec size_tolerance.
+    """
+    regressions = []
+    for case, result in results.items():
+        reference = baseline.get(case)
+        if reference is None:
+            continue
+        size_limit = 0 if case.startswith('render:') else size_tolerance
+        for field in ('bytes', 'json_bytes'):
+            if field in result and result[field] > reference[field] * (1 + size_limit):
+                regressions.append(f"{case} : {field} {reference[field]} -> {result[field]}")
+        if result.get('version', 0) > reference.get('version', 0):
+            regressions.append(f"{case} : version {reference['version']} -> {result['version']}")
+        if result['time_ms'] > reference['time_ms'] * (1 + time_tolerance):
+            regressions.append(f"{case} : temps {reference['time_ms']:.3f} ms -> {result['time_ms']:.3f} ms")
+        if result['peak_kib'] > reference['peak_kib'] * (1 + memory_tolerance):
+            regressions.append(f"{case} : mémoire {reference['peak_kib']:.1f} Kio -> {result['peak_kib']:.1f} Kio")
+    return regressions
+
+
+class Command(BaseCommand):
+    help = "Benchmark du rendu des QR codes (correction d'erreur x taille x format) et des API de profil."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20, help="Nombre d'exécutions de chaque mesure (défaut: 20).")
+        parser.add_argument('--box-sizes', default='4,10',
+                            help="Tailles des modules en pixels, séparées par des virgules (défaut: 4,10).")
+        parser.add_argument('--payload', default=DEFAULT_PAYLOAD, help="Contenu du QR code mesuré.")
+        parser.add_argument('--skip-api', action='store_true', help="Ne mesure pas les API de profil.")
+        parser.add_argument('--baseline', default=str(DEFAULT_BASELINE),
+                            help="Fichier de référence (défaut: benchmarks/qr_baseline.json).")
+        parser.add_argument('--save', action='store_true', help="Enregistre les résultats comme référence.")
+        parser.add_argument('--time-tolerance', type=float, default=0.5,
+                            help="Hausse de temps tolérée par rapport à la référence (défaut: 0.5, soit +50 %%).")
+        parser.add_argument('--memory-tolerance', type=float, default=0.2,
+                            help="Hausse du pic de mémoire tolérée (défaut: 0.2, soit +20 %%).")
+        parser.add_argument('--size-tolerance', type=float, default=0.02,
+                            help="Hausse de la taille des réponses d'API tolérée (défaut: 0.02, soit +2 %%).")
+
+    def handle(self, *args, **options):
+        try:
+            box_sizes = [int(size) for size in options['box_sizes'].split(',')]
+        except ValueError:
+            raise CommandError("--box-sizes doit être une liste d'entiers séparés par des virgules.")
+        if options['repeat'] < 1 or any(size < 1 for size in box_sizes):
+            raise CommandError("--repeat et --box-sizes doivent être positifs.")
+
+        results = {}
+        self.bench_renders(options['payload'], box_sizes, options['repeat'], results)
+        self.bench_cache(options['payload'], options['repeat'], results)
+        if not options['skip_api']:
+            self.bench_api(options['payload'], options['repeat'], results)
+
+        baseline_path = Path(options['baseline'])
+        if options['save']:
+            baseline_path.parent.mkdir(parents=True, exist_ok=True)
+            baseline_path.write_text(json.dumps({
+                'environment': {
+                    'python': platform.python_version(),
+                    'pillow': PIL.__version__,
+                    'qrcode': version('qrcode'),
+                },
+                'payload': options['payload'],
+                'repeat': options['repeat'],
+                # 6 décimales : un accès au cache dure moins d'une microseconde (0.000 ms
+                # arrondi à 3 décimales, toute mesure suivante serait une régression)
+                'results': {
+                    case: {field: round(value, 6) if isinstance(value, float) else value for field, value in result.items()}
+                    for case, result in results.items()
+                },
+            }, indent=2, sort_keys=True) + '\n')
+            self.stdout.write(self.style.SUCCESS(f"Référence enregistrée dans {baseline_path}."))
+            return
+
+        if not baseline_path.exists():
+            self.stdout.write(self.style.WARNING(f"Aucune référence ({baseline_path}) : lancer avec --save."))
+            return
+        baseline = json.loads(baseline_path.read_text())
+        if baseline.get('payload') != options['payload']:
+            raise CommandError("La référence a été mesurée avec un autre contenu de QR code (--payload).")
+        regressions = find_regressions(
+            results, baseline['results'],
+            options['time_tolerance'], options['memory_tolerance'], options['size_tolerance'],
+        )
+        if regressions:
+            for regression in regressions:
+                self.stderr.write(regression)
+            raise CommandError(f"{len(regressions)} régression(s) par rapport à {baseline_path}.")
+        self.stdout.write(self.style.SUCCESS(f"Aucune régression par rapport à {baseline_path}."))
+
+    def bench_renders(self, payload, box_sizes, repeat, results):
+        self.stdout.write("Rendu sans cache :")
+        self.stdout.write(
+            f"  {'format':<7}{'corr.':<7}{'module':>7}{'version':>9}{'côté':>6}{'temps (ms)':>12}"
+            f"{'mémoire (Kio)':>15}{'octets':>9}{'JSON':>9}"
+        )
+        for level, (error_correction, recovery) in ERROR_CORRECTIONS.items():
+            qr = generate_qr_code._make_qr(payload, border=0, error_correction=error_correction)
+            version, side = qr.version, len(qr.get_matrix())
+            for fmt in (generate_qr_code.PNG, generate_qr_code.SVG, generate_qr_code.MATRIX):
+                # La taille des modules ne change pas la matrice
+                for box_size in (box_sizes[:1] if fmt == generate_qr_code.MATRIX else box_sizes):
+                    time_ms, peak_kib, output = measure(
+                        lambda: render_uncached(payload, box_size, fmt, error_correction), repeat
+                    )
+                    size = len(output) if isinstance(output, (bytes, str)) else len(json.dumps(output))
+                    results[f"render:{fmt}:{level}:{box_size}"] = {
+                        'time_ms': time_ms, 'peak_kib': peak_kib, 'bytes': size,
+                        'json_bytes': json_size(fmt, output), 'version': version, 'recovery_pct': recovery,
+                    }
+                    self.stdout.write(
+                        f"  {fmt:<7}{level + f' {recovery}%':<7}{box_size:>7}{version:>9}{side:>6}{time_ms:>12.3f}"
+                        f"{peak_kib:>15.1f}{size:>9}{json_size(fmt, output):>9}"
+                    )
+
+    def bench_cache(self, payload, repeat, results):
+        generate_qr_code.clear_cache()
+        generate_qr_code.render(payload)
+
+        def hits():
+            for _ in range(CACHE_CALLS):
+                generate_qr_code.render(payload)
+
+        time_ms, peak_kib, _ = measure(hits, repeat)
+        generate_qr_code.clear_cache()
+        results['cache:hit'] = {'time_ms': time_ms / CACHE_CALLS, 'peak_kib': peak_kib}
+        self.stdout.write(f"Rendu mémorisé (cache LRU) : {time_ms / CACHE_CALLS * 1000:.2f} µs par appel.")
+
+    def bench_api(self, payload, repeat, results):
+        self.stdout.write("API de profil (image déjà rendue) :")
+        self.stdout.write(f"  {'appel':<45}{'temps (ms)':>12}{'mémoire (Kio)':>15}{'octets':>9}")
+        with tempfile.TemporaryDirectory() as media_root, \
+                override_settings(MEDIA_ROOT=media_root, ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']), \
+                transaction.atomic():
+            suffix = uuid.uuid4().hex[:8]
+            user = User.objects.create_user(username=f'bench_qr_{suffix}', first_name='Bench', last_name='QR')
+            employee = Employee.objects.create(user=user, employee_id=f'BENCH{suffix}', qr_code=payload)
+            # Image du badge rendue comme à l'enregistrement dans l'administration
+            qr_badge.refresh_badge(employee)
+            client = Client()
+            client.force_login(user)
+            for name, params in API_CALLS:
+                url = reverse(name)
+                # Premier appel : remplissage des caches
+                response = client.get(url, params)
+                if response.status_code != 200:
+                    raise CommandError(f"{url} a répondu {response.status_code}.")
+                time_ms, peak_kib, response = measure(lambda: client.get(url, params), repeat)
+                label = f"{url}?{'&'.join(f'{key}={value}' for key, value in params.items())}".rstrip('?')
+                results[f"api:{label}"] = {'time_ms': time_ms, 'peak_kib': peak_kib, 'bytes': len(response.content)}
+                self.stdout.write(f"  {label:<45}{time_ms:>12.3f}{peak_kib:>15.1f}{len(response.content):>9}")
+            transaction.set_rollback(True)
+            generate_qr_code.clear_cache()
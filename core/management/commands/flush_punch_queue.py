@@ -0,0 +1,95 @@
+# Fichier : flush_punch_queue.py
+#
+# Description : Commande de gestion qui transfère en continu les pointages de la file
+#               locale (mode write-behind, voir core/utils/punch_queue.py) vers la base
+#               principale, par lots. En cas d'erreur (base indisponible...), le lot
+#               reste en file et le transfert est retenté avec un délai croissant.
+#
+# Utilisation : python manage.py flush_punch_queue [--batch-size 500] [--interval 1]
+#               python manage.py flush_punch_queue --once     (vide la file puis s'arrête)
+#               python manage.py flush_punch_queue --stats    (affiche les métriques de la file)
+
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from core.utils import punch_queue
+
+# Délai maximal entre deux tentatives après une erreur, en secondes
+MAX_BACKOFF = 60
+# Intervalle entre deux purges des pointages transférés, en secondes
+PURGE_INTERVAL = 3600
+
+
+class Command(BaseCommand):
+    help = "Transfère les pointages de la file d'attente locale (mode write-behind) vers la base principale."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help="Nombre maximal de pointages insérés par lot (défaut: 500)."
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=1.0,
+            help="Attente en secondes lorsque la file est vide (défaut: 1)."
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help="Vide la file puis s'arrête (erreur si un lot échoue)."
+        )
+        parser.add_argument(
+            '--stats',
+            action='store_true',
+            help="Affiche les métriques de la file au format JSON puis s'arrête."
+        )
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self.stdout.write(json.dumps(punch_queue.get_metrics(), ensure_ascii=False, indent=2))
+            return
+
+        batch_size = options['batch_size']
+
+        if options['once']:
+            total = 0
+            while True:
+                try:
+                    flushed = punch_queue.flush_pending(batch_size)
+                except Exception as e:
+                    raise CommandError(f"Échec du transfert après {total} pointage(s) : {e}")
+                total += flushed
+                if flushed < batch_size:
+                    break
+            self.stdout.write(self.style.SUCCESS(f"{total} pointage(s) transféré(s)."))
+            return
+
+        self.stdout.write(f"Transfert des pointages depuis {punch_queue.get_queue_path()}...")
+        failures = 0
+        last_purge = 0.0
+        while True:
+            # Connexion à la base principale fermée si elle est devenue inutilisable
+            close_old_connections()
+            try:
+                flushed = punch_queue.flush_pending(batch_size)
+            except Exception as e:
+                failures += 1
+                delay = min(MAX_BACKOFF, 2 ** failures)
+                self.stderr.write(f"Échec du transfert ({e}), nouvelle tentative dans {delay} s.")
+                time.sleep(delay)
+                continue
+
+            failures = 0
+            if flushed:
+                self.stdout.write(f"{flushed} pointage(s) transféré(s).")
+            if flushed < batch_size:
+                if time.monotonic() - last_purge > PURGE_INTERVAL:
+                    punch_queue.purge_flushed()
+                    last_purge = time.monotonic()
+                time.sleep(options['interval'])
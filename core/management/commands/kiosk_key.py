@@ -0,0 +1,27 @@
+# Fichier : kiosk_key.py
+#
+# Description : Commande de gestion qui affiche la clé secrète d'un ou plusieurs kiosques,
+#               à configurer sur le kiosque (en-tête X-Kiosk-Key de l'envoi groupé des
+#               scans, voir record_attendance_batch). La clé est dérivée de l'identifiant
+#               du kiosque et de KIOSK_KEY_SECRET (à défaut SECRET_KEY) : changer ce
+#               secret révoque toutes les clés.
+#
+# Utilisation : python manage.py kiosk_key kiosk-accueil [kiosk-atelier ...]
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.utils import kiosk_token
+from core.utils.scan_ingestion import KIOSK_ID_MAX_LENGTH
+
+
+class Command(BaseCommand):
+    help = "Affiche la clé secrète des kiosques donnés."
+
+    def add_arguments(self, parser):
+        parser.add_argument('kiosk_ids', nargs='+', help="Identifiant(s) du kiosque.")
+
+    def handle(self, *args, **options):
+        for kiosk_id in options['kiosk_ids']:
+            if len(kiosk_id) > KIOSK_ID_MAX_LENGTH:
+                raise CommandError(f"Identifiant de kiosque trop long : {kiosk_id} (maximum {KIOSK_ID_MAX_LENGTH}).")
+            self.stdout.write(f"{kiosk_id} {kiosk_token.make_kiosk_key(kiosk_id)}")
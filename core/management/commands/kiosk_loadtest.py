@@ -0,0 +1,370 @@
+# Fichier : kiosk_loadtest.py
+#
+# Description : Commande de gestion qui reproduit le pic de pointages d'un changement
+#               d'équipe (ex. 7h55-8h05) contre les API du kiosque d'un serveur local.
+#
+#               1. Crée (ou réutilise) des employés de test, avec les modèles utilisés
+#                  par populate_db.py ; une partie d'entre eux est déjà présente
+#                  (équipe sortante) et pointera une sortie.
+#               2. Génère une trace de scans dont les arrivées suivent le profil d'une
+#                  prise de poste (loi normale centrée quelques minutes avant l'heure de
+#                  début), accélérée d'un facteur --speedup.
+#               3. Rejoue la trace contre /api/authenticate-card/ puis /api/record-attendance/
+#                  avec --concurrency requêtes simultanées.
+#               4. Affiche le débit, les latences p50/p95/p99 avec un histogramme et le
+#                  nombre de requêtes SQL par appel (lancer le serveur avec
+#                  QUERY_COUNT_HEADERS=True pour obtenir ce dernier).
+#
+# Utilisation : python manage.py kiosk_loadtest --url http://127.0.0.1:8000 --employees 300 --concurrency 32
+#               python manage.py kiosk_loadtest --cleanup
+
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import Department, Role, User, Employee, AttendanceRecord, PresenceState
+from core.utils import credential_index
+from core.utils import day_summary
+
+# Préfixe des comptes créés pour le test de charge
+USERNAME_PREFIX = 'loadtest_'
+DEPARTMENT_NAME = "Test de charge"
+ROLE_NAME = "Employé (test de charge)"
+
+# Bornes de l'histogramme des latences, en millisecondes
+HISTOGRAM_BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500]
+
+# Profil des arrivées autour de l'heure de prise de poste, en minutes
+ARRIVAL_MEAN_MIN = -3.0
+ARRIVAL_STDDEV_MIN = 2.5
+ARRIVAL_WINDOW_MIN = (-10.0, 5.0)
+
+
+def percentile(sorted_values, pct):
+    """Percentile par la méthode du rang le plus proche (liste déjà triée)."""
+    if not sorted_values:
+        return None
+    rank = max(1, round(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class Command(BaseCommand):
+    help = "Test de charge des API du kiosque : rejoue un pic de pointages de changement d'équipe."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000',
+                            help="URL du serveur à tester (défaut: http://127.0.0.1:8000).")
+        parser.add_argument('--employees', type=int, default=300,
+                            help="Nombre d'employés qui pointent pendant le pic (défaut: 300).")
+        parser.add_argument('--outgoing-ratio', type=float, default=0.3,
+                            help="Part des employés de l'équipe sortante, qui pointent une sortie (défaut: 0.3).")
+        parser.add_argument('--qr-ratio', type=float, default=0.5,
+                            help="Part des scans faits par QR code, les autres par NFC (défaut: 0.5).")
+        parser.add_argument('--kiosks', type=int, default=4,
+                            help="Nombre de kiosques simulés (défaut: 4).")
+        parser.add_argument('--concurrency', type=int, default=16,
+                            help="Nombre maximal de scans traités simultanément (défaut: 16).")
+        parser.add_argument('--speedup', type=float, default=10.0,
+                            help="Facteur d'accélération de la trace (défaut: 10, soit 15 minutes rejouées en 90 s). "
+                                 "0 envoie tous les scans sans attente.")
+        parser.add_argument('--mode', choices=['two-step', 'combined'], default='two-step',
+                            help="two-step : authentification puis pointage ; combined : un seul appel "
+                                 "authenticate-card avec record_type (défaut: two-step).")
+        parser.add_argument('--seed', type=int, default=None,
+                            help="Graine du générateur aléatoire, pour rejouer la même trace.")
+        parser.add_argument('--timeout', type=float, default=10.0,
+                            help="Délai maximal d'une requête HTTP en secondes (défaut: 10).")
+        parser.add_argument('--json-output', default=None,
+                            help="Enregistre aussi le rapport au format JSON dans ce fichier.")
+        parser.add_argument('--seed-only', action='store_true',
+                            help="Prépare uniquement les employés de test, sans lancer le test.")
+        parser.add_argument('--cleanup', action='store_true',
+                            help="Supprime les employés de test et leurs pointages, puis quitte.")
+
+    def handle(self, *args, **options):
+        if options['cleanup']:
+            deleted, _ = User.objects.filter(username__startswith=USERNAME_PREFIX).delete()
+            self.stdout.write(self.style.SUCCESS(f"{deleted} objet(s) de test supprimé(s)."))
+            return
+
+        if options['employees'] < 1 or options['concurrency'] < 1 or options['kiosks'] < 1:
+            raise CommandError("--employees, --concurrency et --kiosks doivent être positifs.")
+
+        rng = random.Random(options['seed'])
+        employees = self.seed_employees(options['employees'])
+        outgoing = self.reset_presence(employees, options['outgoing_ratio'], rng)
+        self.stdout.write(
+            f"{len(employees)} employé(s) de test prêts, dont {len(outgoing)} de l'équipe sortante."
+        )
+        if options['seed_only']:
+            return
+
+        trace = self.build_trace(employees, outgoing, options, rng)
+        self.stdout.write(
+            f"Rejeu de {len(trace)} scans contre {options['url']} "
+            f"(concurrence {options['concurrency']}, accélération x{options['speedup']:g}, mode {options['mode']})..."
+        )
+        samples, elapsed = self.replay(trace, options)
+        report = self.build_report(samples, elapsed, trace)
+        self.print_report(report)
+
+        if options['json_output']:
+            with open(options['json_output'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            self.stdout.write(f"Rapport enregistré dans {options['json_output']}")
+
+    # --- Préparation des données ---
+
+    def seed_employees(self, count):
+        """Crée les employés de test manquants et retourne les `count` premiers."""
+        department, _ = Department.objects.get_or_create(name=DEPARTMENT_NAME)
+        role, _ = Role.objects.get_or_create(name=ROLE_NAME)
+
+        usernames = [f"{USERNAME_PREFIX}{i:05d}" for i in range(count)]
+        existing = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+        missing = [username for username in usernames if username not in existing]
+
+        if missing:
+            with transaction.atomic():
+                # Les kiosques n'utilisent pas de mot de passe
+                users = []
+                for username in missing:
+                    user = User(username=username, first_name="Test", last_name=username[len(USERNAME_PREFIX):])
+                    user.set_unusable_password()
+                    users.append(user)
+                User.objects.bulk_create(users, batch_size=500)
+                users = User.objects.filter(username__in=missing)
+                Employee.objects.bulk_create([
+                    Employee(
+                        user=user,
+                        employee_id=f"LT{user.username[len(USERNAME_PREFIX):]}",
+                        department=department,
+                        role=role,
+                        nfc_id=f"LT-NFC-{user.username[len(USERNAME_PREFIX):]}",
+                        qr_code=f"LT-QR-{user.username[len(USERNAME_PREFIX):]}",
+                    )
+                    for user in users
+                ], batch_size=500)
+            # bulk_create n'émet pas de signaux
+            credential_index.invalidate()
+
+        return list(Employee.objects.filter(
+            user__username__in=usernames
+        ).values('pk', 'employee_id', 'nfc_id', 'qr_code').order_by('employee_id'))
+
+    def reset_presence(self, employees, outgoing_ratio, rng):
+        """
+        Remet les employés de test dans l'état de début de pic : l'équipe sortante est
+        présente depuis huit heures, les autres sont absents.
+        Retourne l'ensemble des clés primaires des employés de l'équipe sortante.
+        """
+        employee_pks = [employee['pk'] for employee in employees]
+        outgoing = set(rng.sample(employee_pks, round(len(employee_pks) * outgoing_ratio)))
+        start_of_shift = timezone.now() - timedelta(hours=8)
+
+        with transaction.atomic():
+            AttendanceRecord.objects.filter(employee_id__in=employee_pks).delete()
+            PresenceState.objects.filter(employee_id__in=employee_pks).delete()
+            records = AttendanceRecord.objects.bulk_create([
+                AttendanceRecord(employee_id=pk, record_type='IN', timestamp=start_of_shift, kiosk_id='loadtest')
+                for pk in outgoing
+            ], batch_size=500)
+            day_summary.refresh_for_records(records)
+        # L'état de présence est reconstruit à la demande à partir des pointages
+        return outgoing
+
+    def build_trace(self, employees, outgoing, options, rng):
+        """
+        Construit la trace des scans, triée par instant d'envoi (en secondes depuis le début du rejeu).
+        Les instants suivent une loi normale autour de l'heure de prise de poste, tronquée à la fenêtre du pic.
+        """
+        low, high = ARRIVAL_WINDOW_MIN
+        trace = []
+        for employee in employees:
+            minute = min(max(rng.gauss(ARRIVAL_MEAN_MIN, ARRIVAL_STDDEV_MIN), low), high)
+            by_qr = rng.random() < options['qr_ratio']
+            trace.append({
+                'offset': (minute - low) * 60,
+                'employee_id': employee['employee_id'],
+                'credential': {'qr_code': employee['qr_code']} if by_qr else {'nfc_id': employee['nfc_id']},
+                'record_type': 'OUT' if employee['pk'] in outgoing else 'IN',
+                'kiosk_id': f"loadtest-kiosk-{rng.randrange(options['kiosks']) + 1}",
+            })
+        trace.sort(key=lambda scan: scan['offset'])
+
+        speedup = options['speedup']
+        for scan in trace:
+            scan['offset'] = scan['offset'] / speedup if speedup > 0 else 0.0
+        return trace
+
+    # --- Rejeu ---
+
+    def replay(self, trace, options):
+        """Rejoue la trace et retourne (liste des mesures, durée totale en secondes)."""
+        base_url = options['url'].rstrip('/')
+        timeout = options['timeout']
+        local = threading.local()
+        samples = []
+        samples_lock = threading.Lock()
+
+        def post(endpoint, path, payload):
+            # Une session HTTP par thread pour réutiliser les connexions
+            if not hasattr(local, 'session'):
+                local.session = requests.Session()
+            start = time.perf_counter()
+            try:
+                response = local.session.post(f"{base_url}{path}", json=payload, timeout=timeout)
+                status = response.status_code
+                try:
+                    data = response.json()
+                except ValueError:
+                    data = {}
+                queries = response.headers.get('X-DB-Query-Count')
+            except requests.RequestException as e:
+                status, data, queries = None, {'error': str(e)}, None
+            sample = {
+                'endpoint': endpoint,
+                'status': status,
+                'success': bool(status == 200 and data.get('success')),
+                'latency_ms': (time.perf_counter() - start) * 1000,
+                'queries': int(queries) if queries is not None else None,
+                'error': data.get('error'),
+            }
+            with samples_lock:
+                samples.append(sample)
+            return sample, data
+
+        def run_scan(scan, started_at):
+            delay = started_at + scan['offset'] - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            scan['lag_ms'] = max(0.0, -delay) * 1000
+
+            payload = dict(scan['credential'], kiosk_id=scan['kiosk_id'])
+            if options['mode'] == 'combined':
+                payload['record_type'] = scan['record_type']
+                sample, _ = post('authenticate-card', '/api/authenticate-card/', payload)
+                scan['success'] = sample['success']
+                return
+
+            sample, data = post('authenticate-card', '/api/authenticate-card/', payload)
+            if not sample['success']:
+                scan['success'] = False
+                return
+            sample, _ = post('record-attendance', '/api/record-attendance/', {
+                'employee_id': scan['employee_id'],
+                'record_type': scan['record_type'],
+                'kiosk_id': scan['kiosk_id'],
+                'kiosk_token': data.get('kiosk_token'),
+            })
+            scan['success'] = sample['success']
+
+        started_at = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            for future in [executor.submit(run_scan, scan, started_at) for scan in trace]:
+                future.result()
+        return samples, time.perf_counter() - started_at
+
+    # --- Rapport ---
+
+    def build_report(self, samples, elapsed, trace):
+        endpoints = {}
+        for name in sorted({sample['endpoint'] for sample in samples}):
+            endpoint_samples = [sample for sample in samples if sample['endpoint'] == name]
+            latencies = sorted(sample['latency_ms'] for sample in endpoint_samples)
+            queries = [sample['queries'] for sample in endpoint_samples if sample['queries'] is not None]
+
+            statuses = {}
+            error_messages = {}
+            for sample in endpoint_samples:
+                key = str(sample['status'] or 'erreur réseau')
+                statuses[key] = statuses.get(key, 0) + 1
+                if not sample['success']:
+                    message = sample['error'] or 'sans message'
+                    error_messages[message] = error_messages.get(message, 0) + 1
+
+            histogram = []
+            lower = 0
+            for upper in HISTOGRAM_BUCKETS_MS + [None]:
+                histogram.append({
+                    'min_ms': lower,
+                    'max_ms': upper,
+                    'count': sum(1 for latency in latencies if latency >= lower and (upper is None or latency < upper)),
+                })
+                lower = upper
+
+            endpoints[name] = {
+                'requests': len(endpoint_samples),
+                'errors': sum(1 for sample in endpoint_samples if not sample['success']),
+                'statuses': statuses,
+                'error_messages': error_messages,
+                'throughput_rps': len(endpoint_samples) / elapsed if elapsed else None,
+                'latency_ms': {
+                    'mean': sum(latencies) / len(latencies),
+                    'p50': percentile(latencies, 50),
+                    'p95': percentile(latencies, 95),
+                    'p99': percentile(latencies, 99),
+                    'max': latencies[-1],
+                },
+                'histogram': histogram,
+                'queries': {
+                    'mean': sum(queries) / len(queries),
+                    'max': max(queries),
+                    'total': sum(queries),
+                } if queries else None,
+            }
+
+        lags = sorted(scan.get('lag_ms', 0.0) for scan in trace)
+        completed = sum(1 for scan in trace if scan.get('success'))
+        return {
+            'scans': len(trace),
+            'scans_completed': completed,
+            'duration_s': elapsed,
+            'throughput_scans_per_s': completed / elapsed if elapsed else None,
+            'throughput_requests_per_s': len(samples) / elapsed if elapsed else None,
+            # Retard d'envoi par rapport à la trace : élevé si la concurrence est insuffisante
+            'schedule_lag_ms': {'p50': percentile(lags, 50), 'p99': percentile(lags, 99)},
+            'endpoints': endpoints,
+        }
+
+    def print_report(self, report):
+        write = self.stdout.write
+        write("")
+        write(self.style.MIGRATE_HEADING("=== Rapport du test de charge ==="))
+        write(f"Scans réussis       : {report['scans_completed']}/{report['scans']}")
+        write(f"Durée               : {report['duration_s']:.2f} s")
+        write(f"Débit               : {report['throughput_scans_per_s']:.1f} scans/s, "
+              f"{report['throughput_requests_per_s']:.1f} requêtes/s")
+        write(f"Retard sur la trace : p50 {report['schedule_lag_ms']['p50']:.1f} ms, "
+              f"p99 {report['schedule_lag_ms']['p99']:.1f} ms")
+
+        for name, stats in report['endpoints'].items():
+            latency = stats['latency_ms']
+            write("")
+            write(self.style.MIGRATE_HEADING(f"--- {name} ---"))
+            write(f"Requêtes : {stats['requests']} ({stats['throughput_rps']:.1f}/s), "
+                  f"échecs : {stats['errors']}, statuts : {stats['statuses']}")
+            for message, count in sorted(stats['error_messages'].items(), key=lambda item: -item[1])[:5]:
+                write(f"  {count:>6} x {message}")
+            write(f"Latence  : moy {latency['mean']:.1f} ms | p50 {latency['p50']:.1f} ms | "
+                  f"p95 {latency['p95']:.1f} ms | p99 {latency['p99']:.1f} ms | max {latency['max']:.1f} ms")
+            if stats['queries']:
+                write(f"SQL      : {stats['queries']['mean']:.1f} requêtes/appel en moyenne, "
+                      f"max {stats['queries']['max']}, total {stats['queries']['total']}")
+            else:
+                write("SQL      : non disponible (lancer le serveur avec QUERY_COUNT_HEADERS=True)")
+
+            peak = max(bucket['count'] for bucket in stats['histogram']) or 1
+            for bucket in stats['histogram']:
+                label = (f"{bucket['min_ms']:>5}-{bucket['max_ms']:<5} ms" if bucket['max_ms'] is not None
+                         else f"{bucket['min_ms']:>5}+      ms")
+                bar = '#' * round(40 * bucket['count'] / peak)
+                write(f"  {label} | {bucket['count']:>6} {bar}")
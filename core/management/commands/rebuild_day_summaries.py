@@ -0,0 +1,108 @@
+# Fichier : rebuild_day_summaries.py
+#
+# Description : Commande de gestion qui (re)construit la table AttendanceDaySummary
+#               à partir de l'historique des pointages, par exemple après son
+#               déploiement ou après un import massif de pointages.
+#               Les employés sont répartis entre plusieurs threads, chacun avec sa
+#               propre connexion à la base, ouverte au premier employé et fermée à la
+#               fin du thread ; chaque employé est reconstruit dans sa propre transaction.
+#
+# Utilisation : python manage.py rebuild_day_summaries [--workers 4] [--since 2025-01-01] [--employee EMP001]
+
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core.models import Employee
+from core.utils import day_summary
+
+
+def _rebuild_worker(pending, since, results):
+    """
+    Reconstruit les employés de la file `pending` jusqu'à ce qu'elle soit vide, et
+    envoie dans `results` le nombre de résumés de chacun (ou l'exception levée).
+    La connexion du thread sert à tous ses employés et n'est fermée qu'à la fin.
+    """
+    try:
+        while True:
+            try:
+                employee_pk = pending.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                results.put(day_summary.rebuild_employee(employee_pk, since=since))
+            except Exception as e:
+                results.put(e)
+                return
+    finally:
+        # Chaque thread ouvre sa propre connexion : la fermer avant de rendre le thread
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = "Reconstruit les résumés journaliers de présence à partir des pointages."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help="Nombre d'employés traités en parallèle (défaut: 4)."
+        )
+        parser.add_argument(
+            '--since',
+            default=None,
+            help="Ne reconstruit que les jours à partir de cette date (AAAA-MM-JJ)."
+        )
+        parser.add_argument(
+            '--employee',
+            action='append',
+            default=None,
+            help="Identifiant d'un employé à reconstruire (option répétable). Par défaut : tous."
+        )
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = datetime.strptime(options['since'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError("Format de date invalide pour --since (AAAA-MM-JJ attendu).")
+        if options['workers'] < 1:
+            raise CommandError("--workers doit être positif.")
+
+        employees = Employee.objects.all()
+        if options['employee']:
+            employees = employees.filter(employee_id__in=options['employee'])
+        employee_pks = list(employees.values_list('pk', flat=True))
+
+        pending = queue.SimpleQueue()
+        for employee_pk in employee_pks:
+            pending.put(employee_pk)
+        results = queue.SimpleQueue()
+
+        total = 0
+        workers = max(1, min(options['workers'], len(employee_pks)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for _ in range(workers):
+                executor.submit(_rebuild_worker, pending, since, results)
+            for done in range(1, len(employee_pks) + 1):
+                result = results.get()
+                if isinstance(result, Exception):
+                    # Vider la file : les autres threads s'arrêtent après leur employé en cours
+                    try:
+                        while True:
+                            pending.get_nowait()
+                    except queue.Empty:
+                        pass
+                    raise result
+                total += result
+                if done % 100 == 0:
+                    self.stdout.write(f"{done}/{len(employee_pks)} employé(s) traité(s)...")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{total} résumé(s) journalier(s) reconstruit(s) pour {len(employee_pks)} employé(s)."
+        ))
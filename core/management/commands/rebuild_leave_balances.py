@@ -0,0 +1,43 @@
+# Fichier : rebuild_leave_balances.py
+#
+# Description : Commande de gestion qui (re)calcule les soldes de congés (LeaveBalance)
+#               à partir des demandes de congé, par exemple après une modification des
+#               demandes directement en base ou pour vérifier les compteurs.
+#               Chaque employé est recalculé dans sa propre transaction.
+#
+# Utilisation : python manage.py rebuild_leave_balances [--employee EMP001]
+
+from django.core.management.base import BaseCommand
+
+from core.models import Employee
+from core.utils import leave_balance
+from core.utils import stats_cache
+
+
+class Command(BaseCommand):
+    help = "Recalcule les soldes de congés à partir des demandes de congé."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--employee',
+            action='append',
+            default=None,
+            help="Identifiant d'un employé à recalculer (option répétable). Par défaut : tous."
+        )
+
+    def handle(self, *args, **options):
+        employees = Employee.objects.all()
+        if options['employee']:
+            employees = employees.filter(employee_id__in=options['employee'])
+        employee_pks = list(employees.values_list('pk', flat=True))
+
+        total = 0
+        for done, employee_pk in enumerate(employee_pks, start=1):
+            total += leave_balance.rebuild_employee(employee_pk)
+            if done % 100 == 0:
+                self.stdout.write(f"{done}/{len(employee_pks)} employé(s) traité(s)...")
+        stats_cache.invalidate(employee_pks)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{total} solde(s) de congés recalculé(s) pour {len(employee_pks)} employé(s)."
+        ))
@@ -0,0 +1,73 @@
+# Fichier : render_badge_sheets.py
+#
+# Description : Commande de gestion qui rend les planches de badges imprimables des
+#               employés (nom, identifiant, département, QR code), en PDF de plusieurs
+#               pages ou en images PNG (archive ZIP s'il y a plusieurs pages). Les pages
+#               sont rendues en parallèle par un pool de processus.
+#
+# Utilisation : python manage.py render_badge_sheets [--format pdf|png] [--workers 4]
+#               [--employee EMP001] [--department Informatique] [--output badges.pdf]
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import Employee
+from core.utils import badge_sheets
+
+
+class Command(BaseCommand):
+    help = "Rend les planches de badges imprimables des employés (PDF ou PNG)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--format',
+            choices=badge_sheets.FORMATS,
+            default=badge_sheets.PDF,
+            help="Format des planches (par défaut : pdf)."
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help="Nombre de processus de rendu (par défaut : BADGE_SHEET_WORKERS)."
+        )
+        parser.add_argument(
+            '--employee',
+            action='append',
+            default=None,
+            help="Identifiant d'un employé à imprimer (option répétable). Par défaut : tous les employés actifs."
+        )
+        parser.add_argument(
+            '--department',
+            default=None,
+            help="Nom du département dont les badges sont imprimés."
+        )
+        parser.add_argument(
+            '--output',
+            default=None,
+            help="Fichier de sortie (par défaut : badges.<extension>)."
+        )
+
+    def handle(self, *args, **options):
+        employees = Employee.objects.select_related('user', 'department')
+        if options['employee']:
+            employees = employees.filter(employee_id__in=options['employee'])
+        else:
+            employees = employees.filter(user__is_active=True)
+        if options['department']:
+            employees = employees.filter(department__name=options['department'])
+
+        records = badge_sheets.badge_records(employees.order_by('department__name', 'employee_id'))
+        if not records:
+            raise CommandError("Aucun employé à imprimer.")
+
+        workers = options['workers'] or getattr(settings, 'BADGE_SHEET_WORKERS', badge_sheets.DEFAULT_WORKERS)
+        content, extension = badge_sheets.build_sheets(records, options['format'], workers)
+        output = options['output'] or f'badges.{extension}'
+        with open(output, 'wb') as f:
+            f.write(content)
+
+        pages = -(-len(records) // badge_sheets.BADGES_PER_PAGE)
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(records)} badge(s) sur {pages} page(s) écrit(s) dans {output}."
+        ))
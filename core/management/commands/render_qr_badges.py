@@ -0,0 +1,53 @@
+# Fichier : render_qr_badges.py
+#
+# Description : Commande de gestion qui pré-rend les images des QR codes des employés
+#               (Employee.qr_code_badge) dans le stockage par défaut, par exemple après
+#               son déploiement pour les employés existants. Seules les images manquantes
+#               ou périmées sont rendues, sauf avec --force.
+#
+# Utilisation : python manage.py render_qr_badges [--force] [--employee EMP001]
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from core.models import Employee
+from core.utils import qr_badge
+
+
+class Command(BaseCommand):
+    help = "Pré-rend les images des QR codes des employés dans le stockage."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help="Rend à nouveau les images déjà présentes."
+        )
+        parser.add_argument(
+            '--employee',
+            action='append',
+            default=None,
+            help="Identifiant d'un employé à traiter (option répétable). Par défaut : tous."
+        )
+
+    def handle(self, *args, **options):
+        employees = Employee.objects.exclude(qr_code__isnull=True).exclude(qr_code='')
+        if options['employee']:
+            employees = employees.filter(employee_id__in=options['employee'])
+
+        rendered = 0
+        failed = 0
+        for employee in employees.only('pk', 'employee_id', 'qr_code', 'qr_code_badge').iterator():
+            if options['force'] and employee.qr_code_badge:
+                default_storage.delete(employee.qr_code_badge.name)
+                employee.qr_code_badge.name = ''
+            try:
+                if qr_badge.refresh_badge(employee):
+                    rendered += 1
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f"{employee.employee_id} : {e}")
+
+        self.stdout.write(self.style.SUCCESS(f"{rendered} image(s) de QR code rendue(s)."))
+        if failed:
+            self.stdout.write(self.style.WARNING(f"{failed} échec(s)."))
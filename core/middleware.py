@@ -0,0 +1,129 @@
+# Fichier : middleware.py
+#
+# Description : Middlewares de l'application core.
+#               Ils sont compatibles synchrone et asynchrone : sous ASGI (voir
+#               entrypoint.sh), un middleware uniquement synchrone dans la chaîne
+#               obligerait Django à exécuter chaque requête, y compris les vues
+#               asynchrones du kiosque, dans un thread.
+
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.signals import request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.utils.decorators import sync_and_async_middleware
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+# Compteurs SQL de la requête en cours. Une variable de contexte suit la requête
+# dans les threads de sync_to_async, qui utilisent d'autres connexions à la base.
+_query_stats = ContextVar('query_stats', default=None)
+
+
+def _count_query(execute, sql, params, many, context):
+    """Enveloppe d'exécution SQL : compte la requête si une requête HTTP est mesurée."""
+    stats = _query_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats['count'] += 1
+        stats['time'] += time.perf_counter() - start
+
+
+def _install_wrapper(connection, **kwargs):
+    if _count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_query)
+
+
+def _install_wrappers(**kwargs):
+    """
+    Installe l'enveloppe sur les connexions déjà ouvertes du thread courant. Sous
+    ASGI, request_started est émis dans le thread qui exécutera l'ORM synchrone.
+    """
+    for connection in connections.all(initialized_only=True):
+        _install_wrapper(connection)
+
+
+def _set_headers(response, stats):
+    response['X-DB-Query-Count'] = str(stats['count'])
+    response['X-DB-Time-Ms'] = f"{stats['time'] * 1000:.2f}"
+    return response
+
+
+@sync_and_async_middleware
+def QueryCountMiddleware(get_response):
+    """
+    Ajoute à chaque réponse le nombre de requêtes SQL exécutées pour la traiter
+    (en-tête X-DB-Query-Count) et leur durée cumulée en millisecondes (X-DB-Time-Ms).
+    Utilisé par la commande kiosk_loadtest pour rapporter le coût en base de chaque API.
+    Activé uniquement si QUERY_COUNT_HEADERS=True.
+
+    Les connexions étant propres à chaque thread, l'enveloppe de comptage est
+    installée sur toutes les connexions (signaux request_started et connection_created)
+    et ne compte que les requêtes SQL émises pendant une requête HTTP mesurée.
+    """
+    if not getattr(settings, 'QUERY_COUNT_HEADERS', False):
+        raise MiddlewareNotUsed
+
+    request_started.connect(_install_wrappers, dispatch_uid='core_query_count')
+    connection_created.connect(_install_wrapper, dispatch_uid='core_query_count')
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            stats = {'count': 0, 'time': 0.0}
+            token = _query_stats.set(stats)
+            try:
+                response = await get_response(request)
+            finally:
+                _query_stats.reset(token)
+            return _set_headers(response, stats)
+    else:
+        def middleware(request):
+            stats = {'count': 0, 'time': 0.0}
+            token = _query_stats.set(stats)
+            try:
+                response = get_response(request)
+            finally:
+                _query_stats.reset(token)
+            return _set_headers(response, stats)
+
+    return middleware
+
+
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoiseMiddleware compatible asynchrone. WhiteNoise ne déclare que le mode
+    synchrone : placé tel quel dans MIDDLEWARE, il ferait passer toute la chaîne
+    par un thread sous ASGI. Ici, seuls les fichiers statiques servis par WhiteNoise
+    (lecture de fichier bloquante) sont délégués à un thread ; les autres requêtes
+    continuent en asynchrone.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings=settings)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file, thread_sensitive=False)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve, thread_sensitive=False)(static_file, request)
+        return await self.get_response(request)
@@ -0,0 +1,70 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PresenceState",
+            fields=[
+                (
+                    "employee",
+                    models.OneToOneField(
+                        help_text="L'employé concerné par cet état.",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="presence_state",
+                        serialize=False,
+                        to="core.employee",
+                        verbose_name="Employé",
+                    ),
+                ),
+                (
+                    "state",
+                    models.CharField(
+                        choices=[
+                            ("OUT", "Absent"),
+                            ("IN", "Présent"),
+                            ("ON_BREAK", "En pause"),
+                        ],
+                        default="OUT",
+                        help_text="État de présence courant, déduit du dernier pointage.",
+                        max_length=20,
+                        verbose_name="État",
+                    ),
+                ),
+                (
+                    "last_timestamp",
+                    models.DateTimeField(
+                        blank=True,
+                        help_text="Date et heure du dernier pointage.",
+                        null=True,
+                        verbose_name="Horodatage du dernier pointage",
+                    ),
+                ),
+                (
+                    "last_record",
+                    models.ForeignKey(
+                        blank=True,
+                        help_text="Le pointage ayant déterminé l'état courant.",
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="core.attendancerecord",
+                        verbose_name="Dernier pointage",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "État de présence",
+                "verbose_name_plural": "États de présence",
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0002_presencestate"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="employee",
+            name="qr_code",
+            field=models.CharField(
+                blank=True,
+                db_index=True,
+                help_text="Données du code QR de l'employé, si applicable.",
+                max_length=255,
+                null=True,
+                verbose_name="Code QR",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="attendancerecord",
+            index=models.Index(
+                fields=["employee", "timestamp"], name="attendance_emp_ts_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="attendancerecord",
+            index=models.Index(
+                fields=["employee", "record_type", "timestamp"],
+                name="attendance_emp_type_ts_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="leaverequest",
+            index=models.Index(
+                fields=["employee", "status", "start_date"],
+                name="leave_emp_status_start_idx",
+            ),
+        ),
+    ]
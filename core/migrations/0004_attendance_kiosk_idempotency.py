@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0003_attendance_leave_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="attendancerecord",
+            name="idempotency_key",
+            field=models.CharField(
+                blank=True,
+                help_text="Clé unique fournie par le kiosque pour les scans envoyés en lot (facultatif).",
+                max_length=64,
+                null=True,
+                unique=True,
+                verbose_name="Clé d'idempotence",
+            ),
+        ),
+        migrations.AddField(
+            model_name="attendancerecord",
+            name="kiosk_id",
+            field=models.CharField(
+                blank=True,
+                help_text="Identifiant du kiosque ayant enregistré le pointage (facultatif).",
+                max_length=50,
+                null=True,
+                verbose_name="Kiosque",
+            ),
+        ),
+    ]
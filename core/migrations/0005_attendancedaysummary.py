@@ -0,0 +1,98 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0004_attendance_kiosk_idempotency"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AttendanceDaySummary",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "date",
+                    models.DateField(
+                        help_text="Jour résumé, dans le fuseau horaire du site.",
+                        verbose_name="Date",
+                    ),
+                ),
+                (
+                    "first_in",
+                    models.DateTimeField(
+                        blank=True,
+                        help_text="Horodatage de la première entrée du jour.",
+                        null=True,
+                        verbose_name="Première entrée",
+                    ),
+                ),
+                (
+                    "last_out",
+                    models.DateTimeField(
+                        blank=True,
+                        help_text="Horodatage de la dernière sortie du jour.",
+                        null=True,
+                        verbose_name="Dernière sortie",
+                    ),
+                ),
+                (
+                    "worked_seconds",
+                    models.PositiveIntegerField(
+                        default=0,
+                        help_text="Somme des intervalles entre chaque entrée et la sortie qui la suit dans la journée.",
+                        verbose_name="Temps de présence (secondes)",
+                    ),
+                ),
+                (
+                    "break_seconds",
+                    models.PositiveIntegerField(
+                        default=0,
+                        help_text="Somme des intervalles entre chaque début de pause et la fin de pause qui la suit.",
+                        verbose_name="Temps de pause (secondes)",
+                    ),
+                ),
+                (
+                    "record_count",
+                    models.PositiveIntegerField(
+                        default=0,
+                        help_text="Nombre total de pointages du jour.",
+                        verbose_name="Nombre de pointages",
+                    ),
+                ),
+                (
+                    "employee",
+                    models.ForeignKey(
+                        help_text="L'employé concerné par ce résumé.",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="day_summaries",
+                        to="core.employee",
+                        verbose_name="Employé",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Résumé journalier de présence",
+                "verbose_name_plural": "Résumés journaliers de présence",
+                "ordering": ["-date"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("employee", "date"),
+                        name="attendance_day_summary_emp_date_uniq",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0005_attendancedaysummary"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EmployeeDataVersion",
+            fields=[
+                (
+                    "employee",
+                    models.OneToOneField(
+                        help_text="L'employé concerné par cette version.",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="data_version",
+                        serialize=False,
+                        to="core.employee",
+                        verbose_name="Employé",
+                    ),
+                ),
+                (
+                    "version",
+                    models.PositiveBigIntegerField(
+                        default=0,
+                        help_text="Incrémentée à chaque modification des données de l'employé.",
+                        verbose_name="Version",
+                    ),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(
+                        help_text="Date et heure de la dernière modification des données de l'employé.",
+                        verbose_name="Dernière modification",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Version des données employé",
+                "verbose_name_plural": "Versions des données employé",
+            },
+        ),
+    ]
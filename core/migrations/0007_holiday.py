@@ -0,0 +1,83 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:01
+
+import datetime
+
+from django.db import migrations, models
+
+# Jours fériés à date fixe en Haïti (récurrents) ; les fêtes mobiles (Carnaval,
+# Vendredi saint, Fête-Dieu...) sont saisies chaque année dans l'administration
+FIXED_HOLIDAYS = [
+    (1, 1, "Jour de l'Indépendance"),
+    (1, 2, "Jour des Aïeux"),
+    (5, 1, "Fête du Travail et de l'Agriculture"),
+    (5, 18, "Fête du Drapeau et de l'Université"),
+    (8, 15, "Assomption"),
+    (10, 17, "Mort de Dessalines"),
+    (11, 1, "Toussaint"),
+    (11, 2, "Fête des Morts"),
+    (11, 18, "Bataille de Vertières"),
+    (12, 25, "Noël"),
+]
+
+
+def create_fixed_holidays(apps, schema_editor):
+    Holiday = apps.get_model("core", "Holiday")
+    for month, day, name in FIXED_HOLIDAYS:
+        # Année de référence bissextile : seuls le jour et le mois comptent
+        Holiday.objects.get_or_create(
+            date=datetime.date(2000, month, day), defaults={"name": name, "recurring": True}
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0006_employeedataversion"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Holiday",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "date",
+                    models.DateField(
+                        help_text="Date du jour férié (pour un jour férié récurrent, seuls le jour et le mois comptent).",
+                        unique=True,
+                        verbose_name="Date",
+                    ),
+                ),
+                (
+                    "name",
+                    models.CharField(
+                        help_text="Nom du jour férié (ex: Jour de l'Indépendance).",
+                        max_length=100,
+                        verbose_name="Nom",
+                    ),
+                ),
+                (
+                    "recurring",
+                    models.BooleanField(
+                        default=False,
+                        help_text="Cocher si le jour férié revient chaque année à la même date.",
+                        verbose_name="Récurrent",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Jour férié",
+                "verbose_name_plural": "Jours fériés",
+                "ordering": ["date"],
+            },
+        ),
+        migrations.RunPython(create_fixed_holidays, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,154 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:05
+
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def working_days(start_date, end_date, holidays, recurring):
+    # Jours ouvrés (lundi-vendredi hors jours fériés), comme utils/work_calendar.py
+    days = 0
+    day = start_date
+    while day <= end_date:
+        if day.weekday() < 5 and day not in holidays and (day.month, day.day) not in recurring:
+            days += 1
+        day += timedelta(days=1)
+    return days
+
+
+def build_leave_balances(apps, schema_editor):
+    # Soldes calculés à partir des demandes existantes (année de la date de début),
+    # en jours ouvrés
+    LeaveRequest = apps.get_model("core", "LeaveRequest")
+    LeaveBalance = apps.get_model("core", "LeaveBalance")
+    Employee = apps.get_model("core", "Employee")
+    Holiday = apps.get_model("core", "Holiday")
+    holidays = set(Holiday.objects.filter(recurring=False).values_list("date", flat=True))
+    recurring = {(day.month, day.day) for day in Holiday.objects.filter(recurring=True).values_list("date", flat=True)}
+    counters = defaultdict(Counter)
+    for employee_id, start_date, end_date, status in LeaveRequest.objects.filter(
+        status__in=["APPROVED", "PENDING"]
+    ).values_list("employee_id", "start_date", "end_date", "status").iterator():
+        days = working_days(start_date, end_date, holidays, recurring)
+        key = (employee_id, start_date.year)
+        if status == "APPROVED":
+            counters[key]["days_used"] += days
+        else:
+            counters[key]["days_pending"] += days
+            counters[key]["pending_count"] += 1
+    if not counters:
+        return
+    default_quota = getattr(settings, "LEAVE_ANNUAL_QUOTA", 25)
+    quotas = dict(
+        Employee.objects.filter(pk__in={pk for pk, _ in counters}).values_list(
+            "pk", "role__annual_leave_quota"
+        )
+    )
+    LeaveBalance.objects.bulk_create(
+        [
+            LeaveBalance(
+                employee_id=employee_id,
+                year=year,
+                quota=default_quota if quotas.get(employee_id) is None else quotas[employee_id],
+                **values,
+            )
+            for (employee_id, year), values in counters.items()
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0007_holiday"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="role",
+            name="annual_leave_quota",
+            field=models.PositiveSmallIntegerField(
+                blank=True,
+                help_text="Nombre de jours de congé par an pour ce rôle. Vide : quota par défaut (LEAVE_ANNUAL_QUOTA).",
+                null=True,
+                verbose_name="Quota annuel de congés",
+            ),
+        ),
+        migrations.CreateModel(
+            name="LeaveBalance",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "year",
+                    models.PositiveSmallIntegerField(
+                        help_text="Année du solde (année de début des demandes de congé).",
+                        verbose_name="Année",
+                    ),
+                ),
+                (
+                    "quota",
+                    models.PositiveSmallIntegerField(
+                        help_text="Nombre de jours de congé de l'année, d'après le rôle de l'employé.",
+                        verbose_name="Quota",
+                    ),
+                ),
+                (
+                    "days_used",
+                    models.PositiveIntegerField(
+                        default=0,
+                        help_text="Jours ouvrés des demandes approuvées (jour de début et jour de fin inclus).",
+                        verbose_name="Jours utilisés",
+                    ),
+                ),
+                (
+                    "days_pending",
+                    models.PositiveIntegerField(
+                        default=0,
+                        help_text="Jours ouvrés des demandes en attente de réponse.",
+                        verbose_name="Jours en attente",
+                    ),
+                ),
+                (
+                    "pending_count",
+                    models.PositiveIntegerField(
+                        default=0,
+                        help_text="Nombre de demandes en attente de réponse.",
+                        verbose_name="Demandes en attente",
+                    ),
+                ),
+                (
+                    "employee",
+                    models.ForeignKey(
+                        help_text="L'employé concerné par ce solde.",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="leave_balances",
+                        to="core.employee",
+                        verbose_name="Employé",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Solde de congés",
+                "verbose_name_plural": "Soldes de congés",
+                "ordering": ["-year"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("employee", "year"), name="leave_balance_emp_year_uniq"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(build_leave_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0008_leavebalance"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="employee",
+            name="qr_code_badge",
+            field=models.FileField(
+                blank=True,
+                editable=False,
+                help_text="Image PNG pré-rendue du code QR, servie par URL aux applications.",
+                max_length=255,
+                upload_to="badges/qr/",
+                verbose_name="Image du code QR",
+            ),
+        ),
+    ]
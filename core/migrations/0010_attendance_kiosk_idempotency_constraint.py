@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0009_employee_qr_code_badge"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="attendancerecord",
+            name="idempotency_key",
+            field=models.CharField(
+                blank=True,
+                db_index=True,
+                help_text="Clé unique, pour son kiosque, fournie pour les scans envoyés en lot (facultatif).",
+                max_length=64,
+                null=True,
+                verbose_name="Clé d'idempotence",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="attendancerecord",
+            constraint=models.UniqueConstraint(
+                fields=("kiosk_id", "idempotency_key"),
+                name="attendance_kiosk_idempotency_uniq",
+            ),
+        ),
+    ]
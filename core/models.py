@@ -55,6 +55,12 @@ class Role(models.Model):
         verbose_name="Description",
         help_text="Description facultative des responsabilités ou compétences associées à ce rôle."
     )
+    annual_leave_quota = models.PositiveSmallIntegerField(
+        null=True,
+        blank=True,
+        verbose_name="Quota annuel de congés",
+        help_text="Nombre de jours de congé par an pour ce rôle. Vide : quota par défaut (LEAVE_ANNUAL_QUOTA)."
+    )
 
     def __str__(self):
         """
@@ -188,8 +194,17 @@ class Employee(models.Model):
         max_length=255, # Peut stocker une URL ou des données encodées
         blank=True,
         null=True,
+        db_index=True, # Recherche du kiosque lors d'un scan de QR code
         help_text="Données du code QR de l'employé, si applicable."
     )
+    qr_code_badge = models.FileField(
+        verbose_name="Image du code QR",
+        upload_to='badges/qr/',
+        max_length=255,
+        blank=True,
+        editable=False, # Rendue automatiquement à partir de qr_code (voir core/utils/qr_badge.py)
+        help_text="Image PNG pré-rendue du code QR, servie par URL aux applications."
+    )
 
     # Remarque : Les champs tels que first_name, last_name, email, phone_number, address,
     # profile_picture, groups, user_permissions sont désormais gérés par le modèle User
@@ -312,11 +327,37 @@ class AttendanceRecord(models.Model):
         verbose_name="Note",
         help_text="Notes additionnelles concernant ce pointage (facultatif)."
     )
+    kiosk_id = models.CharField(
+        max_length=50,
+        blank=True,
+        null=True,
+        verbose_name="Kiosque",
+        help_text="Identifiant du kiosque ayant enregistré le pointage (facultatif)."
+    )
+    idempotency_key = models.CharField(
+        max_length=64,
+        db_index=True, # Recherche des scans déjà transférés (voir utils/punch_queue.py)
+        blank=True,
+        null=True,
+        verbose_name="Clé d'idempotence",
+        help_text="Clé unique, pour son kiosque, fournie pour les scans envoyés en lot (facultatif)."
+    )
 
     class Meta:
         verbose_name = "Enregistrement de présence"
         verbose_name_plural = "Enregistrements de présence"
         ordering = ['-timestamp'] # Ordonner par défaut du plus récent au plus ancien
+        indexes = [
+            # Historique et statistiques d'un employé sur une période (plage de timestamp)
+            models.Index(fields=['employee', 'timestamp'], name='attendance_emp_ts_idx'),
+            # Mêmes requêtes restreintes à un type de pointage (ex: jours avec une entrée)
+            models.Index(fields=['employee', 'record_type', 'timestamp'], name='attendance_emp_type_ts_idx'),
+        ]
+        constraints = [
+            # Un même scan renvoyé par un kiosque n'est enregistré qu'une fois ; deux
+            # kiosques peuvent générer la même clé
+            models.UniqueConstraint(fields=['kiosk_id', 'idempotency_key'], name='attendance_kiosk_idempotency_uniq'),
+        ]
 
     def __str__(self):
         """
@@ -330,6 +371,126 @@ class AttendanceRecord(models.Model):
             user_display_name = self.employee.user.username
         return f"{user_display_name} - {self.get_record_type_display()} - {self.timestamp.strftime('%Y-%m-%d %H:%M')}"
 
+class PresenceState(models.Model):
+    """
+    État de présence courant d'un employé (une ligne par employé).
+    Cette table matérialise le dernier pointage afin que le kiosque détermine
+    les actions disponibles par une simple lecture sur clé primaire, quelle que
+    soit la taille de l'historique des pointages.
+    Elle est mise à jour dans la même transaction que l'insertion du pointage.
+    """
+    STATE_CHOICES = [
+        ('OUT', 'Absent'),
+        ('IN', 'Présent'),
+        ('ON_BREAK', 'En pause'),
+    ]
+
+    employee = models.OneToOneField(
+        Employee,
+        on_delete=models.CASCADE,  # Si l'employé est supprimé, son état l'est aussi
+        primary_key=True,
+        related_name='presence_state',
+        verbose_name="Employé",
+        help_text="L'employé concerné par cet état."
+    )
+    state = models.CharField(
+        max_length=20,
+        choices=STATE_CHOICES,
+        default='OUT',
+        verbose_name="État",
+        help_text="État de présence courant, déduit du dernier pointage."
+    )
+    last_record = models.ForeignKey(
+        AttendanceRecord,
+        on_delete=models.SET_NULL,  # L'état est recalculé par signal si le pointage est supprimé
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name="Dernier pointage",
+        help_text="Le pointage ayant déterminé l'état courant."
+    )
+    last_timestamp = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Horodatage du dernier pointage",
+        help_text="Date et heure du dernier pointage."
+    )
+
+    class Meta:
+        verbose_name = "État de présence"
+        verbose_name_plural = "États de présence"
+
+    def __str__(self):
+        """
+        Représentation textuelle de l'objet PresenceState.
+        Retourne :
+            str: L'employé et son état courant.
+        """
+        return f"{self.employee} - {self.get_state_display()}"
+
+class AttendanceDaySummary(models.Model):
+    """
+    Résumé journalier des pointages d'un employé (une ligne par employé et par jour local).
+    Les tableaux de bord mensuels et annuels lisent ces résumés (au plus 366 lignes
+    par an) au lieu de recalculer les durées à partir de tous les pointages.
+    Les lignes des jours concernés sont recalculées à chaque création, modification
+    ou suppression d'un pointage (voir core/utils/day_summary.py).
+    """
+    employee = models.ForeignKey(
+        Employee,
+        on_delete=models.CASCADE,
+        related_name='day_summaries',
+        verbose_name="Employé",
+        help_text="L'employé concerné par ce résumé."
+    )
+    date = models.DateField(
+        verbose_name="Date",
+        help_text="Jour résumé, dans le fuseau horaire du site."
+    )
+    first_in = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Première entrée",
+        help_text="Horodatage de la première entrée du jour."
+    )
+    last_out = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Dernière sortie",
+        help_text="Horodatage de la dernière sortie du jour."
+    )
+    worked_seconds = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Temps de présence (secondes)",
+        help_text="Somme des intervalles entre chaque entrée et la sortie qui la suit dans la journée."
+    )
+    break_seconds = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Temps de pause (secondes)",
+        help_text="Somme des intervalles entre chaque début de pause et la fin de pause qui la suit."
+    )
+    record_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Nombre de pointages",
+        help_text="Nombre total de pointages du jour."
+    )
+
+    class Meta:
+        verbose_name = "Résumé journalier de présence"
+        verbose_name_plural = "Résumés journaliers de présence"
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(fields=['employee', 'date'], name='attendance_day_summary_emp_date_uniq'),
+        ]
+
+    def __str__(self):
+        """
+        Représentation textuelle de l'objet AttendanceDaySummary.
+        Retourne :
+            str: L'employé et le jour résumé.
+        """
+        return f"{self.employee} - {self.date.strftime('%d/%m/%Y')}"
+
 # --- Section 5: Modèle pour la gestion des congés ---
 
 class LeaveRequest(models.Model):
@@ -406,6 +567,10 @@ class LeaveRequest(models.Model):
         verbose_name = "Demande de congé"
         verbose_name_plural = "Demandes de congé"
         ordering = ['-request_date'] # Ordonner par défaut les demandes les plus récentes en premier
+        indexes = [
+            # Demandes d'un employé par statut et par période (quotas, chevauchements, listes)
+            models.Index(fields=['employee', 'status', 'start_date'], name='leave_emp_status_start_idx'),
+        ]
 
     def __str__(self):
         """
@@ -419,6 +584,145 @@ class LeaveRequest(models.Model):
             user_display_name = self.employee.user.username
         return f"{user_display_name} - {self.get_leave_type_display()} ({self.start_date.strftime('%d/%m/%Y')} au {self.end_date.strftime('%d/%m/%Y')}) - Statut: {self.get_status_display()}"
 
+class LeaveBalance(models.Model):
+    """
+    Solde de congés d'un employé pour une année (une ligne par employé et par année).
+    Une demande de congé compte pour l'année de sa date de début. Les compteurs sont
+    mis à jour à chaque changement de statut d'une demande (voir core/utils/leave_balance.py) :
+    lire le solde ne demande pas de parcourir les demandes.
+    """
+    employee = models.ForeignKey(
+        Employee,
+        on_delete=models.CASCADE,
+        related_name='leave_balances',
+        verbose_name="Employé",
+        help_text="L'employé concerné par ce solde."
+    )
+    year = models.PositiveSmallIntegerField(
+        verbose_name="Année",
+        help_text="Année du solde (année de début des demandes de congé)."
+    )
+    quota = models.PositiveSmallIntegerField(
+        verbose_name="Quota",
+        help_text="Nombre de jours de congé de l'année, d'après le rôle de l'employé."
+    )
+    days_used = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Jours utilisés",
+        help_text="Jours ouvrés des demandes approuvées (jour de début et jour de fin inclus)."
+    )
+    days_pending = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Jours en attente",
+        help_text="Jours ouvrés des demandes en attente de réponse."
+    )
+    pending_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Demandes en attente",
+        help_text="Nombre de demandes en attente de réponse."
+    )
+
+    class Meta:
+        verbose_name = "Solde de congés"
+        verbose_name_plural = "Soldes de congés"
+        ordering = ['-year']
+        constraints = [
+            models.UniqueConstraint(fields=['employee', 'year'], name='leave_balance_emp_year_uniq'),
+        ]
+
+    @property
+    def days_remaining(self):
+        """Jours de congé restants (quota - jours approuvés)."""
+        return self.quota - self.days_used
+
+    def __str__(self):
+        """
+        Représentation textuelle de l'objet LeaveBalance.
+        Retourne :
+            str: L'employé, l'année et les jours utilisés.
+        """
+        return f"{self.employee} - {self.year} ({self.days_used}/{self.quota} jours)"
+
+# --- Section 6: Version des données du tableau de bord employé ---
+
+class EmployeeDataVersion(models.Model):
+    """
+    Version des données affichées par le tableau de bord d'un employé (une ligne par employé).
+    Elle est incrémentée à chaque écriture sur ses pointages, ses demandes de congé ou
+    son profil (voir core/utils/data_version.py) et sert à calculer les ETag des API du
+    tableau de bord : une réponse inchangée coûte une lecture sur clé primaire.
+    """
+    employee = models.OneToOneField(
+        Employee,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='data_version',
+        verbose_name="Employé",
+        help_text="L'employé concerné par cette version."
+    )
+    version = models.PositiveBigIntegerField(
+        default=0,
+        verbose_name="Version",
+        help_text="Incrémentée à chaque modification des données de l'employé."
+    )
+    updated_at = models.DateTimeField(
+        verbose_name="Dernière modification",
+        help_text="Date et heure de la dernière modification des données de l'employé."
+    )
+
+    class Meta:
+        verbose_name = "Version des données employé"
+        verbose_name_plural = "Versions des données employé"
+
+    def __str__(self):
+        """
+        Représentation textuelle de l'objet EmployeeDataVersion.
+        Retourne :
+            str: L'employé et le numéro de version.
+        """
+        return f"{self.employee} - v{self.version}"
+
+# --- Section 7: Calendrier des jours ouvrés ---
+
+class Holiday(models.Model):
+    """
+    Jour férié : non travaillé, il n'est compté ni dans les jours ouvrés ni dans
+    les absences (voir core/utils/work_calendar.py).
+    Un jour férié récurrent (ex: 1er janvier) s'applique chaque année au même jour
+    et au même mois ; les fêtes mobiles (Carnaval, Vendredi saint...) sont saisies
+    pour chaque année.
+    """
+    date = models.DateField(
+        unique=True,
+        verbose_name="Date",
+        help_text="Date du jour férié (pour un jour férié récurrent, seuls le jour et le mois comptent)."
+    )
+    name = models.CharField(
+        max_length=100,
+        verbose_name="Nom",
+        help_text="Nom du jour férié (ex: Jour de l'Indépendance)."
+    )
+    recurring = models.BooleanField(
+        default=False,
+        verbose_name="Récurrent",
+        help_text="Cocher si le jour férié revient chaque année à la même date."
+    )
+
+    class Meta:
+        verbose_name = "Jour férié"
+        verbose_name_plural = "Jours fériés"
+        ordering = ['date']
+
+    def __str__(self):
+        """
+        Représentation textuelle de l'objet Holiday.
+        Retourne :
+            str: Le nom et la date du jour férié.
+        """
+        if self.recurring:
+            return f"{self.name} ({self.date.strftime('%d/%m')}, chaque année)"
+        return f"{self.name} ({self.date.strftime('%d/%m/%Y')})"
+
 # --- Instructions post-définition des modèles ---
 # 
 # Exécutez les commandes suivantes pour appliquer les modifications à la base de données :
@@ -36,13 +36,14 @@ class EmployeeProfileSerializer(serializers.ModelSerializer):
     # Champ pour le nom complet (calculé)
     full_name = serializers.SerializerMethodField()
     
-    # Champ pour l'image QR code (géré au niveau de la vue)
+    # Champs pour l'image QR code (gérés au niveau de la vue)
     qr_code_image = serializers.CharField(read_only=True, required=False)
+    qr_code_image_url = serializers.CharField(read_only=True, required=False)
     
     class Meta:
         model = Employee
         fields = ['employee_id', 'user', 'department', 'role', 'nfc_id', 
-                  'qr_code', 'qr_code_image', 'full_name']
+                  'qr_code', 'qr_code_image', 'qr_code_image_url', 'full_name']
     
     def get_full_name(self, obj):
         """Méthode pour obtenir le nom complet de l'employé"""
@@ -0,0 +1,228 @@
+# Fichier : signals.py
+#
+# Description : Récepteurs de signaux de l'application core.
+#               Ils maintiennent à jour les caches et index dérivés des modèles.
+#               Ce module est chargé par CoreConfig.ready().
+
+from django.db.models import Q
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+
+from .models import Department, Role, User, Employee, AttendanceRecord, EmployeeDataVersion, LeaveBalance, LeaveRequest, Holiday
+from .utils import credential_index
+from .utils import data_version
+from .utils import day_summary
+from .utils import leave_balance
+from .utils import presence
+from .utils import stats_cache
+from .utils import work_calendar
+
+# Champs de User utilisés dans la fiche badge. Les sauvegardes limitées à
+# d'autres champs (ex: last_login, mis à jour à chaque connexion) sont ignorées.
+BADGE_USER_FIELDS = {'first_name', 'last_name', 'username', 'is_active'}
+
+
+@receiver(post_save, sender=Employee)
+@receiver(post_delete, sender=Employee)
+@receiver(post_save, sender=Department)
+@receiver(post_delete, sender=Department)
+@receiver(post_save, sender=Role)
+@receiver(post_delete, sender=Role)
+def invalidate_credential_index(sender, **kwargs):
+    """Invalide l'index des badges après toute modification d'un employé, département ou rôle."""
+    credential_index.invalidate()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_credential_index_for_user(sender, update_fields=None, **kwargs):
+    """Invalide l'index des badges si le nom ou le statut de l'utilisateur a pu changer."""
+    if update_fields is not None and not (set(update_fields) & BADGE_USER_FIELDS):
+        return
+    credential_index.invalidate()
+
+
+@receiver(post_save, sender=AttendanceRecord)
+def update_presence_state(sender, instance, created, raw=False, **kwargs):
+    """
+    Maintient l'état de présence matérialisé après l'enregistrement d'un pointage.
+    Un nouveau pointage est appliqué directement ; une modification (ex: depuis
+    l'administration) entraîne un recalcul à partir du dernier pointage.
+    """
+    if raw:
+        return
+    if created:
+        presence.apply_record(instance)
+    else:
+        presence.refresh_presence_state(instance.employee_id)
+
+
+@receiver(post_delete, sender=AttendanceRecord)
+def refresh_presence_state_on_delete(sender, instance, **kwargs):
+    """Recalcule l'état de présence après la suppression d'un pointage."""
+    presence.refresh_presence_state(instance.employee_id)
+
+
+@receiver(pre_save, sender=AttendanceRecord)
+def remember_previous_timestamp(sender, instance, raw=False, **kwargs):
+    """
+    Avant la modification d'un pointage existant, mémorise son employé et son
+    horodatage : si le pointage est déplacé, les jours autour de son ancienne
+    position doivent aussi être recalculés.
+    """
+    if raw or instance.pk is None:
+        return
+    instance._previous_position = AttendanceRecord.objects.filter(
+        pk=instance.pk
+    ).values_list('employee_id', 'timestamp').first()
+
+
+@receiver(post_save, sender=AttendanceRecord)
+def update_day_summary(sender, instance, raw=False, **kwargs):
+    """Recalcule les résumés journaliers affectés par le pointage (et par son ancienne position)."""
+    if raw:
+        return
+    changes = [(instance.employee_id, instance.timestamp)]
+    previous_position = getattr(instance, '_previous_position', None)
+    if previous_position is not None:
+        changes.append(previous_position)
+    day_summary.refresh_for_changes(changes)
+
+
+@receiver(post_delete, sender=AttendanceRecord)
+def update_day_summary_on_delete(sender, instance, **kwargs):
+    """Recalcule les résumés journaliers après la suppression d'un pointage."""
+    day_summary.refresh_for_records([instance])
+
+
+@receiver(post_save, sender=AttendanceRecord)
+@receiver(post_delete, sender=AttendanceRecord)
+@receiver(post_save, sender=LeaveRequest)
+@receiver(post_delete, sender=LeaveRequest)
+def bump_employee_data_version(sender, instance, raw=False, **kwargs):
+    """Change la version des données de l'employé concerné par un pointage ou une demande de congé."""
+    if raw:
+        return
+    employee_pks = {instance.employee_id}
+    previous_position = getattr(instance, '_previous_position', None)
+    if previous_position is not None:
+        employee_pks.add(previous_position[0])
+    data_version.bump(employee_pks)
+
+
+@receiver(post_save, sender=Employee)
+@receiver(post_save, sender=User)
+def bump_profile_data_version(sender, instance, raw=False, update_fields=None, **kwargs):
+    """
+    Change la version des données après une modification du profil. Le nom de
+    l'employé apparaît aussi dans les demandes de congé qu'il a traitées.
+    """
+    if raw or (sender is User and update_fields is not None and not (set(update_fields) & BADGE_USER_FIELDS)):
+        return
+    data_version.bump_queryset(EmployeeDataVersion.objects.filter(
+        Q(employee_id=instance.pk) | Q(employee__leave_requests__response_by_id=instance.pk)
+    ))
+
+
+@receiver(post_save, sender=Department)
+@receiver(post_save, sender=Role)
+def bump_members_data_version(sender, instance, raw=False, **kwargs):
+    """Change la version des données des employés d'un département ou d'un rôle renommé."""
+    if raw:
+        return
+    field = 'employee__department' if sender is Department else 'employee__role'
+    data_version.bump_queryset(EmployeeDataVersion.objects.filter(**{field: instance}))
+
+
+@receiver(post_save, sender=AttendanceRecord)
+@receiver(post_delete, sender=AttendanceRecord)
+@receiver(post_save, sender=LeaveRequest)
+@receiver(post_delete, sender=LeaveRequest)
+def invalidate_stats_cache(sender, instance, raw=False, **kwargs):
+    """Supprime les statistiques en cache de l'employé concerné par un pointage ou une demande de congé."""
+    if raw:
+        return
+    employee_pks = {instance.employee_id}
+    previous_position = getattr(instance, '_previous_position', None)
+    if previous_position is not None:
+        employee_pks.add(previous_position[0])
+    stats_cache.invalidate(employee_pks)
+
+
+@receiver(post_save, sender=Holiday)
+@receiver(post_delete, sender=Holiday)
+def invalidate_work_calendar(sender, raw=False, **kwargs):
+    """
+    Un jour férié modifié change les jours ouvrés de tous les employés : vide le
+    calendrier en mémoire, recalcule les soldes de congés (durées en jours ouvrés),
+    vide le cache des statistiques et change toutes les versions.
+    """
+    if raw:
+        return
+    work_calendar.invalidate()
+    leave_balance.rebuild_all()
+    stats_cache.invalidate_all()
+    data_version.bump_queryset(EmployeeDataVersion.objects.all())
+
+
+@receiver(pre_save, sender=LeaveRequest)
+@receiver(pre_delete, sender=LeaveRequest)
+def remember_previous_leave(sender, instance, raw=False, **kwargs):
+    """
+    Avant la modification ou la suppression d'une demande de congé existante, mémorise
+    son employé, ses dates et son statut enregistrés (l'instance peut être périmée, par
+    exemple après une action groupée) : leur contribution au solde de congés est retirée.
+    """
+    if raw or instance.pk is None:
+        return
+    origin = kwargs.get('origin')
+    if origin is not None and getattr(origin, 'model', type(origin)) is not LeaveRequest:
+        # Suppression en cascade (employé, utilisateur) : les soldes sont supprimés aussi
+        return
+    instance._previous_leave = LeaveRequest.objects.filter(
+        pk=instance.pk
+    ).values_list('employee_id', 'start_date', 'end_date', 'status').first()
+
+
+@receiver(post_save, sender=LeaveRequest)
+def update_leave_balance(sender, instance, raw=False, **kwargs):
+    """Met à jour le solde de congés après la création ou la modification d'une demande."""
+    if raw:
+        return
+    changes = leave_balance.new_changes()
+    previous_leave = getattr(instance, '_previous_leave', None)
+    if previous_leave is not None:
+        leave_balance.add_change(changes, *previous_leave, sign=-1)
+    leave_balance.add_change(changes, instance.employee_id, instance.start_date, instance.end_date, instance.status)
+    leave_balance.apply_changes(changes)
+
+
+@receiver(post_delete, sender=LeaveRequest)
+def update_leave_balance_on_delete(sender, instance, **kwargs):
+    """Retire la contribution d'une demande supprimée (sans créer de solde, l'employé peut être supprimé)."""
+    previous_leave = getattr(instance, '_previous_leave', None)
+    if previous_leave is None:
+        return
+    changes = leave_balance.new_changes()
+    leave_balance.add_change(changes, *previous_leave, sign=-1)
+    leave_balance.apply_changes(changes, create=False)
+
+
+@receiver(post_save, sender=Role)
+def refresh_role_leave_quota(sender, instance, raw=False, **kwargs):
+    """Applique le quota de congés du rôle aux soldes de ses employés."""
+    if raw:
+        return
+    balances = LeaveBalance.objects.filter(employee__role=instance)
+    if leave_balance.refresh_quota(balances, leave_balance.quota_for_role(instance)):
+        stats_cache.invalidate(Employee.objects.filter(role=instance).values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Employee)
+def refresh_employee_leave_quota(sender, instance, raw=False, **kwargs):
+    """Applique le quota de congés du rôle de l'employé (le rôle a pu changer) à ses soldes."""
+    if raw:
+        return
+    balances = LeaveBalance.objects.filter(employee=instance)
+    if leave_balance.refresh_quota(balances, leave_balance.quota_for_role(instance.role)):
+        stats_cache.invalidate([instance.pk])
@@ -1,3 +1,1753 @@
-from django.test import TestCase
+import base64
+import json
+import random
+import re
+import tempfile
+import zipfile
+from datetime import date, datetime, time, timedelta
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import path, reverse
+from django.utils import timezone
+
+from .models import Department, Role, User, Employee, AttendanceRecord, AttendanceDaySummary, PresenceState, LeaveRequest, LeaveBalance, Holiday
+from .utils import attendance_stats, badge_sheets, credential_index, dashboard, day_summary, generate_qr_code, kiosk_token, leave_balance, presence, punch_queue, qr_badge, scan_ingestion, stats_cache, work_calendar
+from .views.kiosk_async_view import authenticate_card_async, record_attendance_async
+from .views.kiosk_view import punch_confirmation, record_punch
+
+# URL des vues asynchrones du kiosque (activées par KIOSK_ASYNC_VIEWS au chargement de core/urls.py)
+urlpatterns = [
+    path('api/authenticate-card/', authenticate_card_async, name='authenticate_card'),
+    path('api/record-attendance/', record_attendance_async, name='record_attendance'),
+]
+
+
+def use_temporary_media_root(test):
+    """Enregistre les fichiers du stockage par défaut (images des badges) dans un dossier temporaire."""
+    media_root = tempfile.TemporaryDirectory()
+    test.addCleanup(media_root.cleanup)
+    test.enterContext(test.settings(MEDIA_ROOT=media_root.name))
+
+
+class QueryPlanTests(TestCase):
+    """
+    Vérifie, sur un jeu de données de test, que les requêtes des vues du kiosque
+    et du tableau de bord employé utilisent les index et ne dégénèrent pas en
+    parcours complet (full scan) des tables de l'application.
+    """
+    NB_EMPLOYEES = 20
+    DAYS_OF_HISTORY = 30
+
+    @classmethod
+    def setUpTestData(cls):
+        department = Department.objects.create(name="Informatique")
+        role = Role.objects.create(name="Développeur")
+        now = timezone.now()
+
+        records = []
+        leaves = []
+        for i in range(cls.NB_EMPLOYEES):
+            user = User.objects.create_user(
+                username=f"employe{i}", password="secret", first_name="Prénom", last_name=f"Nom{i}"
+            )
+            employee = Employee.objects.create(
+                user=user,
+                employee_id=f"EMP{i:03d}",
+                department=department,
+                role=role,
+                nfc_id=f"NFC-{i:03d}",
+                qr_code=f"QR-{i:03d}",
+            )
+            for day in range(1, cls.DAYS_OF_HISTORY + 1):
+                start = now - timedelta(days=day, hours=1)
+                records.append(AttendanceRecord(employee=employee, record_type='IN', timestamp=start))
+                records.append(AttendanceRecord(employee=employee, record_type='OUT', timestamp=start + timedelta(hours=8)))
+            for status in ('PENDING', 'APPROVED', 'REJECTED'):
+                leaves.append(LeaveRequest(
+                    employee=employee,
+                    start_date=now.date() + timedelta(days=10),
+                    end_date=now.date() + timedelta(days=12),
+                    leave_type='VACATION',
+                    reason="Test",
+                    status=status,
+                    response_by=employee if status != 'PENDING' else None,
+                ))
+        # bulk_create n'émet pas de signaux : l'état de présence sera construit à la demande
+        AttendanceRecord.objects.bulk_create(records)
+        LeaveRequest.objects.bulk_create(leaves)
+
+        cls.employee = Employee.objects.select_related('user').get(employee_id='EMP000')
+        cls.user = cls.employee.user
+        cls.leave = LeaveRequest.objects.filter(employee=cls.employee, status='PENDING').first()
+
+    def setUp(self):
+        credential_index.invalidate()
+        use_temporary_media_root(self)
+        # Réponses de scan conservées par l'anti-rebond du kiosque
+        cache.clear()
+
+    # --- Outils ---
+
+    def _explain(self, sql):
+        """Retourne la liste des tables parcourues intégralement par une requête."""
+        full_scans = []
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+                for row in cursor.fetchall():
+                    detail = row[-1]
+                    # "SCAN <table>" = parcours complet ; "SEARCH <table> USING ..." = accès indexé
+                    if detail.startswith('SCAN core_'):
+                        full_scans.append(detail)
+            elif connection.vendor == 'mysql':
+                cursor.execute(f"EXPLAIN {sql}")
+                columns = [column[0] for column in cursor.description]
+                for row in cursor.fetchall():
+                    plan = dict(zip(columns, row))
+                    if (plan.get('table') or '').startswith('core_') and plan.get('type') in ('ALL', 'index'):
+                        full_scans.append(f"{plan['table']} ({plan['type']})")
+            else:
+                self.skipTest(f"Plan d'exécution non analysé pour {connection.vendor}")
+        return full_scans
+
+    def assertNoFullScan(self, queries):
+        """Échoue si une des requêtes SELECT capturées parcourt intégralement une table."""
+        selects = [query['sql'] for query in queries if query['sql'].lstrip().upper().startswith('SELECT')]
+        self.assertTrue(selects, "Aucune requête SELECT capturée")
+        for sql in selects:
+            full_scans = self._explain(sql)
+            self.assertEqual(full_scans, [], f"Parcours complet détecté pour :\n{sql}")
+
+    def _capture(self, method, url, data=None):
+        with CaptureQueriesContext(connection) as context:
+            if method == 'post':
+                response = self.client.post(url, json.dumps(data or {}), content_type='application/json')
+            else:
+                response = self.client.get(url, data or {})
+        self.assertLess(response.status_code, 500, response.content)
+        return context.captured_queries
+
+    # --- Kiosque ---
+
+    def test_kiosk_credential_lookup_fallback(self):
+        # L'index des badges est chargé en bloc ; les recherches directes doivent être indexées
+        with CaptureQueriesContext(connection) as context:
+            Employee.objects.filter(nfc_id='NFC-005').first()
+            Employee.objects.filter(qr_code='QR-005').first()
+        self.assertNoFullScan(context.captured_queries)
+
+    def test_kiosk_authenticate_card(self):
+        credential_index.get_badge_record(qr_code='QR-000')
+        self.assertNoFullScan(self._capture('post', reverse('authenticate_card'), {'qr_code': 'QR-000'}))
+
+    def test_kiosk_record_attendance(self):
+        self.client.force_login(self.user)
+        queries = self._capture('post', reverse('record_attendance'), {'employee_id': 'EMP000', 'record_type': 'IN'})
+        self.assertNoFullScan(queries)
+
+    # --- Tableau de bord employé ---
+
+    def test_profile(self):
+        self.client.force_login(self.user)
+        self.assertNoFullScan(self._capture('get', reverse('api_profile')))
+
+    def test_stats(self):
+        self.client.force_login(self.user)
+        self.assertNoFullScan(self._capture('get', reverse('api_stats')))
+
+    def test_history(self):
+        self.client.force_login(self.user)
+        for period in ('day', 'week', 'month', 'year'):
+            with self.subTest(period=period):
+                self.assertNoFullScan(self._capture('get', reverse('api_attendance_history'), {'period': period}))
+        with self.subTest(record_type='IN'):
+            self.assertNoFullScan(self._capture(
+                'get', reverse('api_attendance_history'), {'period': 'month', 'record_type': 'IN'}
+            ))
+
+    def test_leave_list(self):
+        self.client.force_login(self.user)
+        for status in ('ALL', 'PENDING', 'APPROVED'):
+            with self.subTest(status=status):
+                self.assertNoFullScan(self._capture('get', reverse('api_leaves_list'), {'status': status}))
+
+    def test_leave_detail(self):
+        self.client.force_login(self.user)
+        self.assertNoFullScan(self._capture('get', reverse('api_leaves_detail', args=[self.leave.id])))
+
+    def test_leave_create(self):
+        self.client.force_login(self.user)
+        start = timezone.now().date() + timedelta(days=30)
+        queries = self._capture('post', reverse('api_leaves_create'), {
+            'start_date': start.strftime('%Y-%m-%d'),
+            'end_date': (start + timedelta(days=2)).strftime('%Y-%m-%d'),
+            'leave_type': 'VACATION',
+        })
+        self.assertNoFullScan(queries)
+
+    def test_leave_cancel(self):
+        self.client.force_login(self.user)
+        self.assertNoFullScan(self._capture('post', reverse('api_leaves_action', args=[self.leave.id])))
+
+
+class CredentialIndexTests(TestCase):
+    """Vérifie l'index des badges du kiosque : recherche, invalidation entre processus, comptes inactifs."""
+
+    def setUp(self):
+        cache.clear()
+        credential_index.invalidate()
+        self.user = User.objects.create_user(username="badge-index", password="secret", first_name="Ada", last_name="Index")
+        self.employee = Employee.objects.create(user=self.user, employee_id="IDX001", nfc_id="NFC-IDX", qr_code="QR-IDX")
+
+    def test_hit_and_miss(self):
+        record = credential_index.get_badge_record(nfc_id="NFC-IDX")
+        self.assertEqual(record['employee_id'], "IDX001")
+        self.assertEqual(record['name'], "Ada Index")
+        # Index chargé : la recherche suivante ne lit que la génération dans le cache
+        with self.assertNumQueries(0):
+            self.assertEqual(credential_index.get_badge_record(qr_code="QR-IDX"), record)
+        self.assertIsNone(credential_index.get_badge_record(qr_code="QR-INCONNU"))
+
+    def test_invalidation_from_another_process(self):
+        self.assertIsNotNone(credential_index.get_badge_record(qr_code="QR-IDX"))
+        # Badge renouvelé sans signal dans ce processus : l'index local est périmé
+        Employee.objects.filter(pk=self.employee.pk).update(qr_code="QR-IDX-NEW")
+        self.assertIsNotNone(credential_index.get_badge_record(qr_code="QR-IDX"))
+        # Un autre processus invalide : la génération partagée change
+        credential_index._next_generation()
+        self.assertIsNone(credential_index.get_badge_record(qr_code="QR-IDX"))
+        self.assertEqual(credential_index.get_badge_record(qr_code="QR-IDX-NEW")['employee_id'], "IDX001")
+
+    def test_inactive_user(self):
+        self.assertIsNotNone(credential_index.get_badge_record(nfc_id="NFC-IDX"))
+        self.user.is_active = False
+        self.user.save(update_fields=['is_active'])
+        self.assertIsNone(credential_index.get_badge_record(nfc_id="NFC-IDX"))
+        response = self.client.post(reverse('authenticate_card'), json.dumps({'nfc_id': "NFC-IDX"}),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 404)
+
+
+class PresenceStateTests(TestCase):
+    """Vérifie la machine à états de présence (utils/presence.py) et son recalcul."""
+
+    def setUp(self):
+        user = User.objects.create_user(username="presence", password="secret")
+        self.employee = Employee.objects.create(user=user, employee_id="PRE001")
+
+    def state(self):
+        return PresenceState.objects.get(employee=self.employee).state
+
+    def test_transitions(self):
+        self.assertEqual(presence.get_presence_state(self.employee).state, 'OUT')
+        for record_type, state in (('IN', 'IN'), ('BREAK_START', 'ON_BREAK'), ('BREAK_END', 'IN'), ('OUT', 'OUT')):
+            with self.subTest(record_type=record_type):
+                record = record_punch(self.employee, record_type)
+                self.assertIsNotNone(record)
+                self.assertEqual(self.state(), state)
+                self.assertEqual(PresenceState.objects.get(employee=self.employee).last_record_id, record.pk)
+        self.assertEqual(AttendanceRecord.objects.filter(employee=self.employee).count(), 4)
+
+    def test_rejected_transitions(self):
+        rejected = {
+            'OUT': ('OUT', 'BREAK_START', 'BREAK_END'),
+            'IN': ('IN', 'BREAK_END'),
+            'ON_BREAK': ('IN', 'OUT', 'BREAK_START'),
+        }
+        for setup, state in (((), 'OUT'), (('IN',), 'IN'), (('BREAK_START',), 'ON_BREAK')):
+            for record_type in setup:
+                self.assertIsNotNone(record_punch(self.employee, record_type))
+            for record_type in rejected[state]:
+                with self.subTest(state=state, record_type=record_type):
+                    self.assertFalse(presence.is_valid_transition(state, record_type))
+                    self.assertIsNone(record_punch(self.employee, record_type))
+                    self.assertEqual(self.state(), state)
+        self.assertEqual(AttendanceRecord.objects.filter(employee=self.employee).count(), 2)
+
+    def test_rebuild_after_admin_edit_and_delete(self):
+        now = timezone.now()
+        AttendanceRecord.objects.create(employee=self.employee, record_type='IN', timestamp=now - timedelta(hours=2))
+        last = AttendanceRecord.objects.create(employee=self.employee, record_type='OUT', timestamp=now - timedelta(hours=1))
+        self.assertEqual(self.state(), 'OUT')
+
+        self.client.force_login(User.objects.create_superuser(username="presence-admin", password="secret"))
+        local = timezone.localtime(last.timestamp)
+        response = self.client.post(reverse('admin:core_attendancerecord_change', args=[last.pk]), {
+            'employee': self.employee.pk,
+            'timestamp_0': local.strftime('%Y-%m-%d'),
+            'timestamp_1': local.strftime('%H:%M:%S'),
+            'record_type': 'BREAK_START',
+            'location': '', 'note': '', 'kiosk_id': '',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.state(), 'ON_BREAK')
+
+        response = self.client.post(reverse('admin:core_attendancerecord_delete', args=[last.pk]), {'post': 'yes'})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.state(), 'IN')
+
+        # État absent (ex: pointages importés sans signaux) : reconstruit à la lecture
+        PresenceState.objects.filter(employee=self.employee).delete()
+        self.assertEqual(presence.get_presence_state(self.employee.pk).state, 'IN')
+        self.assertTrue(PresenceState.objects.filter(employee=self.employee).exists())
+
+    def test_fixture_load_skips_presence(self):
+        from django.core import serializers
+        fixture = json.dumps([{
+            'model': 'core.attendancerecord',
+            'pk': 9001,
+            'fields': {'employee': self.employee.pk, 'record_type': 'IN', 'timestamp': timezone.now().isoformat()},
+        }])
+        # Chargement de données (loaddata) : sauvegarde brute (UPDATE puis INSERT), sans
+        # écriture de l'état de présence ni des autres données dérivées
+        with self.assertNumQueries(2):
+            for obj in serializers.deserialize('json', fixture):
+                obj.save()
+        self.assertFalse(PresenceState.objects.filter(employee=self.employee).exists())
+        # État reconstruit à la première lecture
+        self.assertEqual(presence.get_presence_state(self.employee.pk).state, 'IN')
+
+
+class CombinedScanTests(TestCase):
+    """Vérifie le mode combiné d'authenticate_card (scan et pointage en une requête) et la confirmation."""
+
+    def setUp(self):
+        cache.clear()
+        credential_index.invalidate()
+        self.enterContext(self.settings(KIOSK_SCAN_DEBOUNCE_WINDOW=0))
+        user = User.objects.create_user(username="combined", password="secret", first_name="Léa", last_name="Scan")
+        self.employee = Employee.objects.create(user=user, employee_id="CMB001", qr_code="QR-CMB")
+
+    def scan(self, **data):
+        return self.client.post(reverse('authenticate_card'), json.dumps({'qr_code': "QR-CMB", 'kiosk_id': "k1", **data}),
+                                content_type='application/json')
+
+    def test_auto_record_single_action(self):
+        data = self.scan(auto_record=True).json()
+        self.assertTrue(data['recorded'])
+        self.assertEqual(data['employee_name'], "Léa Scan")
+        self.assertEqual(data['record_type'], "Entrée (Clock In)")
+        self.assertEqual([action['value'] for action in data['available_actions']], ['OUT', 'BREAK_START'])
+        record = AttendanceRecord.objects.get(employee=self.employee)
+        self.assertEqual((record.pk, record.record_type, record.kiosk_id), (data['record_id'], 'IN', "k1"))
+        self.assertFalse(data['queued'])
+
+        # Deux actions possibles : pas de pointage automatique, jeton pour le choix de l'employé
+        data = self.scan(auto_record=True).json()
+        self.assertFalse(data['recorded'])
+        self.assertIn('kiosk_token', data)
+        self.assertEqual(AttendanceRecord.objects.filter(employee=self.employee).count(), 1)
+
+    def test_explicit_record_type(self):
+        response = self.scan(record_type='BREAK_END')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([action['value'] for action in response.json()['available_actions']], ['IN'])
+        self.assertEqual(self.scan(record_type='PAUSE').status_code, 400)
+        self.assertFalse(AttendanceRecord.objects.exists())
+
+        data = self.scan(record_type='IN').json()
+        self.assertTrue(data['recorded'])
+        data = self.scan(record_type='BREAK_START').json()
+        self.assertEqual([action['value'] for action in data['available_actions']], ['BREAK_END'])
+        self.assertEqual(PresenceState.objects.get(employee=self.employee).state, 'ON_BREAK')
+
+    def test_punch_confirmation_of_queued_record(self):
+        record = AttendanceRecord(employee=self.employee, record_type='OUT', timestamp=timezone.now())
+        confirmation = punch_confirmation(record, "Léa Scan")
+        self.assertTrue(confirmation['queued'])
+        self.assertIsNone(confirmation['record_id'])
+        self.assertEqual(confirmation['record_type'], "Sortie (Clock Out)")
+        self.assertEqual([action['value'] for action in confirmation['available_actions']], ['IN'])
+
+
+@override_settings(ROOT_URLCONF='core.tests', QUERY_COUNT_HEADERS=True, KIOSK_SCAN_DEBOUNCE_WINDOW=0)
+class KioskAsyncViewTests(TestCase):
+    """Vérifie les vues asynchrones du kiosque et les en-têtes de QueryCountMiddleware sous ASGI."""
+
+    def setUp(self):
+        cache.clear()
+        credential_index.invalidate()
+        user = User.objects.create_user(username="async", password="secret", first_name="Ana", last_name="Sync")
+        self.employee = Employee.objects.create(user=user, employee_id="ASY001", nfc_id="NFC-ASY")
+
+    async def post(self, name, **data):
+        return await self.async_client.post(reverse(name), json.dumps({'kiosk_id': "k1", **data}),
+                                            content_type='application/json')
+
+    async def test_scan_then_punch(self):
+        response = await self.post('authenticate_card', nfc_id="NFC-ASY")
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertFalse(data['recorded'])
+        self.assertEqual([action['value'] for action in data['available_actions']], ['IN'])
+        self.assertGreaterEqual(int(response['X-DB-Query-Count']), 1)
+        self.assertIn('X-DB-Time-Ms', response)
+
+        response = await self.post('record_attendance', employee_id="ASY001", record_type='IN',
+                                   kiosk_token=data['kiosk_token'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['employee_name'], "Ana Sync")
+        # Verrou de l'état de présence + insertion + mises à jour des signaux, dans le thread de sync_to_async
+        self.assertGreater(int(response['X-DB-Query-Count']), 2)
+
+        response = await self.post('record_attendance', employee_id="ASY001", record_type='OUT',
+                                   kiosk_token=data['kiosk_token'])
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(await AttendanceRecord.objects.filter(employee_id=self.employee.pk).acount(), 1)
+
+    async def test_combined_scan_and_errors(self):
+        response = await self.post('authenticate_card', nfc_id="NFC-ASY", auto_record=True)
+        self.assertEqual(response.json()['record_type'], "Entrée (Clock In)")
+        response = await self.post('authenticate_card', nfc_id="NFC-ASY", record_type='IN')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([action['value'] for action in response.json()['available_actions']], ['OUT', 'BREAK_START'])
+
+        self.assertEqual((await self.post('authenticate_card')).status_code, 400)
+        self.assertEqual((await self.post('authenticate_card', nfc_id="INCONNU")).status_code, 404)
+        self.assertEqual((await self.post('record_attendance', employee_id="ASY001", record_type='IN')).status_code, 401)
+
+        token = kiosk_token.make_kiosk_token(self.employee.pk, "k1")
+        response = await self.post('record_attendance', employee_id="ASY001", record_type='PAUSE', kiosk_token=token)
+        self.assertEqual((response.status_code, response.json()['error']), (400, "Type de pointage invalide"))
+        token = kiosk_token.make_kiosk_token(self.employee.pk, "k1")
+        response = await self.post('record_attendance', employee_id="ASY999", record_type='OUT', kiosk_token=token)
+        self.assertEqual(response.status_code, 404)
+
+
+class ScanDebounceTests(TestCase):
+    """Vérifie l'anti-rebond des scans : rejeu d'un scan répété, oubli après un pointage."""
+
+    def setUp(self):
+        cache.clear()
+        credential_index.invalidate()
+        self.enterContext(self.settings(KIOSK_SCAN_DEBOUNCE_WINDOW=30))
+        user = User.objects.create_user(username="debounce", password="secret")
+        self.employee = Employee.objects.create(user=user, employee_id="DEB001", nfc_id="NFC-DEB")
+
+    def scan(self, **data):
+        return self.client.post(reverse('authenticate_card'), json.dumps({'nfc_id': "NFC-DEB", 'kiosk_id': "k1", **data}),
+                                content_type='application/json')
+
+    def test_duplicate_scans(self):
+        first = self.scan(auto_record=True)
+        self.assertTrue(first.json()['recorded'])
+        with self.assertNumQueries(0):
+            duplicate = self.scan(auto_record=True)
+        self.assertEqual(duplicate['X-Scan-Debounced'], '1')
+        self.assertEqual(duplicate.content, first.content)
+        self.assertEqual(AttendanceRecord.objects.filter(employee=self.employee).count(), 1)
+
+        # Le mode combiné fait partie de la clé : un scan simple n'est pas confondu avec lui
+        response = self.scan()
+        self.assertNotIn('X-Scan-Debounced', response)
+        self.assertEqual([action['value'] for action in response.json()['available_actions']], ['OUT', 'BREAK_START'])
+        response = self.scan(record_type='OUT')
+        self.assertNotIn('X-Scan-Debounced', response)
+        self.assertTrue(response.json()['recorded'])
+        self.assertEqual(self.scan(record_type='OUT')['X-Scan-Debounced'], '1')
+        self.assertEqual(AttendanceRecord.objects.filter(employee=self.employee).count(), 2)
+
+    def test_punch_then_rescan(self):
+        data = self.scan().json()
+        self.assertEqual(self.scan()['X-Scan-Debounced'], '1')
+        response = self.client.post(reverse('record_attendance'), json.dumps({
+            'employee_id': "DEB001", 'record_type': 'IN', 'kiosk_id': "k1", 'kiosk_token': data['kiosk_token'],
+        }), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+
+        # Nouveau scan dans la fenêtre : actions à jour et nouveau jeton
+        response = self.scan()
+        self.assertNotIn('X-Scan-Debounced', response)
+        rescan = response.json()
+        self.assertEqual([action['value'] for action in rescan['available_actions']], ['OUT', 'BREAK_START'])
+        self.assertNotEqual(rescan['kiosk_token'], data['kiosk_token'])
+
+        # Le pointage sur un autre kiosque n'oublie que le scan de ce kiosque
+        self.assertEqual(self.scan()['X-Scan-Debounced'], '1')
+        record_punch(self.employee, 'OUT', kiosk_id="k2")
+        self.assertEqual(self.scan()['X-Scan-Debounced'], '1')
+
+
+class PunchQueueTests(TestCase):
+    """Vérifie la file d'attente des pointages (mode write-behind) : ajout, transfert, reprise, purge et métriques."""
+
+    def setUp(self):
+        cache.clear()
+        directory = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(self.settings(PUNCH_WRITE_BEHIND=True, PUNCH_QUEUE_PATH=f"{directory}/queue.sqlite3"))
+        user = User.objects.create_user(username="queue", password="secret")
+        self.employee = Employee.objects.create(user=user, employee_id="QUE001")
+
+    def test_enqueue_and_flush(self):
+        record = record_punch(self.employee, 'IN', kiosk_id="k1")
+        self.assertIsNone(record.pk)
+        self.assertEqual(punch_queue.pending_state(self.employee), 'IN')
+        # Validé contre les pointages en attente, pas encore contre la base principale
+        self.assertIsNone(record_punch(self.employee, 'IN'))
+        self.assertIsNotNone(record_punch(self.employee, 'BREAK_START'))
+        self.assertFalse(AttendanceRecord.objects.exists())
+        self.assertEqual(punch_queue.get_metrics()['depth'], 2)
+
+        self.assertEqual(punch_queue.flush_pending(), 2)
+        self.assertEqual(punch_queue.flush_pending(), 0)
+        stored = AttendanceRecord.objects.get(idempotency_key=record.idempotency_key)
+        self.assertEqual((stored.record_type, stored.kiosk_id), ('IN', "k1"))
+        self.assertEqual(PresenceState.objects.get(employee=self.employee).state, 'ON_BREAK')
+        self.assertIsNone(punch_queue.pending_state(self.employee))
+        self.assertIsNone(record_punch(self.employee, 'OUT'))
+        self.assertIsNotNone(record_punch(self.employee, 'BREAK_END'))
+
+    def test_enqueue_reads_database_before_lock(self):
+        opened = []
+        original = punch_queue._WriteLock.__enter__
+
+        def enter(lock):
+            opened.append(True)
+            return original(lock)
+
+        def get_presence_state(*args, **kwargs):
+            # La base principale est lue avant le verrou de la file
+            self.assertEqual(opened, [])
+            return PresenceState(employee=self.employee, state='OUT')
+
+        with mock.patch.object(punch_queue._WriteLock, '__enter__', enter), \
+                mock.patch.object(presence, 'get_presence_state', get_presence_state):
+            self.assertIsNotNone(punch_queue.enqueue_punch(self.employee, 'IN'))
+        self.assertEqual(opened, [True])
+
+    def test_flushed_during_database_read(self):
+        # Pointage transféré entre la lecture de la base principale (état périmé) et le verrou
+        record_punch(self.employee, 'IN')
+
+        def get_presence_state(*args, **kwargs):
+            punch_queue.flush_pending()
+            return PresenceState(employee=self.employee, state='OUT')
+
+        with mock.patch.object(presence, 'get_presence_state', get_presence_state):
+            self.assertIsNone(punch_queue.enqueue_punch(self.employee, 'IN'))
+        self.assertEqual(AttendanceRecord.objects.count(), 1)
+
+    def test_flush_failure_then_retry(self):
+        record_punch(self.employee, 'IN')
+        with mock.patch.object(scan_ingestion, 'bulk_insert_records', side_effect=RuntimeError("base indisponible")):
+            with self.assertRaises(RuntimeError):
+                punch_queue.flush_pending()
+        metrics = punch_queue.get_metrics()
+        self.assertEqual((metrics['depth'], metrics['failing'], metrics['last_error']), (1, 1, "base indisponible"))
+        self.assertIsNone(metrics['last_flush_at'])
+        self.assertFalse(AttendanceRecord.objects.exists())
+
+        self.assertEqual(punch_queue.flush_pending(), 1)
+        metrics = punch_queue.get_metrics()
+        self.assertEqual((metrics['depth'], metrics['failing'], metrics['last_error']), (0, 0, None))
+        self.assertEqual(metrics['flush_lag_s']['count'], 1)
+        self.assertIsNotNone(metrics['last_flush_at'])
+        self.assertEqual(AttendanceRecord.objects.filter(employee=self.employee).count(), 1)
+
+    def test_purge_and_metrics_view(self):
+        record_punch(self.employee, 'IN')
+        punch_queue.flush_pending()
+        record_punch(self.employee, 'OUT')
+        self.assertEqual(punch_queue.purge_flushed(retention=3600), 0)
+        self.assertEqual(punch_queue.purge_flushed(retention=-1), 1)
+        self.assertEqual(punch_queue.get_metrics()['depth'], 1)
+
+        url = reverse('punch_queue_metrics')
+        self.client.force_login(self.employee.user)
+        self.assertEqual(self.client.get(url).status_code, 403)
+        staff = User.objects.create_user(username="queue-staff", password="secret", is_staff=True)
+        self.client.force_login(staff)
+        data = self.client.get(url).json()
+        self.assertTrue(data['enabled'])
+        self.assertEqual((data['depth'], data['failing']), (1, 0))
+
+
+class KioskLoadTestSeedTests(TestCase):
+    """Vérifie la préparation des données de kiosk_loadtest et le scan combiné qu'il rejoue."""
+
+    def test_seed_and_combined_scans(self):
+        from django.core.management import call_command
+        cache.clear()
+        call_command('kiosk_loadtest', employees=4, outgoing_ratio=0.5, seed=1, seed_only=True, stdout=StringIO())
+        employees = Employee.objects.filter(user__username__startswith='loadtest_')
+        self.assertEqual(employees.count(), 4)
+        outgoing = set(AttendanceRecord.objects.filter(employee__in=employees).values_list('employee_id', flat=True))
+        self.assertEqual(len(outgoing), 2)
+        # Pointages insérés sans signaux : l'état de présence sera reconstruit au premier scan
+        self.assertFalse(PresenceState.objects.filter(employee__in=employees).exists())
+
+        for employee in employees:
+            record_type = 'OUT' if employee.pk in outgoing else 'IN'
+            with self.subTest(employee=employee.employee_id):
+                response = self.client.post(reverse('authenticate_card'), json.dumps({
+                    'nfc_id': employee.nfc_id, 'kiosk_id': "loadtest-kiosk-1", 'record_type': record_type,
+                }), content_type='application/json')
+                self.assertTrue(response.json()['recorded'])
+                self.assertEqual(PresenceState.objects.get(employee=employee).state, record_type)
+
+        call_command('kiosk_loadtest', cleanup=True, stdout=StringIO())
+        self.assertFalse(Employee.objects.filter(user__username__startswith='loadtest_').exists())
+
+
+class KioskTokenTests(TestCase):
+    """Vérifie les jetons de kiosque : usage unique, signature, expiration et kiosque."""
+
+    def setUp(self):
+        cache.clear()
+        credential_index.invalidate()
+        user = User.objects.create_user(username="token", password="secret")
+        self.employee = Employee.objects.create(user=user, employee_id="TOK001", nfc_id="NFC-TOK")
+
+    def punch(self, token, record_type='IN', kiosk_id="k1"):
+        return self.client.post(reverse('record_attendance'), json.dumps({
+            'employee_id': "TOK001", 'record_type': record_type, 'kiosk_id': kiosk_id, 'kiosk_token': token,
+        }), content_type='application/json')
+
+    def test_single_use(self):
+        data = self.client.post(reverse('authenticate_card'), json.dumps({'nfc_id': "NFC-TOK", 'kiosk_id': "k1"}),
+                                content_type='application/json').json()
+        self.assertEqual(data['kiosk_token_expires_in'], kiosk_token.DEFAULT_MAX_AGE)
+        self.assertEqual(self.punch(data['kiosk_token']).status_code, 200)
+        # Rejeu du jeton pour un autre pointage pourtant valide
+        response = self.punch(data['kiosk_token'], 'BREAK_START')
+        self.assertEqual(response.status_code, 401)
+        self.assertIn("déjà utilisé", response.json()['error'])
+        self.assertEqual(AttendanceRecord.objects.filter(employee=self.employee).count(), 1)
+
+    def test_rejected_tokens(self):
+        token = kiosk_token.make_kiosk_token(self.employee.pk, "k1")
+
+        response = self.punch(token[:-4] + ("AAAA" if not token.endswith("AAAA") else "BBBB"))
+        self.assertEqual((response.status_code, response.json()['error']), (401, "Jeton de kiosque invalide"))
+
+        with mock.patch('django.core.signing.time.time', return_value=1_000_000_000):
+            expired = kiosk_token.make_kiosk_token(self.employee.pk, "k1")
+        response = self.punch(expired)
+        self.assertEqual(response.status_code, 401)
+        self.assertIn("expiré", response.json()['error'])
+
+        # Autre kiosque : refusé sans consommer le jeton
+        self.assertEqual(self.punch(token, kiosk_id="k2").status_code, 403)
+        other = User.objects.create_user(username="token-other", password="secret")
+        Employee.objects.create(user=other, employee_id="TOK002")
+        self.assertEqual(self.punch(kiosk_token.make_kiosk_token(other.pk, "k1")).status_code, 403)
+
+        self.assertEqual(self.punch(token).status_code, 200)
+        self.assertEqual(AttendanceRecord.objects.filter(employee=self.employee).count(), 1)
+
+
+class SharedCacheCheckTests(TestCase):
+    """Vérifie l'avertissement émis quand le cache par défaut n'est pas partagé entre les processus."""
+
+    def test_local_cache_warning(self):
+        from .checks import check_shared_cache
+        self.assertEqual([warning.id for warning in check_shared_cache(None)], ['core.W001'])
+        redis = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://localhost:6379/0'}}
+        with self.settings(CACHES=redis):
+            self.assertEqual(check_shared_cache(None), [])
+
+
+class ScanBatchTests(TestCase):
+    """Vérifie l'envoi groupé des scans d'un kiosque : clé du kiosque, ancienneté, idempotence."""
+
+    KIOSK_ID = "kiosk-batch"
+
+    def setUp(self):
+        cache.clear()
+        credential_index.invalidate()
+        user = User.objects.create_user(username="batch", password="secret")
+        self.employee = Employee.objects.create(user=user, employee_id="BAT001", nfc_id="NFC-BAT")
+
+    def post(self, scans, key=None, kiosk_id=KIOSK_ID):
+        headers = {'HTTP_X_KIOSK_KEY': key if key is not None else kiosk_token.make_kiosk_key(kiosk_id)}
+        return self.client.post(reverse('record_attendance_batch'), json.dumps({'kiosk_id': kiosk_id, 'scans': scans}),
+                                content_type='application/json', **headers)
+
+    def scan(self, key, record_type='IN', age=timedelta(minutes=30), **extra):
+        return {'nfc_id': "NFC-BAT", 'record_type': record_type, 'idempotency_key': key,
+                'timestamp': (timezone.now() - age).isoformat(), **extra}
+
+    def test_kiosk_key_required(self):
+        self.assertEqual(self.post([self.scan("k1")], key='').status_code, 401)
+        self.assertEqual(self.post([self.scan("k1")], key=kiosk_token.make_kiosk_key("kiosk-autre")).status_code, 401)
+        self.assertFalse(AttendanceRecord.objects.exists())
+
+    def test_batch_and_resend(self):
+        scans = [self.scan("k1", 'IN', timedelta(hours=2)), self.scan("k2", 'OUT', timedelta(hours=1))]
+        data = self.post(scans).json()
+        self.assertEqual((data['created'], data['duplicates'], data['rejected']), (2, 0, 0))
+        self.assertEqual(PresenceState.objects.get(employee=self.employee).state, 'OUT')
+        self.assertEqual(set(AttendanceRecord.objects.values_list('kiosk_id', flat=True)), {self.KIOSK_ID})
+
+        data = self.post(scans).json()
+        self.assertEqual((data['created'], data['duplicates']), (0, 2))
+
+    def test_same_key_on_two_kiosks(self):
+        # Les clés d'idempotence sont propres à chaque kiosque : pas de faux doublon
+        first = self.post([self.scan("k1", 'IN', timedelta(hours=2))]).json()['results'][0]
+        second = self.post([self.scan("k1", 'OUT', timedelta(hours=1))], kiosk_id="kiosk-autre").json()['results'][0]
+        self.assertEqual((first['status'], second['status']), ('created', 'created'))
+        self.assertNotEqual(first['record_id'], second['record_id'])
+        self.assertEqual(PresenceState.objects.get(employee=self.employee).state, 'OUT')
+
+        # Renvoi par le second kiosque : doublon de son propre pointage
+        resent = self.post([self.scan("k1", 'OUT', timedelta(hours=1))], kiosk_id="kiosk-autre").json()['results'][0]
+        self.assertEqual((resent['status'], resent['record_id']), ('duplicate', second['record_id']))
+        self.assertEqual(AttendanceRecord.objects.count(), 2)
+
+    def test_rejected_scans(self):
+        with self.settings(KIOSK_MAX_BACKDATE=3600):
+            data = self.post([
+                self.scan("old", age=timedelta(hours=2)),
+                self.scan("other", kiosk_id="kiosk-autre"),
+                self.scan("ok"),
+            ]).json()
+        self.assertEqual([result['status'] for result in data['results']], ['rejected', 'rejected', 'created'])
+        self.assertEqual(data['results'][0]['error'], "Horodatage trop ancien")
+        self.assertEqual(data['results'][1]['error'], "Scan émis par un autre kiosque")
+
+    def test_concurrent_batch_with_same_key(self):
+        # Lot concurrent enregistré après la vérification des clés : pas d'erreur 500, scan en doublon
+        # (état de présence encore lu avant le pointage concurrent : bulk_create sans signaux)
+        presence.get_presence_state(self.employee)
+        stored, = AttendanceRecord.objects.bulk_create([AttendanceRecord(
+            employee=self.employee, record_type='IN', timestamp=timezone.now() - timedelta(hours=1),
+            kiosk_id=self.KIOSK_ID, idempotency_key="k1"
+        )])
+        real = scan_ingestion.stored_record_ids
+        calls = []
+
+        def stale_then_real(kiosk_id, keys):
+            calls.append(keys)
+            return {} if len(calls) == 1 else real(kiosk_id, keys)
+
+        with mock.patch.object(scan_ingestion, 'stored_record_ids', side_effect=stale_then_real):
+            response = self.post([self.scan("k1", age=timedelta(hours=1))])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(response.json()['results'][0], {
+            'index': 0, 'idempotency_key': "k1", 'status': 'duplicate', 'record_id': stored.pk,
+        })
+        self.assertEqual(AttendanceRecord.objects.count(), 1)
+
+
+class AttendanceStatsEngineTests(TestCase):
+    """
+    Compare les statistiques de présence lues dans les résumés journaliers
+    (attendance_stats.summary_period_stats) à l'ancienne implémentation en Python
+    d'AttendanceStatsView, sur un jeu de données aléatoire (graine fixe) comprenant
+    des séquences incohérentes : entrées répétées, sorties sans entrée, entrées sans
+    sortie, pauses, équipes de nuit.
+    """
+    NB_EMPLOYEES = 6
+    NB_DAYS = 60
+
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(42)
+        first_day = timezone.localdate() - timedelta(days=cls.NB_DAYS)
+        cls.days = [first_day + timedelta(days=offset) for offset in range(cls.NB_DAYS)]
+
+        def at(day, minutes):
+            return timezone.make_aware(datetime.combine(day, time.min) + timedelta(minutes=minutes))
+
+        records = []
+        cls.employees = []
+        for i in range(cls.NB_EMPLOYEES):
+            user = User.objects.create_user(username=f"stats{i}", password="secret")
+            employee = Employee.objects.create(user=user, employee_id=f"STA{i:03d}")
+            cls.employees.append(employee)
+
+            for day in cls.days:
+                if rng.random() < 0.15:
+                    # Équipe de nuit : la session passe minuit
+                    start = rng.randint(20 * 60, 23 * 60)
+                    types = ['IN', 'OUT']
+                    moments = [start, start + rng.randint(5 * 60, 9 * 60)]
+                else:
+                    types = rng.choice([
+                        ['IN', 'OUT'],
+                        ['IN', 'BREAK_START', 'BREAK_END', 'OUT'],
+                        ['IN', 'OUT', 'IN', 'OUT'],
+                        ['IN', 'IN', 'OUT'],
+                        ['OUT', 'IN', 'OUT'],
+                        ['IN', 'OUT', 'OUT'],
+                        ['IN', 'BREAK_START', 'OUT'],
+                        ['IN'],
+                        [],
+                    ])
+                    moments = sorted(rng.sample(range(6 * 60, 20 * 60), len(types)))
+                for record_type, minutes in zip(types, moments):
+                    records.append(AttendanceRecord(employee=employee, record_type=record_type, timestamp=at(day, minutes)))
+        AttendanceRecord.objects.bulk_create(records)
+        for employee in cls.employees:
+            day_summary.rebuild_employee(employee.pk)
+
+    # --- Ancienne implémentation (référence) ---
+
+    @staticmethod
+    def legacy_attendance(employee, period_start, period_end):
+        days_present = AttendanceRecord.objects.filter(
+            employee=employee,
+            record_type='IN',
+            timestamp__gte=period_start,
+            timestamp__lt=period_end
+        ).dates('timestamp', 'day').count()
+
+        total_seconds = 0
+        in_time = None
+        for record in AttendanceRecord.objects.filter(
+            employee=employee,
+            timestamp__gte=period_start,
+            timestamp__lt=period_end,
+            record_type__in=['IN', 'OUT']
+        ).order_by('timestamp', 'id'):
+            if record.record_type == 'IN':
+                in_time = record.timestamp
+            elif record.record_type == 'OUT' and in_time is not None:
+                total_seconds += (record.timestamp - in_time).total_seconds()
+                in_time = None
+        return days_present, total_seconds
+
+    @staticmethod
+    def open_at(employee, moment):
+        """Indique si une session (entrée sans sortie) est en cours à cet instant."""
+        last = AttendanceRecord.objects.filter(
+            employee=employee, record_type__in=['IN', 'OUT'], timestamp__lt=moment
+        ).order_by('-timestamp', '-id').values_list('record_type', flat=True).first()
+        return last == 'IN'
+
+    # --- Tests ---
+
+    def test_attendance_matches_legacy(self):
+        # Périodes de 1 à 30 jours. L'ancienne implémentation ignore une session qui
+        # commence avant la période ou se termine après, là où les résumés la répartissent
+        # à minuit : la durée n'est comparée que pour les périodes sans session en cours
+        # à leurs bornes (le nombre de jours de présence est toujours comparé).
+        rng = random.Random(7)
+        compared_durations = 0
+        for employee in self.employees:
+            for _ in range(20):
+                start = rng.choice(self.days)
+                end = min(start + timedelta(days=rng.randint(0, 29)), self.days[-1])
+                with self.subTest(employee=employee.employee_id, start=start, end=end):
+                    period_start, period_end = attendance_stats.local_day_bounds(start, end)
+                    days_present, total_seconds = self.legacy_attendance(employee, period_start, period_end)
+                    with self.assertNumQueries(1):
+                        stats = attendance_stats.summary_period_stats(employee, start, end)
+                    self.assertEqual(stats['days_present'], days_present)
+                    if not self.open_at(employee, period_start) and not self.open_at(employee, period_end):
+                        compared_durations += 1
+                        self.assertEqual(stats['worked'].total_seconds(), total_seconds)
+        self.assertGreater(compared_durations, 20)
+
+    def test_whole_history_matches_legacy(self):
+        period_start, period_end = attendance_stats.local_day_bounds(self.days[0], self.days[-1] + timedelta(days=1))
+        for employee in self.employees:
+            with self.subTest(employee=employee.employee_id):
+                days_present, total_seconds = self.legacy_attendance(employee, period_start, period_end)
+                stats = attendance_stats.summary_period_stats(employee, self.days[0], self.days[-1] + timedelta(days=1))
+                self.assertEqual(stats['days_present'], days_present)
+                self.assertEqual(stats['worked'].total_seconds(), total_seconds)
+
+    def test_no_records(self):
+        user = User.objects.create_user(username="vide", password="secret")
+        employee = Employee.objects.create(user=user, employee_id="VIDE")
+        self.assertEqual(
+            attendance_stats.summary_period_stats(employee, self.days[0], self.days[-1]),
+            {'days_present': 0, 'worked': timedelta(0), 'breaks': timedelta(0)}
+        )
+
+
+class DaySummaryTests(TestCase):
+    """
+    Vérifie que les résumés journaliers maintenus à chaque pointage (signaux et
+    insertions groupées) sont identiques à une reconstruction complète.
+    """
+
+    def setUp(self):
+        user = User.objects.create_user(username="resume", password="secret")
+        self.employee = Employee.objects.create(user=user, employee_id="RES001")
+        self.day = timezone.localdate() - timedelta(days=3)
+        self.noon = timezone.make_aware(datetime.combine(self.day, time(12, 0)))
+
+    def punch(self, record_type, hours):
+        return AttendanceRecord.objects.create(
+            employee=self.employee, record_type=record_type, timestamp=self.noon + timedelta(hours=hours)
+        )
+
+    def snapshot(self):
+        return list(AttendanceDaySummary.objects.filter(employee=self.employee).order_by('date').values(
+            'date', *day_summary.SUMMARY_FIELDS
+        ))
+
+    def assertMatchesRebuild(self):
+        incremental = self.snapshot()
+        day_summary.rebuild_employee(self.employee.pk)
+        self.assertEqual(incremental, self.snapshot())
+        return incremental
+
+    def test_create_edit_delete(self):
+        self.punch('IN', -4)
+        self.punch('BREAK_START', -1)
+        self.punch('BREAK_END', -0.5)
+        out = self.punch('OUT', 4)
+        summary = self.assertMatchesRebuild()
+        self.assertEqual(len(summary), 1)
+        self.assertEqual(summary[0]['worked_seconds'], 8 * 3600)
+        self.assertEqual(summary[0]['break_seconds'], 1800)
+        self.assertEqual(summary[0]['record_count'], 4)
+
+        # Déplacement de la sortie au lendemain : la session passe minuit et
+        # est répartie entre les deux jours
+        out.timestamp += timedelta(days=1)
+        out.save()
+        summary = self.assertMatchesRebuild()
+        self.assertEqual([row['date'] for row in summary], [self.day, self.day + timedelta(days=1)])
+        self.assertEqual(summary[0]['worked_seconds'], 16 * 3600)
+        self.assertEqual(summary[1]['worked_seconds'], 16 * 3600)
+        self.assertIsNone(summary[0]['last_out'])
+
+        # Suppression du seul pointage du lendemain : la ligne disparaît
+        out.delete()
+        summary = self.assertMatchesRebuild()
+        self.assertEqual([row['date'] for row in summary], [self.day])
+
+    def test_bulk_insert(self):
+        self.punch('IN', -2)
+        records = [
+            AttendanceRecord(employee=self.employee, record_type='OUT', timestamp=self.noon + timedelta(hours=3),
+                             idempotency_key='bulk-1'),
+            AttendanceRecord(employee=self.employee, record_type='IN', timestamp=self.noon + timedelta(days=1),
+                             idempotency_key='bulk-2'),
+        ]
+        with transaction.atomic():
+            scan_ingestion.bulk_insert_records(records)
+        summary = self.assertMatchesRebuild()
+        self.assertEqual(len(summary), 2)
+        self.assertEqual(summary[0]['worked_seconds'], 5 * 3600)
+
+    def test_summary_period_stats(self):
+        self.punch('IN', -4)
+        self.punch('OUT', 4)
+        stats = attendance_stats.summary_period_stats(self.employee, self.day, self.day)
+        self.assertEqual(stats['days_present'], 1)
+        self.assertEqual(stats['worked'], timedelta(hours=8))
+
+    def test_night_shift(self):
+        # Équipe de nuit sur trois jours : 22h -> 02h (+1 jour), puis 22h -> 02h (+2 jours)
+        self.punch('IN', 10)
+        self.punch('OUT', 14)
+        self.punch('IN', 34)
+        self.punch('BREAK_START', 35.5)
+        self.punch('BREAK_END', 36.5)
+        self.punch('OUT', 38)
+        summary = self.assertMatchesRebuild()
+        self.assertEqual(
+            [(row['worked_seconds'], row['break_seconds']) for row in summary],
+            [(2 * 3600, 0), (4 * 3600, 1800), (2 * 3600, 1800)]
+        )
+
+        # Suppression de la première sortie : la première entrée, suivie d'une autre
+        # entrée, n'est plus comptée
+        AttendanceRecord.objects.get(timestamp=self.noon + timedelta(hours=14)).delete()
+        summary = self.assertMatchesRebuild()
+        self.assertEqual([row['worked_seconds'] for row in summary], [0, 2 * 3600, 2 * 3600])
+
+    def test_abandoned_break(self):
+        # Pause non terminée avant la sortie : elle n'est pas reportée au lendemain
+        self.punch('IN', -4)
+        self.punch('BREAK_START', 0)
+        self.punch('OUT', 4)
+        self.punch('IN', 20)
+        self.punch('BREAK_END', 22)
+        self.punch('OUT', 24)
+        summary = self.assertMatchesRebuild()
+        self.assertEqual([row['break_seconds'] for row in summary], [0, 0])
+        self.assertEqual([row['worked_seconds'] for row in summary], [8 * 3600, 4 * 3600])
+
+
+class AttendanceHistoryViewTests(TestCase):
+    """Vérifie le calcul des durées de l'historique des pointages en un seul passage."""
+
+    def setUp(self):
+        user = User.objects.create_user(username="historique", password="secret")
+        self.employee = Employee.objects.create(user=user, employee_id="HIS001")
+        self.client.force_login(user)
+        self.day = timezone.localdate() - timedelta(days=2)
+        self.evening = timezone.make_aware(datetime.combine(self.day, time(20, 0)))
+        for record_type, hours in [('IN', 0), ('BREAK_START', 5), ('BREAK_END', 5.5), ('OUT', 10)]:
+            AttendanceRecord.objects.create(
+                employee=self.employee, record_type=record_type, timestamp=self.evening + timedelta(hours=hours)
+            )
+
+    def get_days(self, **params):
+        response = self.client.get(reverse('api_attendance_history'), params)
+        self.assertEqual(response.status_code, 200)
+        return {day['date']: day for day in response.json()['days']}
+
+    def test_session_across_midnight(self):
+        next_day = self.day + timedelta(days=1)
+        days = self.get_days(start_date=self.day.isoformat(), end_date=next_day.isoformat())
+        self.assertEqual(days[self.day.isoformat()]['summary']['formatted_duration'], '4h 00min')
+        self.assertEqual(days[next_day.isoformat()]['summary']['formatted_duration'], '5h 30min')
+        self.assertEqual([r['type'] for r in days[next_day.isoformat()]['records']], ['BREAK_START', 'BREAK_END', 'OUT'])
+
+    def test_period_bounds_and_type_filter(self):
+        # Période limitée au lendemain : l'entrée de la veille est reprise ;
+        # le filtre sur le type ne change pas les durées
+        next_day = (self.day + timedelta(days=1)).isoformat()
+        days = self.get_days(start_date=next_day, end_date=next_day, record_type='OUT')
+        self.assertEqual(list(days), [next_day])
+        self.assertEqual(days[next_day]['summary']['formatted_duration'], '5h 30min')
+        self.assertEqual(days[next_day]['summary']['records_count'], 1)
+
+        # Période limitée à la veille : la session est close par la sortie du lendemain
+        days = self.get_days(start_date=self.day.isoformat(), end_date=self.day.isoformat())
+        self.assertEqual(days[self.day.isoformat()]['summary']['formatted_duration'], '4h 00min')
+
+    def test_cursor_pagination_and_stream(self):
+        for offset in range(3, 9):
+            day_start = self.evening - timedelta(days=offset, hours=12)
+            AttendanceRecord.objects.create(employee=self.employee, record_type='IN', timestamp=day_start)
+            AttendanceRecord.objects.create(employee=self.employee, record_type='OUT',
+                                            timestamp=day_start + timedelta(hours=8))
+        params = {'start_date': (self.day - timedelta(days=10)).isoformat(), 'end_date': timezone.localdate().isoformat()}
+        url = reverse('api_attendance_history')
+        full = self.client.get(url, dict(params, limit=100)).json()
+        self.assertEqual(len(full['days']), 8)
+        self.assertFalse(full['pagination']['has_more'])
+
+        # Parcours par pages de 3 jours : mêmes jours, mêmes durées
+        pages, cursor = [], None
+        while True:
+            page = self.client.get(url, dict(params, limit=3, **({'cursor': cursor} if cursor else {}))).json()
+            pages.append(page['days'])
+            cursor = page['pagination']['next_cursor']
+            if cursor is None:
+                break
+        self.assertEqual([len(days) for days in pages], [3, 3, 2])
+        self.assertEqual([day for days in pages for day in days], full['days'])
+
+        # Réponse en flux : un jour par ligne puis une ligne de fin
+        response = self.client.get(url, dict(params, format='ndjson', limit=2))
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(lines[:-1], full['days'])
+        self.assertEqual(lines[-1]['total_records'], full['total_records'])
+
+        self.assertEqual(self.client.get(url, {'cursor': '!!'}).status_code, 400)
+
+
+class DashboardConditionalGetTests(TestCase):
+    """Vérifie les ETag des API du tableau de bord et leur invalidation par la version des données."""
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(username="etag", password="secret")
+        self.employee = Employee.objects.create(user=user, employee_id="ETA001")
+        self.client.force_login(user)
+
+    def revalidate(self, name):
+        url = reverse(name)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        # Session, utilisateur, puis une lecture de la version des données
+        with self.assertNumQueries(3):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        return etag
+
+    def test_not_modified_until_data_changes(self):
+        for name in ('api_profile', 'api_stats', 'api_attendance_history', 'api_leaves_list'):
+            with self.subTest(endpoint=name):
+                etag = self.revalidate(name)
+                AttendanceRecord.objects.create(employee=self.employee, record_type='IN', timestamp=timezone.now())
+                self.assertEqual(self.client.get(reverse(name), HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_admin_bulk_actions_change_version(self):
+        from django.contrib.admin.sites import site
+        from django.test import RequestFactory
+        from .admin import LeaveRequestAdmin
+
+        today = timezone.localdate()
+        LeaveRequest.objects.create(employee=self.employee, start_date=today, end_date=today,
+                                    leave_type='VACATION', status='PENDING')
+        etag = self.revalidate('api_leaves_list')
+        request = RequestFactory().post('/')
+        request.user = User.objects.create_superuser(username="admin-etag", password="secret")
+        model_admin = LeaveRequestAdmin(LeaveRequest, site)
+        model_admin.message_user = lambda *args, **kwargs: None
+        model_admin.approve_leave_requests(request, LeaveRequest.objects.all())
+        response = self.client.get(reverse('api_leaves_list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['leaves'][0]['status'], 'APPROVED')
+
+
+class StatsCacheTests(TestCase):
+    """Vérifie la mise en cache des statistiques du tableau de bord et leur invalidation."""
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(username="stats-cache", password="secret")
+        self.employee = Employee.objects.create(user=user, employee_id="STC001")
+        self.client.force_login(user)
+
+    def get_stats(self):
+        response = self.client.get(reverse('api_stats'))
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_hits_and_invalidation(self):
+        self.get_stats()
+        self.get_stats()
+        self.assertEqual(stats_cache.get_metrics()['hits'], 1)
+        self.assertEqual(stats_cache.get_metrics()['misses'], 1)
+
+        # Un pointage invalide l'entrée de l'employé
+        now = timezone.now()
+        AttendanceRecord.objects.create(employee=self.employee, record_type='IN', timestamp=now - timedelta(minutes=1))
+        self.assertEqual(self.get_stats()['current_month']['days_present'], 1)
+
+        # Les actions groupées de l'administration (update()) aussi, pour un congé d'un jour ouvré
+        today = timezone.localdate()
+        day = next(day for offset in range(7) for day in (today + timedelta(days=offset), today - timedelta(days=offset))
+                   if day.year == today.year and day.weekday() < 5)
+        leave = LeaveRequest.objects.create(employee=self.employee, start_date=day, end_date=day,
+                                            leave_type='VACATION', status='PENDING')
+        self.assertEqual(self.get_stats()['leave']['pending_requests'], 1)
+        from django.contrib.admin.sites import site
+        from django.test import RequestFactory
+        from .admin import LeaveRequestAdmin
+        request = RequestFactory().post('/')
+        request.user = User.objects.create_superuser(username="admin-stats", password="secret")
+        model_admin = LeaveRequestAdmin(LeaveRequest, site)
+        model_admin.message_user = lambda *args, **kwargs: None
+        model_admin.approve_leave_requests(request, LeaveRequest.objects.filter(pk=leave.pk))
+        stats = self.get_stats()
+        self.assertEqual(stats['leave']['pending_requests'], 0)
+        self.assertEqual(stats['leave']['days_used'], 1)
+        self.assertEqual(stats_cache.get_metrics()['misses'], 4)
+
+
+class LeaveRequestListViewTests(TestCase):
+    """Vérifie que la liste des demandes de congé s'obtient en un nombre constant de requêtes."""
+
+    def setUp(self):
+        user = User.objects.create_user(username="conges", password="secret")
+        self.employee = Employee.objects.create(user=user, employee_id="CON001")
+        self.client.force_login(user)
+        self.year = timezone.localdate().year
+
+    def add_leaves(self, count):
+        for index in range(count):
+            manager_user = User.objects.create_user(username=f"manager-{index}-{random.random()}", first_name="Chef")
+            manager = Employee.objects.create(user=manager_user, employee_id=f"MGR{manager_user.pk}")
+            start = date(self.year, 1, 1) + timedelta(days=3 * index % 360)
+            LeaveRequest.objects.create(
+                employee=self.employee, start_date=start, end_date=start + timedelta(days=index % 3),
+                leave_type='VACATION', status=['PENDING', 'APPROVED', 'REJECTED'][index % 3],
+                response_by=manager if index % 3 else None
+            )
+
+    def count_queries(self, **params):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('api_leaves_list'), params)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries), response.json()
+
+    def test_constant_queries(self):
+        # Premier appel : création de la version des données de l'employé
+        self.count_queries(status='ALL')
+        self.add_leaves(3)
+        small, _ = self.count_queries(status='ALL')
+        self.add_leaves(30)
+        large, data = self.count_queries(status='ALL')
+        self.assertEqual(small, large)
+        # Session, utilisateur, version des données, employé, agrégation, solde, page de la liste
+        self.assertEqual(large, 7)
+        self.assertEqual(len(data['leaves']), 33)
+        self.assertEqual(data['stats']['total_count'], 33)
+        approved = LeaveRequest.objects.filter(employee=self.employee, status='APPROVED', start_date__year=self.year)
+        self.assertEqual(
+            data['stats']['days_used_this_year'],
+            sum(leave_balance.leave_days(leave.start_date, leave.end_date) for leave in approved)
+        )
+        self.assertTrue(all(leave['processed_by'] == 'Chef' for leave in data['leaves'] if leave['status'] != 'PENDING'))
+
+    def test_pagination(self):
+        self.add_leaves(12)
+        _, first = self.count_queries(status='APPROVED', page_size=3)
+        self.assertEqual(first['pagination']['total_count'], 4)
+        self.assertEqual(first['pagination']['total_pages'], 2)
+        _, second = self.count_queries(status='APPROVED', page_size=3, page=2)
+        self.assertEqual(len(second['leaves']), 1)
+        self.assertFalse(second['pagination']['has_next'])
+        ids = [leave['id'] for leave in first['leaves'] + second['leaves']]
+        self.assertEqual(len(set(ids)), 4)
+
+
+class DashboardViewTests(TestCase):
+    """Vérifie que /api/dashboard/ regroupe les réponses des quatre API du tableau de bord."""
+
+    def setUp(self):
+        cache.clear()
+        use_temporary_media_root(self)
+        department = Department.objects.create(name="Accueil")
+        user = User.objects.create_user(username="tableau", password="secret", first_name="Ana")
+        self.employee = Employee.objects.create(user=user, employee_id="TAB001", department=department,
+                                                qr_code="QR-TAB001")
+        self.client.force_login(user)
+        now = timezone.now()
+        AttendanceRecord.objects.create(employee=self.employee, record_type='IN', timestamp=now - timedelta(hours=2))
+        today = timezone.localdate()
+        LeaveRequest.objects.create(employee=self.employee, start_date=today, end_date=today,
+                                    leave_type='VACATION', status='PENDING')
+
+    def test_sections_match_endpoints(self):
+        data = self.client.get(reverse('api_dashboard')).json()
+        self.assertTrue(data['success'])
+        self.assertEqual(data['profile'], self.client.get(reverse('api_profile')).json())
+        self.assertEqual(data['stats'], self.client.get(reverse('api_stats')).json())
+        self.assertEqual(data['history'], self.client.get(reverse('api_attendance_history')).json())
+        leaves = self.client.get(reverse('api_leaves_list'), {'status': 'PENDING'}).json()
+        self.assertEqual(len(data['leaves']['recent']), 1)
+        del data['leaves']['recent']
+        self.assertEqual(data['leaves'], leaves)
+
+
+class WorkCalendarTests(TestCase):
+    """Vérifie le calcul des jours ouvrés (jours de semaine et jours fériés)."""
+
+    def setUp(self):
+        cache.clear()
+        Holiday.objects.all().delete()
+        work_calendar.invalidate()
+
+    def brute_force_count(self, start, end, holidays=()):
+        days = 0
+        current = start
+        while current <= end:
+            if current.weekday() < 5 and current not in holidays:
+                days += 1
+            current += timedelta(days=1)
+        return days
+
+    def test_weekday_count_matches_day_by_day_loop(self):
+        calendar = work_calendar.WorkCalendar()
+        start = date(2024, 12, 20)
+        for offset in range(-1, 40):
+            for length in (0, 1, 5, 6, 7, 13, 31, 365):
+                first = start + timedelta(days=offset)
+                last = first + timedelta(days=length)
+                self.assertEqual(calendar.count_workdays(first, last), self.brute_force_count(first, last))
+        self.assertEqual(calendar.count_workdays(date(2025, 1, 10), date(2025, 1, 1)), 0)
+
+    def test_holidays_are_excluded(self):
+        Holiday.objects.create(date=date(2000, 1, 1), name="Jour de l'Indépendance", recurring=True)
+        Holiday.objects.create(date=date(2025, 4, 18), name="Vendredi saint")
+        Holiday.objects.create(date=date(2025, 4, 19), name="Samedi")
+        calendar = work_calendar.WorkCalendar()
+        holidays = {date(2025, 1, 1), date(2025, 4, 18), date(2026, 1, 1)}
+        self.assertEqual(calendar.count_workdays(date(2024, 12, 1), date(2026, 2, 1)),
+                         self.brute_force_count(date(2024, 12, 1), date(2026, 2, 1), holidays))
+        self.assertFalse(calendar.is_workday(date(2025, 1, 1)))
+        self.assertTrue(calendar.is_workday(date(2025, 1, 2)))
+
+        # Ensemble des jours fériés d'une année chargé une seule fois
+        with self.assertNumQueries(0):
+            calendar.count_workdays(date(2025, 1, 1), date(2025, 12, 31))
+
+        # Une modification de Holiday vide le cache
+        Holiday.objects.create(date=date(2025, 1, 2), name="Jour des Aïeux")
+        self.assertFalse(calendar.is_workday(date(2025, 1, 2)))
+
+    def test_invalidation_from_another_process(self):
+        calendar = work_calendar.WorkCalendar()
+        self.assertTrue(calendar.is_workday(date(2025, 1, 6)))
+        # Jour férié ajouté sans signal dans ce processus : le cache local est périmé
+        Holiday.objects.bulk_create([Holiday(date=date(2025, 1, 6), name="Épiphanie")])
+        self.assertTrue(calendar.is_workday(date(2025, 1, 6)))
+        # Un autre processus invalide : la génération partagée change
+        work_calendar._next_generation()
+        self.assertFalse(calendar.is_workday(date(2025, 1, 6)))
+
+
+class LeaveBalanceTests(TestCase):
+    """Vérifie la mise à jour des soldes de congés à chaque changement de statut d'une demande."""
+
+    def setUp(self):
+        cache.clear()
+        self.role = Role.objects.create(name="Agent", annual_leave_quota=20)
+        user = User.objects.create_user(username="solde", password="secret")
+        self.employee = Employee.objects.create(user=user, employee_id="SOL001", role=self.role)
+        self.client.force_login(user)
+        self.year = timezone.localdate().year + 1
+        # Premier lundi de l'année : les durées sont comptées en jours ouvrés
+        first_day = date(self.year, 1, 1)
+        self.monday = first_day + timedelta(days=(7 - first_day.weekday()) % 7)
+
+    def create_leave(self, day, days, status='PENDING'):
+        start = self.monday + timedelta(days=day)
+        return LeaveRequest.objects.create(employee=self.employee, start_date=start,
+                                           end_date=start + timedelta(days=days - 1),
+                                           leave_type='VACATION', status=status)
+
+    def assertBalanceMatchesRequests(self):
+        balance = LeaveBalance.objects.get(employee=self.employee, year=self.year)
+        counters = leave_balance.compute_counters(self.employee.pk, self.year)
+        self.assertEqual(
+            {field: getattr(balance, field) for field in counters}, counters
+        )
+        return balance
+
+    def test_transitions(self):
+        first = self.create_leave(7, 3)
+        second = self.create_leave(35, 5)
+        third = self.create_leave(77, 2)
+        balance = self.assertBalanceMatchesRequests()
+        self.assertEqual((balance.quota, balance.days_pending, balance.pending_count), (20, 10, 3))
+
+        # Approbation et modification des dates d'une demande
+        first.status = 'APPROVED'
+        first.end_date += timedelta(days=1)
+        first.save()
+        self.assertEqual(self.assertBalanceMatchesRequests().days_used, 4)
+
+        # Actions groupées de l'administration (seules les demandes en attente sont traitées)
+        from django.contrib.admin.sites import site
+        from django.test import RequestFactory
+        from .admin import LeaveRequestAdmin
+        request = RequestFactory().post('/')
+        request.user = User.objects.create_superuser(username="admin-solde", password="secret")
+        model_admin = LeaveRequestAdmin(LeaveRequest, site)
+        model_admin.message_user = lambda *args, **kwargs: None
+        model_admin.approve_leave_requests(request, LeaveRequest.objects.filter(pk=second.pk))
+        model_admin.reject_leave_requests(request, LeaveRequest.objects.filter(pk__in=[first.pk, third.pk]))
+        balance = self.assertBalanceMatchesRequests()
+        self.assertEqual((balance.days_used, balance.days_pending, balance.pending_count), (9, 0, 0))
+
+        # Annulation par l'employé, puis suppression
+        fourth = self.create_leave(98, 1)
+        response = self.client.post(reverse('api_leaves_action', args=[fourth.pk]))
+        self.assertTrue(response.json()['success'])
+        second.delete()
+        balance = self.assertBalanceMatchesRequests()
+        self.assertEqual((balance.days_used, balance.days_pending, balance.pending_count), (4, 0, 0))
+
+        # Quota du rôle
+        self.role.annual_leave_quota = 30
+        self.role.save()
+        self.assertEqual(leave_balance.get_balance(self.employee, self.year)['quota'], 30)
+
+    def test_creation_checks_balance(self):
+        self.role.annual_leave_quota = 5
+        self.role.save()
+        self.create_leave(7, 3, status='APPROVED')
+        start = self.monday + timedelta(weeks=8)
+        payload = {'start_date': start.isoformat(), 'leave_type': 'VACATION', 'reason': 'Repos'}
+        response = self.client.post(reverse('api_leaves_create'), json.dumps(
+            dict(payload, end_date=(start + timedelta(days=2)).isoformat())), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(reverse('api_leaves_create'), json.dumps(
+            dict(payload, end_date=(start + timedelta(days=1)).isoformat())), content_type='application/json')
+        self.assertTrue(response.json()['success'])
+        balance = self.assertBalanceMatchesRequests()
+        self.assertEqual(balance.days_remaining - balance.days_pending, 0)
+
+        # Un congé maladie n'est pas refusé faute de solde
+        start = self.monday + timedelta(weeks=13)
+        response = self.client.post(reverse('api_leaves_create'), json.dumps({
+            'start_date': start.isoformat(), 'end_date': (start + timedelta(days=2)).isoformat(),
+            'leave_type': 'SICK', 'reason': 'Grippe',
+        }), content_type='application/json')
+        self.assertTrue(response.json()['success'])
+
+    def test_working_days(self):
+        # Du jeudi au mardi suivant : 4 jours ouvrés (week-end exclu)
+        leave = self.create_leave(3, 6, status='APPROVED')
+        self.assertEqual(leave_balance.leave_days(leave.start_date, leave.end_date), 4)
+        self.assertEqual(self.assertBalanceMatchesRequests().days_used, 4)
+        from django.contrib.admin.sites import site
+        from .admin import LeaveRequestAdmin
+        self.assertEqual(LeaveRequestAdmin(LeaveRequest, site).duration_days(leave), 4)
+
+        # Un jour férié ajouté ou supprimé pendant le congé recalcule le solde
+        holiday = Holiday.objects.create(date=self.monday + timedelta(days=7), name="Férié")
+        self.assertEqual(self.assertBalanceMatchesRequests().days_used, 3)
+        leave.status = 'REJECTED'
+        leave.save()
+        self.assertEqual(self.assertBalanceMatchesRequests().days_used, 0)
+        leave.status = 'APPROVED'
+        leave.save()
+        holiday.delete()
+        self.assertEqual(self.assertBalanceMatchesRequests().days_used, 4)
+
+        # Période sans jour ouvré : refusée
+        saturday = self.monday + timedelta(days=19)
+        response = self.client.post(reverse('api_leaves_create'), json.dumps({
+            'start_date': saturday.isoformat(), 'end_date': (saturday + timedelta(days=1)).isoformat(),
+            'leave_type': 'VACATION',
+        }), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_balance_read_is_a_single_query(self):
+        self.create_leave(7, 3, status='APPROVED')
+        with self.assertNumQueries(1):
+            balance = leave_balance.get_balance(self.employee, self.year)
+        self.assertEqual(balance['days_remaining'], 17)
+
+    def test_concurrent_balance_creation(self):
+        # Une autre requête crée la ligne après la lecture (absente) et avant sa création
+        LeaveBalance.objects.filter(employee=self.employee).delete()
+        real_totals, real_rebuild = leave_balance._balance_totals, leave_balance.rebuild
+        reads = []
+
+        def stale_then_real(employee, year):
+            reads.append(year)
+            if len(reads) == 1:
+                real_rebuild(employee.pk, year)
+                return {'rows': 0}
+            return real_totals(employee, year)
+
+        def duplicate_create(employee_pk, year, quota=None):
+            LeaveBalance.objects.create(employee_id=employee_pk, year=year, quota=quota)
+
+        with mock.patch.object(leave_balance, '_balance_totals', side_effect=stale_then_real), \
+                mock.patch.object(leave_balance, 'rebuild', side_effect=duplicate_create):
+            balance = leave_balance.get_balance(self.employee, self.year)
+        self.assertEqual(balance['quota'], 20)
+        self.assertEqual(LeaveBalance.objects.filter(employee=self.employee, year=self.year).count(), 1)
+
+
+class QrRenderServiceTests(TestCase):
+    """Vérifie la mémorisation des images de QR code (cache LRU borné)."""
+
+    def setUp(self):
+        generate_qr_code.clear_cache()
+
+    def test_repeat_renders_skip_pil(self):
+        from unittest import mock
+        first = generate_qr_code.qr_data_url("EMP-QR001-ABCDEF12")
+        self.assertTrue(first.startswith("data:image/png;base64,"))
+        with mock.patch.object(generate_qr_code, '_render_png', side_effect=AssertionError("rendu PIL")):
+            self.assertEqual(generate_qr_code.qr_data_url("EMP-QR001-ABCDEF12"), first)
+            self.assertIn(first, generate_qr_code.generate_qr_code("EMP-QR001-ABCDEF12", as_html=True))
+        self.assertIsNone(generate_qr_code.qr_data_url(None))
+        self.assertGreaterEqual(generate_qr_code.get_metrics()['hits'], 2)
+
+    def test_cache_is_bounded(self):
+        with self.settings(QR_RENDER_CACHE_SIZE=3):
+            for index in range(5):
+                generate_qr_code.render(f"EMP-{index}")
+            self.assertEqual(generate_qr_code.get_metrics()['size'], 3)
+            # Les entrées les plus anciennes sont écartées en premier
+            self.assertNotIn(("EMP-0", generate_qr_code.DEFAULT_BOX_SIZE, generate_qr_code.PNG), generate_qr_code._memo)
+
+    def test_mobile_profile_uses_service(self):
+        user = User.objects.create_user(username="badge-qr", password="secret")
+        Employee.objects.create(user=user, employee_id="QR002", qr_code="EMP-QR002-12345678")
+        self.client.force_login(user)
+        with tempfile.TemporaryDirectory() as media_root, self.settings(MEDIA_ROOT=media_root):
+            data = self.client.get(reverse('employee_profile')).json()
+        self.assertEqual(data['qr_code_image'], generate_qr_code.qr_data_url("EMP-QR002-12345678"))
+
+
+class QrBadgeTests(TestCase):
+    """Vérifie les images pré-rendues des QR codes (stockage par défaut, URL immuable)."""
+
+    def setUp(self):
+        use_temporary_media_root(self)
+        user = User.objects.create_user(username="badge-url", password="secret")
+        self.employee = Employee.objects.create(user=user, employee_id="QR003", qr_code="EMP-QR003-AAAA0000")
+        self.client.force_login(user)
+
+    def test_profile_does_not_render_badge(self):
+        # Image non rendue : image en base64, rien n'est écrit dans le stockage
+        data = self.client.get(reverse('api_profile')).json()
+        self.assertEqual(data['qr_code_image'], generate_qr_code.qr_data_url("EMP-QR003-AAAA0000"))
+        self.employee.refresh_from_db()
+        self.assertFalse(self.employee.qr_code_badge)
+        self.assertFalse(default_storage.exists(qr_badge.badge_name("EMP-QR003-AAAA0000")))
+        self.assertIsNone(qr_badge.badge_url(self.employee))
+
+    def test_profile_returns_badge_url(self):
+        self.assertTrue(qr_badge.refresh_badge(self.employee))
+        data = self.client.get(reverse('api_profile')).json()
+        self.employee.refresh_from_db()
+        self.assertEqual(self.employee.qr_code_badge.name, qr_badge.badge_name("EMP-QR003-AAAA0000"))
+        self.assertEqual(data['qr_code_image'], self.employee.qr_code_badge.url)
+        with self.employee.qr_code_badge.open('rb') as badge:
+            self.assertEqual(badge.read(), generate_qr_code.render("EMP-QR003-AAAA0000"))
+
+        # Rotation : nouvelle image, l'ancienne est supprimée après la validation
+        old_name = self.employee.qr_code_badge.name
+        with self.captureOnCommitCallbacks(execute=True):
+            qr_badge.rotate(self.employee)
+            self.assertTrue(default_storage.exists(old_name))
+        self.assertNotEqual(self.employee.qr_code_badge.name, old_name)
+        self.assertFalse(default_storage.exists(old_name))
+        self.assertEqual(self.client.get(reverse('api_profile')).json()['qr_code_image'], self.employee.qr_code_badge.url)
+
+    def test_failed_save_keeps_previous_badge(self):
+        qr_badge.refresh_badge(self.employee)
+        old_name = self.employee.qr_code_badge.name
+        # Sauvegarde de l'employé annulée après le rendu (ex: erreur dans l'administration)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                self.employee.qr_code = qr_badge.new_qr_code(self.employee)
+                qr_badge.render_badge(self.employee)
+                raise RuntimeError
+        self.assertEqual(callbacks, [])
+        self.employee.refresh_from_db()
+        self.assertEqual(self.employee.qr_code_badge.name, old_name)
+        self.assertTrue(default_storage.exists(old_name))
+
+    def test_mobile_profile_inline_image(self):
+        # Image non rendue : image en base64 ; une fois rendue, URL seule par défaut
+        data = self.client.get(reverse('employee_profile')).json()
+        self.assertIsNone(data['qr_code_image_url'])
+        self.assertEqual(data['qr_code_image'], generate_qr_code.qr_data_url("EMP-QR003-AAAA0000"))
+
+        qr_badge.refresh_badge(self.employee)
+        data = self.client.get(reverse('employee_profile')).json()
+        self.assertEqual(data['qr_code_image_url'], self.employee.qr_code_badge.url)
+        self.assertIsNone(data['qr_code_image'])
+        inline = self.client.get(reverse('employee_profile'), {'qr_inline': '1'}).json()
+        self.assertEqual(inline['qr_code_image'], generate_qr_code.qr_data_url("EMP-QR003-AAAA0000"))
+
+    def test_render_command(self):
+        from django.core.management import call_command
+        call_command('render_qr_badges', stdout=StringIO())
+        self.employee.refresh_from_db()
+        self.assertTrue(qr_badge.is_current(self.employee))
+        self.assertTrue(default_storage.exists(self.employee.qr_code_badge.name))
+
+
+class QrFormatTests(TestCase):
+    """Vérifie les formats SVG et matrice du QR code et leur négociation dans les API de profil."""
+
+    PAYLOAD = "EMP-QR004-BBBB1111"
+
+    def setUp(self):
+        use_temporary_media_root(self)
+        generate_qr_code.clear_cache()
+        user = User.objects.create_user(username="badge-format", password="secret")
+        self.employee = Employee.objects.create(user=user, employee_id="QR004", qr_code=self.PAYLOAD)
+        self.client.force_login(user)
+
+    def expected_modules(self):
+        return generate_qr_code._make_qr(self.PAYLOAD, border=0).get_matrix()
+
+    def test_matrix_bits(self):
+        matrix = generate_qr_code.qr_matrix(self.PAYLOAD)
+        size = matrix['size']
+        packed = base64.b64decode(matrix['bits'])
+        modules = [[bool(packed[(y * size + x) // 8] & (0x80 >> ((y * size + x) % 8))) for x in range(size)]
+                   for y in range(size)]
+        self.assertEqual(modules, self.expected_modules())
+
+    def test_svg_paths(self):
+        svg = generate_qr_code.qr_svg(self.PAYLOAD)
+        border = generate_qr_code.BORDER
+        size = len(self.expected_modules())
+        modules = [[False] * size for _ in range(size)]
+        for x, y, run in re.findall(r"M(\d+) (\d+)h(\d+)", svg):
+            for column in range(int(x), int(x) + int(run)):
+                modules[int(y) - border][column - border] = True
+        self.assertEqual(modules, self.expected_modules())
+        self.assertIn(f'width="{(size + 2 * border) * generate_qr_code.DEFAULT_BOX_SIZE}"', svg)
+
+    def test_profile_negotiation(self):
+        svg = self.client.get(reverse('api_profile'), {'qr_format': 'svg'}).json()
+        self.assertEqual(svg['qr_code_svg'], generate_qr_code.qr_svg(self.PAYLOAD))
+        self.assertIsNone(svg['qr_code_image'])
+        # Aucune image PNG rendue
+        self.employee.refresh_from_db()
+        self.assertFalse(self.employee.qr_code_badge)
+
+        matrix = self.client.get(reverse('api_profile'), HTTP_ACCEPT=generate_qr_code.MATRIX_MEDIA_TYPE).json()
+        self.assertEqual(matrix['qr_code_matrix'], generate_qr_code.qr_matrix(self.PAYLOAD))
+        dashboard_data = self.client.get(reverse('api_dashboard'), {'qr_format': 'matrix'}).json()
+        self.assertEqual(dashboard_data['profile']['qr_code_matrix'], matrix['qr_code_matrix'])
+
+        png = self.client.get(reverse('api_profile'))
+        self.assertEqual(png.json()['qr_code_format'], 'png')
+        self.assertNotEqual(png['ETag'], self.client.get(reverse('api_profile'), {'qr_format': 'svg'})['ETag'])
+        self.assertEqual(self.client.get(reverse('api_profile'), {'qr_format': 'gif'}).status_code, 400)
+
+
+class BadgeSheetTests(TestCase):
+    """Vérifie les planches de badges imprimables (PDF, PNG, action de l'administration)."""
+
+    def setUp(self):
+        use_temporary_media_root(self)
+        department = Department.objects.create(name="Impression")
+        for i in range(9):
+            user = User.objects.create_user(username=f"sheet-{i}", password="secret", first_name="Badge", last_name=str(i))
+            Employee.objects.create(user=user, employee_id=f"SH{i:03d}", department=department, qr_code=f"EMP-SH{i:03d}-CCCC2222")
+        self.records = badge_sheets.badge_records(
+            Employee.objects.select_related('user', 'department').order_by('employee_id')
+        )
+
+    def test_sheet_formats(self):
+        self.assertEqual(self.records[0], {
+            'name': "Badge 0", 'employee_id': "SH000", 'department': "Impression", 'qr_code': "EMP-SH000-CCCC2222",
+        })
+        # 9 badges : 2 pages
+        pdf, extension = badge_sheets.build_sheets(self.records, badge_sheets.PDF, workers=1)
+        self.assertEqual(extension, 'pdf')
+        self.assertTrue(pdf.startswith(b'%PDF'))
+        self.assertEqual(pdf.count(b'/Type /Page\n'), 2)
+
+        archive, extension = badge_sheets.build_sheets(self.records, badge_sheets.PNG, workers=1)
+        self.assertEqual(extension, 'zip')
+        with zipfile.ZipFile(BytesIO(archive)) as pages:
+            self.assertEqual(pages.namelist(), ['badges-page-001.png', 'badges-page-002.png'])
+            self.assertEqual(pages.read('badges-page-002.png'), badge_sheets.render_page(self.records[8:]))
+
+        page, extension = badge_sheets.build_sheets(self.records[:3], badge_sheets.PNG, workers=1)
+        self.assertEqual(extension, 'png')
+        with self.assertRaises(ValueError):
+            badge_sheets.build_sheets([], badge_sheets.PDF, workers=1)
+
+    def test_parallel_pages_match(self):
+        self.assertEqual(badge_sheets.render_pages(self.records, workers=2), badge_sheets.render_pages(self.records, workers=1))
+
+    def test_admin_action(self):
+        admin_user = User.objects.create_superuser(username="sheet-admin", password="secret")
+        self.client.force_login(admin_user)
+        with self.settings(BADGE_SHEET_WORKERS=1):
+            response = self.client.post(reverse('admin:core_employee_changelist'), {
+                'action': 'print_badge_sheets_pdf',
+                '_selected_action': list(Employee.objects.values_list('pk', flat=True)),
+            })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertIn('attachment; filename="badges-', response['Content-Disposition'])
+
+
+class BenchQrTests(TestCase):
+    """Vérifie la référence du benchmark des QR codes et la détection des régressions."""
+
+    def test_baseline_comparison(self):
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+        baseline_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(baseline_dir.cleanup)
+        path = f"{baseline_dir.name}/qr_baseline.json"
+        options = {'repeat': 1, 'box_sizes': '2', 'baseline': path, 'stdout': StringIO(), 'stderr': StringIO()}
+        call_command('bench_qr', save=True, **options)
+        baseline = json.loads(open(path).read())
+        self.assertEqual(baseline['results']['render:PNG:L:2']['version'], 1)
+        self.assertEqual(baseline['results']['render:SVG:H:2']['recovery_pct'], 30)
+        self.assertIn('api:/api/profile/?qr_format=svg', baseline['results'])
+
+        # Temps et mémoire non comparés : une seule exécution n'est pas assez stable
+        tolerances = {'time_tolerance': 1000, 'memory_tolerance': 1000}
+        call_command('bench_qr', skip_api=True, **tolerances, **options)
+
+        baseline['results']['render:SVG:M:2']['bytes'] -= 1
+        with open(path, 'w') as f:
+            json.dump(baseline, f)
+        with self.assertRaisesMessage(CommandError, "1 régression(s)"):
+            call_command('bench_qr', skip_api=True, **tolerances, **options)
+
+
+class DashboardParallelSectionsTests(TransactionTestCase):
+    """Vérifie le calcul en parallèle des sections, hors transaction."""
+
+    def test_parallel_sections(self):
+        user = User.objects.create_user(username="parallele", password="secret")
+        employee = Employee.objects.create(user=user, employee_id="PAR001")
+        AttendanceRecord.objects.create(employee=employee, record_type='IN', timestamp=timezone.now())
+        self.assertTrue(dashboard.can_run_in_parallel())
+        sections = dashboard.compute_sections({
+            name: (lambda: AttendanceRecord.objects.filter(employee=employee).count())
+            for name in ('a', 'b', 'c')
+        })
+        self.assertEqual(sections, {'a': 1, 'b': 1, 'c': 1})
+
+    def test_sections_use_request_language_and_timezone(self):
+        from django.utils import translation
+        with translation.override('en'), timezone.override('Asia/Tokyo'):
+            sections = dashboard.compute_sections({
+                name: (lambda: (translation.get_language(), timezone.get_current_timezone_name()))
+                for name in ('a', 'b', 'c')
+            })
+        self.assertEqual(set(sections.values()), {('en', 'Asia/Tokyo')})
+
+    def test_saturated_pool_computes_inline(self):
+        import threading
+        _, free_workers = dashboard._get_executor()
+
+        def section_threads():
+            return {name: (lambda: threading.current_thread().name) for name in ('a', 'b', 'c')}
+
+        # Un thread du pool reste libre : une section y est calculée, l'autre dans la requête
+        taken = 0
+        while free_workers.acquire(blocking=False):
+            taken += 1
+        self.assertEqual(taken, dashboard.get_max_workers())
+        try:
+            free_workers.release()
+            threads = dashboard.compute_sections(section_threads())
+            self.assertEqual(threads['a'], threading.current_thread().name)
+            self.assertTrue(threads['b'].startswith('dashboard'))
+            self.assertEqual(threads['c'], threading.current_thread().name)
+
+            # Pool entièrement occupé (le thread libéré par la section précédente est repris)
+            self.assertTrue(free_workers.acquire(timeout=5))
+            threads = dashboard.compute_sections(section_threads())
+            self.assertEqual(set(threads.values()), {threading.current_thread().name})
+        finally:
+            for _ in range(taken):
+                free_workers.release()
+
+    def test_max_workers_setting(self):
+        with self.settings(DASHBOARD_MAX_WORKERS=0):
+            self.assertFalse(dashboard.can_run_in_parallel())
+        self.assertTrue(dashboard.can_run_in_parallel())
+
+
+class RebuildDaySummariesCommandTests(TransactionTestCase):
+    """Vérifie la reconstruction des résumés en parallèle : une connexion fermée par thread, pas par employé."""
+
+    def test_rebuild_closes_connections_once_per_thread(self):
+        from django.core.management import call_command
+        from django.db import connections
+        now = timezone.now()
+        for index in range(5):
+            user = User.objects.create_user(username=f"rebuild{index}", password="secret")
+            employee = Employee.objects.create(user=user, employee_id=f"REB{index:03d}")
+            AttendanceRecord.objects.create(employee=employee, record_type='IN', timestamp=now - timedelta(hours=2))
+            AttendanceRecord.objects.create(employee=employee, record_type='OUT', timestamp=now - timedelta(hours=1))
+        AttendanceDaySummary.objects.all().delete()
+
+        # La base de test SQLite en mémoire ne supporte pas deux écritures simultanées :
+        # les reconstructions sont sérialisées, chacune dans le thread et sur la connexion de son worker
+        import threading
+        lock = threading.Lock()
+        rebuild_employee = day_summary.rebuild_employee
+
+        def serialized_rebuild(*args, **kwargs):
+            with lock:
+                return rebuild_employee(*args, **kwargs)
+
+        out = StringIO()
+        with mock.patch.object(connections, 'close_all', wraps=connections.close_all) as close_all, \
+                mock.patch.object(day_summary, 'rebuild_employee', serialized_rebuild):
+            call_command('rebuild_day_summaries', workers=2, stdout=out)
+        self.assertEqual(close_all.call_count, 2)
+        self.assertIn("pour 5 employé(s)", out.getvalue())
+        self.assertEqual(AttendanceDaySummary.objects.values('employee').distinct().count(), 5)
+
+        with mock.patch('core.utils.day_summary.rebuild_employee', side_effect=RuntimeError("échec")):
+            with self.assertRaises(RuntimeError):
+                call_command('rebuild_day_summaries', workers=2, stdout=StringIO())
@@ -1,8 +1,10 @@
 # core/urls.py
+from django.conf import settings
 from django.urls import path
 from rest_framework_simplejwt.views import TokenVerifyView
-from core.views.employee_view import login_view,logout_view,home_view,EmployeeProfileDataView,AttendanceStatsView,AttendanceHistoryView,LeaveRequest,LeaveRequestActionView,LeaveRequestCreateView,LeaveRequestDetailView,LeaveRequestListView
-from core.views.kiosk_view import kiosk_view,get_csrf_token,authenticate_card,record_attendance
+from core.views.employee_view import login_view,logout_view,home_view,EmployeeProfileDataView,AttendanceStatsView,AttendanceHistoryView,LeaveRequest,LeaveRequestActionView,LeaveRequestCreateView,LeaveRequestDetailView,LeaveRequestListView,stats_cache_metrics,DashboardView
+from core.views.kiosk_view import kiosk_view,get_csrf_token,authenticate_card,record_attendance,record_attendance_batch,punch_queue_metrics
+from core.views.kiosk_async_view import authenticate_card_async,record_attendance_async
 from core.views.mobile_api_view import  (
     CustomTokenObtainPairView,
     CustomTokenRefreshView,
@@ -11,6 +13,11 @@ from core.views.mobile_api_view import  (
     EmployeeProfileAPIView
 )
 
+# Sous ASGI, les API de scan du kiosque peuvent être servies par leurs versions asynchrones
+if settings.KIOSK_ASYNC_VIEWS:
+    authenticate_card = authenticate_card_async
+    record_attendance = record_attendance_async
+
 urlpatterns = [
     # Autres URLs existantes...
     
@@ -19,6 +26,11 @@ urlpatterns = [
     path('login/', login_view, name='login'),
     path('logout/', logout_view, name='logout'),
     path('home/', home_view, name='home'),
+    # === Démarrage du tableau de bord (profil, statistiques, historique, congés) ===
+    path('api/dashboard/', 
+        DashboardView.as_view(), 
+        name='api_dashboard'),
+    
     path('api/profile/', 
         EmployeeProfileDataView.as_view(), 
         name='api_profile'),
@@ -28,6 +40,9 @@ urlpatterns = [
         AttendanceStatsView.as_view(), 
          name='api_stats'),
     
+    # Métriques du cache des statistiques (personnel uniquement)
+    path('api/stats/cache-metrics/', stats_cache_metrics, name='api_stats_cache_metrics'),
+    
     # === Historique des pointages ===
     path('api/attendance/history/', 
         AttendanceHistoryView.as_view(), 
@@ -63,6 +78,12 @@ urlpatterns = [
     # URL pour l'API d'enregistrement d'un pointage
     # Cette URL sera appelée par le JavaScript du kiosque après authentification pour enregistrer une action
     path('api/record-attendance/', record_attendance, name='record_attendance'),
+
+    # URL pour l'envoi groupé de scans mis en attente par un kiosque (mode hors ligne)
+    path('api/record-attendance/batch/', record_attendance_batch, name='record_attendance_batch'),
+
+    # Métriques de la file d'attente des pointages (mode write-behind)
+    path('api/punch-queue/metrics/', punch_queue_metrics, name='punch_queue_metrics'),
     path('token/', CustomTokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('token/refresh/', CustomTokenRefreshView.as_view(), name='token_refresh'),
     path('token/verify/', TokenVerifyView.as_view(), name='token_verify'),
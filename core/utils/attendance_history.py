@@ -0,0 +1,176 @@
+# Fichier : attendance_history.py
+#
+# Description : Construction de l'historique des pointages d'un employé, regroupé par
+#               jour local (AttendanceHistoryView), page par page.
+#
+#               Pagination par curseur (keyset) : les jours sont servis du plus récent
+#               au plus ancien ; le curseur contient la date du dernier jour servi et la
+#               page suivante lit les pointages dont l'horodatage est antérieur au début
+#               de ce jour. Une page contient des jours complets, ce qui garde les durées
+#               journalières exactes. Chaque page coûte quelques requêtes indexées sur
+#               (employee, timestamp), quelle que soit la profondeur de l'historique.
+#
+#               iter_history_pages() enchaîne les pages pour la réponse en flux (NDJSON) :
+#               seule une page est en mémoire à la fois.
+
+import base64
+import binascii
+from datetime import date
+
+from django.utils import timezone
+
+from ..models import AttendanceRecord
+from .attendance_stats import local_day_bounds
+from .durations import DayDurations, carried_durations, closing_records
+
+DEFAULT_PAGE_DAYS = 31
+MAX_PAGE_DAYS = 100
+# Nombre d'horodatages lus par requête pour délimiter une page
+BOUNDARY_CHUNK = 500
+
+
+def encode_cursor(day):
+    """Curseur opaque désignant le dernier jour (le plus ancien) d'une page."""
+    return base64.urlsafe_b64encode(day.isoformat().encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Retourne la date contenue dans un curseur ; lève ValueError si le curseur est invalide."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        return date.fromisoformat(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (binascii.Error, UnicodeDecodeError) as exc:
+        raise ValueError(str(exc))
+
+
+def _page_lower_bound(listed, upper, page_days, tz):
+    """
+    Parcourt les horodatages des pointages affichés, du plus récent au plus ancien,
+    jusqu'à trouver page_days jours distincts.
+    Retourne (début du plus ancien jour de la page, il reste des jours plus anciens),
+    ou (None, False) si la page va jusqu'au début de la période.
+    """
+    days_seen = 0
+    current_day = None
+    bound = upper
+    while True:
+        query = listed.order_by('-timestamp', '-id')
+        if bound is not None:
+            query = query.filter(timestamp__lt=bound)
+        timestamps = list(query.values_list('timestamp', flat=True)[:BOUNDARY_CHUNK])
+        for timestamp in timestamps:
+            day = timestamp.astimezone(tz).date()
+            if day != current_day:
+                if days_seen == page_days:
+                    return local_day_bounds(current_day, current_day)[0], True
+                days_seen += 1
+                current_day = day
+        if len(timestamps) < BOUNDARY_CHUNK:
+            return None, False
+        bound = timestamps[-1]
+
+
+def _build_days(employee, lower, upper, type_filter, tz):
+    """
+    Jours (du plus récent au plus ancien) des pointages compris dans [lower, upper[,
+    avec les durées de présence calculées en un seul passage.
+    """
+    query = AttendanceRecord.objects.filter(employee=employee)
+    if lower is not None:
+        query = query.filter(timestamp__gte=lower)
+    if upper is not None:
+        query = query.filter(timestamp__lt=upper)
+    # Tuples (id, horodatage, type, lieu, note), ordonnés par date/heure
+    rows = query.order_by('timestamp', 'id').values_list(
+        'id', 'timestamp', 'record_type', 'location', 'note'
+    )
+
+    # Une session commencée avant la page est reprise à partir de son début
+    durations = carried_durations(employee.pk, lower, tz=tz) if lower is not None else DayDurations(tz=tz)
+    type_labels = dict(AttendanceRecord.RECORD_TYPES)
+    days_data = {}
+    for record_id, timestamp, type_code, location, note in rows:
+        local_timestamp = timestamp.astimezone(tz)
+        day = local_timestamp.date()
+        durations.add(timestamp, type_code, day)
+        if type_filter and type_code != type_filter:
+            continue
+        day_records = days_data.get(day)
+        if day_records is None:
+            day_records = days_data[day] = []
+        day_records.append({
+            'id': record_id,
+            'time': local_timestamp.strftime('%H:%M:%S'),
+            'type': type_code,
+            'type_display': type_labels.get(type_code, type_code),
+            'location': location or '',
+            'note': note or ''
+        })
+
+    # Une session encore ouverte à la fin de la page est close par le pointage
+    # qui la suit, pour compter sa part du dernier jour (jusqu'à minuit)
+    if upper is not None and durations.is_open():
+        for timestamp, type_code in closing_records(employee.pk, durations, upper):
+            durations.add(timestamp, type_code)
+
+    result = []
+    for day in sorted(days_data, reverse=True):  # Tri des jours (plus récent d'abord)
+        records = days_data[day]
+        # Temps de présence, pauses déduites
+        total_duration = durations.worked.get(day, 0) - durations.breaks.get(day, 0)
+
+        # Convertir le total en heures et minutes
+        hours = int(total_duration // 3600)
+        minutes = int((total_duration % 3600) // 60)
+
+        result.append({
+            'date': day.strftime('%Y-%m-%d'),
+            'day_name': day.strftime('%A'),  # Nom du jour (lundi, mardi, etc.)
+            'formatted_date': day.strftime('%d %B %Y'),  # Format lisible
+            'records': records,  # Déjà dans l'ordre chronologique
+            'summary': {
+                'total_hours': hours,
+                'total_minutes': minutes,
+                'formatted_duration': f'{hours}h {minutes:02d}min',
+                'records_count': len(records)
+            }
+        })
+    return result
+
+
+def history_page(employee, start_date=None, end_date=None, type_filter=None, cursor_day=None,
+                 page_days=DEFAULT_PAGE_DAYS):
+    """
+    Une page de l'historique : au plus page_days jours comportant des pointages
+    (du type demandé), entre start_date et end_date (dates locales, bornes incluses),
+    antérieurs au jour cursor_day s'il est fourni.
+    Retourne (jours, date du dernier jour de la page s'il reste des jours plus anciens).
+    """
+    tz = timezone.get_current_timezone()
+    period_start = local_day_bounds(start_date, start_date)[0] if start_date else None
+    upper = local_day_bounds(end_date, end_date)[1] if end_date else None
+    if cursor_day is not None:
+        cursor_start = local_day_bounds(cursor_day, cursor_day)[0]
+        upper = min(upper, cursor_start) if upper is not None else cursor_start
+
+    listed = AttendanceRecord.objects.filter(employee=employee)
+    if period_start is not None:
+        listed = listed.filter(timestamp__gte=period_start)
+    if type_filter:
+        listed = listed.filter(record_type=type_filter)
+
+    lower, has_more = _page_lower_bound(listed, upper, page_days, tz)
+    days = _build_days(employee, lower or period_start, upper, type_filter, tz)
+    next_day = date.fromisoformat(days[-1]['date']) if has_more and days else None
+    return days, next_day
+
+
+def iter_history_pages(employee, start_date=None, end_date=None, type_filter=None, cursor_day=None,
+                       page_days=DEFAULT_PAGE_DAYS):
+    """Enchaîne les pages de l'historique (du plus récent au plus ancien) ; produit des listes de jours."""
+    while True:
+        days, cursor_day = history_page(employee, start_date, end_date, type_filter, cursor_day, page_days)
+        if days:
+            yield days
+        if cursor_day is None:
+            return
@@ -0,0 +1,73 @@
+# Fichier : attendance_stats.py
+#
+# Description : Calcul en SQL des statistiques de présence et de congés
+#               affichées par le tableau de bord employé (AttendanceStatsView).
+#
+#               - Présence : lue dans les résumés journaliers (AttendanceDaySummary),
+#                 une requête sur au plus une ligne par jour. Les résumés sont le seul
+#                 moteur de calcul de la présence (voir utils/day_summary.py).
+#               - Congés : une seule requête d'agrégation conditionnelle (comptes par
+#                 statut). Les jours de congés, en jours ouvrés, sont lus dans les soldes
+#                 (voir utils/leave_balance.py).
+
+from datetime import datetime, timedelta
+
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from ..models import AttendanceDaySummary, LeaveRequest
+
+
+def local_day_bounds(start_date, end_date):
+    """
+    Convertit un intervalle de dates locales [start_date, end_date] en bornes
+    d'horodatage [début, fin[ dans le fuseau horaire courant.
+    Filtrer sur ces bornes (timestamp__gte / timestamp__lt) permet d'utiliser les
+    index (employee, timestamp), contrairement à timestamp__date qui applique
+    une fonction à la colonne.
+    """
+    start = timezone.make_aware(datetime.combine(start_date, datetime.min.time()))
+    end = timezone.make_aware(datetime.combine(end_date + timedelta(days=1), datetime.min.time()))
+    return start, end
+
+
+def summary_period_stats(employee, start_date, end_date):
+    """
+    Statistiques de présence d'un employé entre deux dates locales [start_date, end_date],
+    lues dans les résumés journaliers :
+    - days_present : nombre de jours comportant au moins une entrée ;
+    - worked : durée totale de présence (timedelta), répartie par jour à minuit ;
+    - breaks : durée totale des pauses (timedelta).
+    """
+    result = AttendanceDaySummary.objects.filter(
+        employee=employee,
+        date__gte=start_date,
+        date__lte=end_date
+    ).aggregate(
+        days_present=Count('id', filter=Q(first_in__isnull=False)),
+        worked_seconds=Sum('worked_seconds'),
+        break_seconds=Sum('break_seconds'),
+    )
+    return {
+        'days_present': result['days_present'],
+        'worked': timedelta(seconds=result['worked_seconds'] or 0),
+        'breaks': timedelta(seconds=result['break_seconds'] or 0),
+    }
+
+
+def leave_request_stats(employee, selection=None):
+    """
+    Statistiques des demandes de congé d'un employé, en une seule requête d'agrégation :
+    - pending_count, approved_count, rejected_count, total_count : nombre de demandes par statut ;
+    - selected_count : nombre de demandes vérifiant le filtre `selection` (Q), s'il est fourni.
+    Les jours de congés utilisés (en jours ouvrés) se lisent dans le solde (utils/leave_balance.py).
+    """
+    aggregates = {
+        'pending_count': Count('id', filter=Q(status='PENDING')),
+        'approved_count': Count('id', filter=Q(status='APPROVED')),
+        'rejected_count': Count('id', filter=Q(status='REJECTED')),
+        'total_count': Count('id'),
+    }
+    if selection is not None:
+        aggregates['selected_count'] = Count('id', filter=selection)
+    return LeaveRequest.objects.filter(employee=employee).aggregate(**aggregates)
@@ -0,0 +1,147 @@
+# Fichier : badge_sheets.py
+#
+# Description : Planches de badges imprimables (nom, identifiant, département et QR code
+#               de chaque employé), au format A4 : un fichier PNG par page ou un seul PDF
+#               de plusieurs pages. Utilisé par l'action « Imprimer les badges » de
+#               l'administration et par la commande render_badge_sheets.
+#
+#               Les pages sont indépendantes : elles sont rendues en parallèle par un pool
+#               de processus (le rendu PIL occupe le processeur, les threads seraient
+#               limités par le GIL). Les processus ne reçoivent que des fiches simples
+#               (dictionnaires) et n'accèdent pas à la base de données.
+
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from io import BytesIO
+
+from PIL import Image, ImageDraw, ImageFont
+
+from . import generate_qr_code
+
+PNG = 'png'
+PDF = 'pdf'
+FORMATS = (PNG, PDF)
+
+# Page A4 à 150 points par pouce
+DPI = 150
+PAGE_SIZE = (1240, 1754)
+MARGIN = 60
+
+# Grille des badges sur une page
+COLUMNS = 2
+ROWS = 4
+BADGES_PER_PAGE = COLUMNS * ROWS
+
+# Nombre de processus par défaut (au plus un par page), voir BADGE_SHEET_WORKERS
+DEFAULT_WORKERS = 4
+
+
+def badge_records(employees):
+    """
+    Fiches des badges à imprimer, dans l'ordre du queryset.
+    Les employés doivent avoir été chargés avec select_related('user', 'department').
+    """
+    records = []
+    for employee in employees:
+        user = employee.user
+        records.append({
+            'name': f"{user.first_name} {user.last_name}".strip() or user.username,
+            'employee_id': employee.employee_id,
+            'department': employee.department.name if employee.department else '',
+            'qr_code': employee.qr_code or '',
+        })
+    return records
+
+
+@lru_cache(maxsize=None)
+def _font(size):
+    return ImageFont.load_default(size=size)
+
+
+def _fit_text(draw, text, font, width):
+    """Raccourcit un texte (points de suspension) pour qu'il tienne dans la largeur donnée."""
+    if draw.textlength(text, font=font) <= width:
+        return text
+    while text and draw.textlength(text + '…', font=font) > width:
+        text = text[:-1]
+    return text + '…'
+
+
+def _draw_badge(page, draw, record, box):
+    left, top, right, bottom = box
+    draw.rounded_rectangle(box, radius=18, outline='black', width=3)
+
+    # QR code à gauche, à la hauteur du badge
+    padding = 24
+    qr_side = bottom - top - 2 * padding
+    if record['qr_code']:
+        # Rendu direct : le processus de rendu n'a ni cache ni réglages Django
+        qr = Image.open(BytesIO(generate_qr_code.render_png(record['qr_code'])))
+        page.paste(qr.convert('1').resize((qr_side, qr_side), Image.NEAREST), (left + padding, top + padding))
+
+    # Textes à droite du QR code
+    text_left = left + 2 * padding + qr_side
+    text_width = right - padding - text_left
+    y = top + padding + 20
+    for text, size in ((record['name'], 30), (record['employee_id'], 26), (record['department'], 22)):
+        if text:
+            font = _font(size)
+            draw.text((text_left, y), _fit_text(draw, text, font, text_width), fill='black', font=font)
+        y += size + 24
+
+
+def render_page(records):
+    """Rend une page de badges (au plus BADGES_PER_PAGE fiches) et retourne l'image PNG."""
+    page = Image.new('L', PAGE_SIZE, 'white')
+    draw = ImageDraw.Draw(page)
+    cell_width = (PAGE_SIZE[0] - 2 * MARGIN) // COLUMNS
+    cell_height = (PAGE_SIZE[1] - 2 * MARGIN) // ROWS
+    gap = 16
+    for index, record in enumerate(records[:BADGES_PER_PAGE]):
+        row, column = divmod(index, COLUMNS)
+        left = MARGIN + column * cell_width
+        top = MARGIN + row * cell_height
+        _draw_badge(page, draw, record, (left + gap, top + gap, left + cell_width - gap, top + cell_height - gap))
+
+    buffer = BytesIO()
+    page.save(buffer, format='PNG', dpi=(DPI, DPI))
+    return buffer.getvalue()
+
+
+def render_pages(records, workers=DEFAULT_WORKERS):
+    """Rend toutes les pages (PNG) ; en parallèle dans un pool de processus si workers > 1."""
+    chunks = [records[start:start + BADGES_PER_PAGE] for start in range(0, len(records), BADGES_PER_PAGE)]
+    workers = min(workers, len(chunks))
+    if workers <= 1:
+        return [render_page(chunk) for chunk in chunks]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(render_page, chunks))
+
+
+def build_sheets(records, fmt=PDF, workers=DEFAULT_WORKERS):
+    """
+    Planches de badges des fiches données :
+    - PDF : un document de plusieurs pages ;
+    - PNG : une image par page, regroupées dans une archive ZIP s'il y a plusieurs pages.
+    Retourne (contenu, extension du fichier).
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Format de planche inconnu : {fmt} ({', '.join(FORMATS)})")
+    pages = render_pages(records, workers)
+    if not pages:
+        raise ValueError("Aucun badge à imprimer.")
+
+    if fmt == PDF:
+        images = [Image.open(BytesIO(page)) for page in pages]
+        buffer = BytesIO()
+        images[0].save(buffer, format='PDF', save_all=True, append_images=images[1:], resolution=DPI)
+        return buffer.getvalue(), 'pdf'
+
+    if len(pages) == 1:
+        return pages[0], 'png'
+    buffer = BytesIO()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_STORED) as archive:
+        for number, page in enumerate(pages, start=1):
+            archive.writestr(f'badges-page-{number:03d}.png', page)
+    return buffer.getvalue(), 'zip'
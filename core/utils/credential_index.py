@@ -0,0 +1,171 @@
+# Fichier : credential_index.py
+#
+# Description : Index en mémoire des identifiants de badge (NFC / QR code).
+#               Associe chaque identifiant à une "fiche badge" pré-construite
+#               (id employé, nom, département, rôle) afin que le kiosque puisse
+#               résoudre un scan sans aucun aller-retour vers la base de données.
+#
+#               L'index est construit paresseusement en une seule requête puis
+#               invalidé par les signaux post_save/post_delete (voir core/signals.py).
+#               Chaque processus (worker gunicorn) possède son propre index, marqué par
+#               la génération du cache Django au moment de sa construction : invalidate()
+#               incrémente cette génération (partagée si CACHES est configuré, ex: Redis)
+#               et chaque recherche la compare à celle de l'index local. Un badge
+#               désactivé ou renouvelé dans un processus n'est donc plus accepté par les
+#               autres dès la recherche suivante. La durée de vie maximale
+#               (CREDENTIAL_INDEX_TTL) reste une sécurité si le cache n'est pas partagé.
+#
+#               Seuls les employés dont le compte utilisateur est actif sont indexés.
+
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+from ..models import Employee
+
+# Durée de vie maximale de l'index, en secondes
+DEFAULT_TTL = 300
+
+GENERATION_KEY = 'credential_index:generation'
+
+_lock = threading.Lock()
+_index = None  # dict {('nfc' | 'qr', identifiant): fiche badge}
+_built_at = 0.0
+_generation = None  # génération du cache au moment de la construction de l'index
+
+
+def _get_ttl():
+    return getattr(settings, 'CREDENTIAL_INDEX_TTL', DEFAULT_TTL)
+
+
+def build_badge_record(employee):
+    """
+    Construit la fiche badge d'un employé.
+    L'employé doit avoir été chargé avec select_related('user', 'department', 'role').
+    """
+    user = employee.user
+    return {
+        'employee_id': employee.employee_id,
+        'user_id': user.id,
+        'name': f"{user.first_name} {user.last_name}".strip() or user.username,
+        'department': employee.department.name if employee.department else None,
+        'role': employee.role.name if employee.role else None,
+    }
+
+
+def _build_index():
+    """Charge toutes les fiches badge en une seule requête."""
+    index = {}
+    # Seuls les employés disposant d'au moins un identifiant sont indexés
+    employees = Employee.objects.select_related('user', 'department', 'role').filter(
+        Q(nfc_id__isnull=False) | Q(qr_code__isnull=False), user__is_active=True
+    )
+    for employee in employees:
+        record = build_badge_record(employee)
+        if employee.nfc_id:
+            index[('nfc', employee.nfc_id)] = record
+        if employee.qr_code:
+            index[('qr', employee.qr_code)] = record
+    return index
+
+
+def _is_current(generation):
+    return _index is not None and _generation == generation and time.monotonic() - _built_at <= _get_ttl()
+
+
+def _get_index():
+    global _index, _built_at, _generation
+    generation = cache.get(GENERATION_KEY, 0)
+    with _lock:
+        if not _is_current(generation):
+            _index = _build_index()
+            _built_at = time.monotonic()
+            _generation = generation
+        return _index
+
+
+def _lookup_database(nfc_id, qr_code):
+    """
+    Recherche directe en base, utilisée quand l'identifiant est absent de l'index
+    (par exemple un employé créé depuis un autre processus).
+    """
+    queryset = Employee.objects.select_related('user', 'department', 'role').filter(user__is_active=True)
+    employee = None
+    if nfc_id:
+        employee = queryset.filter(nfc_id=nfc_id).first()
+    if qr_code and not employee:
+        employee = queryset.filter(qr_code=qr_code).first()
+    if employee is None:
+        return None
+
+    record = build_badge_record(employee)
+    with _lock:
+        if _index is not None:
+            if employee.nfc_id:
+                _index[('nfc', employee.nfc_id)] = record
+            if employee.qr_code:
+                _index[('qr', employee.qr_code)] = record
+    return record
+
+
+def _lookup_index(index, nfc_id, qr_code):
+    """Recherche dans l'index (l'identifiant NFC est prioritaire, comme dans authenticate_card)."""
+    record = None
+    if nfc_id:
+        record = index.get(('nfc', nfc_id))
+    if qr_code and record is None:
+        record = index.get(('qr', qr_code))
+    return record
+
+
+def get_badge_record(nfc_id=None, qr_code=None):
+    """
+    Retourne la fiche badge correspondant à l'identifiant NFC ou au QR code,
+    ou None si aucun employé ne correspond.
+    """
+    record = _lookup_index(_get_index(), nfc_id, qr_code)
+    if record is None:
+        record = _lookup_database(nfc_id, qr_code)
+    return record
+
+
+async def aget_badge_record(nfc_id=None, qr_code=None):
+    """
+    Version asynchrone de get_badge_record.
+    Si l'index est chargé et à jour, la recherche se fait directement dans la boucle
+    d'événements (sans verrou ni requête en base) ; sinon elle est déléguée à un thread.
+    """
+    index = _index
+    if _is_current(await cache.aget(GENERATION_KEY, 0)):
+        record = _lookup_index(index, nfc_id, qr_code)
+        if record is not None:
+            return record
+    return await sync_to_async(get_badge_record)(nfc_id=nfc_id, qr_code=qr_code)
+
+
+def _next_generation():
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        # Compteur absent (premier appel ou cache vidé)
+        cache.add(GENERATION_KEY, 0, timeout=None)
+        cache.incr(GENERATION_KEY)
+
+
+def invalidate():
+    """
+    Vide l'index local et incrémente la génération partagée : les index des autres
+    processus sont reconstruits à leur prochaine recherche. L'incrémentation est
+    répétée après la validation de la transaction en cours, pour écarter un index
+    reconstruit entre-temps à partir des données d'avant l'écriture.
+    """
+    global _index
+    with _lock:
+        _index = None
+    _next_generation()
+    transaction.on_commit(_next_generation)
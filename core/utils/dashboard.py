@@ -0,0 +1,98 @@
+# Fichier : dashboard.py
+#
+# Description : Calcul des sections de la réponse de démarrage du tableau de bord
+#               employé (DashboardView : profil, statistiques, historique, congés).
+#
+#               Les sections sont indépendantes : elles sont calculées en parallèle par
+#               un pool de threads partagé, chaque thread utilisant sa propre connexion à
+#               la base (gérée comme celle d'une requête : close_old_connections respecte
+#               CONN_MAX_AGE). La première section est calculée par le thread de la requête.
+#
+#               Le pool est partagé par toutes les requêtes du processus et dimensionné
+#               par DASHBOARD_MAX_WORKERS : lorsque tous ses threads sont occupés, une
+#               section est calculée par le thread de la requête plutôt que d'attendre
+#               dans la file du pool derrière les sections des autres requêtes.
+#
+#               La langue et le fuseau horaire actifs de la requête sont activés dans
+#               chaque thread du pool : libellés traduits et bornes des jours locaux
+#               identiques à un calcul dans le thread de la requête.
+#
+#               Dans une transaction (ATOMIC_REQUESTS, tests), les autres connexions ne
+#               verraient pas les données non validées : les sections sont alors calculées
+#               l'une après l'autre. DASHBOARD_PARALLEL_SECTIONS=False (ou
+#               DASHBOARD_MAX_WORKERS=0) désactive le parallélisme.
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.utils import timezone, translation
+
+# Nombre maximal par défaut de sections calculées simultanément (hors threads des requêtes)
+DEFAULT_MAX_WORKERS = 4
+
+_executor = None
+_free_workers = None  # Sémaphore des threads libres du pool
+_executor_lock = threading.Lock()
+
+
+def get_max_workers():
+    return getattr(settings, 'DASHBOARD_MAX_WORKERS', DEFAULT_MAX_WORKERS)
+
+
+def _get_executor():
+    """Pool de threads partagé et sémaphore de ses threads libres, créés au premier appel."""
+    global _executor, _free_workers
+    with _executor_lock:
+        if _executor is None:
+            max_workers = get_max_workers()
+            _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='dashboard')
+            _free_workers = threading.BoundedSemaphore(max_workers)
+        return _executor, _free_workers
+
+
+def _run_section(compute, free_workers, language, tz):
+    close_old_connections()
+    try:
+        with translation.override(language), timezone.override(tz):
+            return compute()
+    finally:
+        close_old_connections()
+        free_workers.release()
+
+
+def can_run_in_parallel():
+    return (
+        getattr(settings, 'DASHBOARD_PARALLEL_SECTIONS', True)
+        and get_max_workers() > 0
+        and not connection.in_atomic_block
+    )
+
+
+def compute_sections(sections):
+    """
+    Calcule des sections indépendantes.
+    `sections` associe à chaque nom une fonction sans argument ; retourne un
+    dictionnaire nom -> résultat, dans le même ordre.
+    """
+    names = list(sections)
+    if len(names) < 2 or not can_run_in_parallel():
+        return {name: sections[name]() for name in names}
+
+    executor, free_workers = _get_executor()
+    # Langue et fuseau horaire de la requête, réactivés dans les threads du pool
+    language = translation.get_language()
+    tz = timezone.get_current_timezone()
+    futures = {}
+    inline = [names[0]]
+    for name in names[1:]:
+        # Pool saturé par d'autres requêtes : section calculée par le thread de la requête
+        if free_workers.acquire(blocking=False):
+            futures[name] = executor.submit(_run_section, sections[name], free_workers, language, tz)
+        else:
+            inline.append(name)
+    results = {name: sections[name]() for name in inline}
+    for name, future in futures.items():
+        results[name] = future.result()
+    return {name: results[name] for name in names}
@@ -0,0 +1,104 @@
+# Fichier : data_version.py
+#
+# Description : Version des données du tableau de bord d'un employé (EmployeeDataVersion)
+#               et requêtes conditionnelles (ETag / Last-Modified) sur les API du
+#               tableau de bord (/api/profile/, /api/stats/, /api/attendance/history/,
+#               /api/leaves/).
+#
+#               La version est incrémentée par bump() à chaque écriture sur les pointages,
+#               les demandes de congé ou le profil de l'employé (voir core/signals.py,
+#               scan_ingestion.bulk_insert_records et les actions groupées de l'administration).
+#               Le décorateur conditional_dashboard_view calcule l'ETag à partir de cette
+#               version : si le navigateur possède déjà la réponse (If-None-Match), la vue
+#               répond 304 Not Modified après une seule lecture sur clé primaire, sans
+#               recalculer les données.
+#
+#               Les réponses dépendent aussi de la date du jour (mois en cours, semaine en
+#               cours...) : la date locale fait partie de l'ETag.
+
+import hashlib
+from datetime import datetime
+from functools import wraps
+
+from django.db.models import F
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from ..models import Employee, EmployeeDataVersion
+
+
+def bump(employee_pks):
+    """Incrémente la version des données des employés donnés (une seule requête)."""
+    employee_pks = set(employee_pks)
+    if employee_pks:
+        bump_queryset(EmployeeDataVersion.objects.filter(employee_id__in=employee_pks))
+
+
+def bump_queryset(versions):
+    """Incrémente les versions sélectionnées par un queryset de EmployeeDataVersion."""
+    # Les lignes absentes sont créées à la première lecture (get_version) : une
+    # incrémentation n'en crée jamais, y compris pendant la suppression d'un employé
+    versions.update(version=F('version') + 1, updated_at=timezone.now())
+
+
+def get_version(employee_pk):
+    """Version courante des données d'un employé, ou None si l'employé n'existe pas."""
+    try:
+        return EmployeeDataVersion.objects.get(employee_id=employee_pk)
+    except EmployeeDataVersion.DoesNotExist:
+        if not Employee.objects.filter(pk=employee_pk).exists():
+            return None
+        version, _ = EmployeeDataVersion.objects.get_or_create(
+            employee_id=employee_pk, defaults={'updated_at': timezone.now()}
+        )
+        return version
+
+
+def _request_version(request):
+    # Lue une seule fois par requête (ETag et Last-Modified)
+    if not hasattr(request, '_employee_data_version'):
+        # La clé primaire de l'employé est celle de son utilisateur
+        request._employee_data_version = get_version(request.user.pk) if request.user.is_authenticated else None
+    return request._employee_data_version
+
+
+def _etag(request, *args, **kwargs):
+    version = _request_version(request)
+    if version is None:
+        return None
+    key = ':'.join([
+        # Les paramètres (période, filtre, page, format du QR code...) changent la réponse
+        request.get_full_path(),
+        str(version.employee_id),
+        str(version.version),
+        version.updated_at.isoformat(),
+        timezone.localdate().isoformat(),
+        request.headers.get('Accept', ''),
+    ])
+    return hashlib.sha256(key.encode()).hexdigest()[:32]
+
+
+def _last_modified(request, *args, **kwargs):
+    version = _request_version(request)
+    if version is None:
+        return None
+    # Les réponses changent aussi au changement de jour
+    today_start = timezone.make_aware(datetime.combine(timezone.localdate(), datetime.min.time()))
+    return max(version.updated_at, today_start)
+
+
+def conditional_dashboard_view(view_func):
+    """
+    Décorateur des vues GET du tableau de bord employé : ajoute ETag et Last-Modified,
+    et répond 304 Not Modified si les données de l'employé n'ont pas changé.
+    Les réponses restent privées et sont revalidées à chaque affichage.
+    """
+    conditional_view = condition(etag_func=_etag, last_modified_func=_last_modified)(view_func)
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        response = conditional_view(request, *args, **kwargs)
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+    return wrapper
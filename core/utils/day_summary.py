@@ -0,0 +1,163 @@
+# Fichier : day_summary.py
+#
+# Description : Maintenance de la table AttendanceDaySummary (résumé des pointages
+#               d'un employé pour un jour local).
+#
+#               Chaque création, modification ou suppression d'un pointage recalcule
+#               les jours qu'il peut affecter (voir core/signals.py, et
+#               scan_ingestion.bulk_insert_records pour les insertions groupées) ;
+#               la commande rebuild_day_summaries reconstruit la table complète.
+#
+#               Les durées sont calculées par core/utils/durations.py : un intervalle
+#               qui passe minuit est réparti entre les jours concernés. Un pointage
+#               affecte donc les jours compris entre le pointage de la même famille
+#               (entrée/sortie ou pause) qui le précède et celui qui le suit.
+
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+
+from ..models import AttendanceRecord, AttendanceDaySummary
+from .attendance_stats import local_day_bounds
+from .durations import (
+    BREAK_TYPES, PRESENCE_TYPES, DayDurations,
+    carried_durations, closing_records, first_record_after, last_record_before,
+)
+
+SUMMARY_FIELDS = ['first_in', 'last_out', 'worked_seconds', 'break_seconds', 'record_count']
+
+
+def summarize_rows(rows, durations):
+    """
+    Parcourt des pointages (horodatage, type) triés chronologiquement : alimente
+    l'accumulateur de durées et retourne, par jour local, la première entrée,
+    la dernière sortie et le nombre de pointages.
+    """
+    tz = durations.tz
+    days = {}
+    for timestamp, record_type in rows:
+        day = timestamp.astimezone(tz).date()
+        durations.add(timestamp, record_type, day)
+        fields = days.get(day)
+        if fields is None:
+            fields = days[day] = {'first_in': None, 'last_out': None, 'record_count': 0}
+        fields['record_count'] += 1
+        if record_type == 'IN':
+            if fields['first_in'] is None:
+                fields['first_in'] = timestamp
+        elif record_type == 'OUT':
+            fields['last_out'] = timestamp
+    return days
+
+
+def build_summaries(employee_pk, days, durations, first_day=None, last_day=None):
+    """
+    Construit les objets AttendanceDaySummary (non enregistrés) des jours compris
+    entre first_day et last_day : jours avec pointages, et jours sans pointage
+    couverts par un intervalle (ex: équipe de nuit).
+    """
+    summaries = []
+    for day in sorted(set(days) | set(durations.worked) | set(durations.breaks)):
+        if (first_day is not None and day < first_day) or (last_day is not None and day > last_day):
+            continue
+        worked = round(durations.worked.get(day, 0))
+        breaks = round(durations.breaks.get(day, 0))
+        fields = days.get(day)
+        if fields is None:
+            if not worked and not breaks:
+                continue
+            fields = {'first_in': None, 'last_out': None, 'record_count': 0}
+        summaries.append(AttendanceDaySummary(
+            employee_id=employee_pk, date=day, worked_seconds=worked, break_seconds=breaks, **fields
+        ))
+    return summaries
+
+
+def _rows(employee_pk, start, end):
+    return AttendanceRecord.objects.filter(
+        employee_id=employee_pk,
+        timestamp__gte=start,
+        timestamp__lt=end
+    ).order_by('timestamp', 'id').values_list('timestamp', 'record_type')
+
+
+def refresh_around(employee_pk, timestamps):
+    """
+    Recalcule les résumés d'un employé après la création, la modification ou la
+    suppression de pointages à ces instants.
+    """
+    low, high = min(timestamps), max(timestamps)
+    for record_types in (PRESENCE_TYPES, BREAK_TYPES):
+        previous = last_record_before(employee_pk, record_types, low)
+        if previous is not None:
+            low = previous[0]
+        following = first_record_after(employee_pk, record_types, high)
+        if following is not None:
+            high = following[0]
+
+    tz = timezone.get_current_timezone()
+    first_day = low.astimezone(tz).date()
+    last_day = high.astimezone(tz).date()
+    span_start = local_day_bounds(first_day, first_day)[0]
+    span_end = local_day_bounds(last_day, last_day)[1]
+    # Les intervalles ouverts avant le début du premier jour sont repris depuis minuit
+    durations = carried_durations(employee_pk, span_start, tz=tz)
+
+    days = summarize_rows(_rows(employee_pk, span_start, span_end), durations)
+    # Un intervalle encore ouvert à la fin de la période peut se clore plus tard :
+    # la période est prolongée jusqu'au jour de sa clôture
+    while durations.is_open():
+        closing = closing_records(employee_pk, durations, span_end)
+        if not closing:
+            break
+        last_day = durations.local_date(closing[-1][0])
+        next_end = local_day_bounds(last_day, last_day)[1]
+        days.update(summarize_rows(_rows(employee_pk, span_end, next_end), durations))
+        span_end = next_end
+
+    summaries = build_summaries(employee_pk, days, durations, first_day, last_day)
+    with transaction.atomic():
+        AttendanceDaySummary.objects.filter(
+            employee_id=employee_pk, date__gte=first_day, date__lte=last_day
+        ).delete()
+        AttendanceDaySummary.objects.bulk_create(summaries)
+
+
+def refresh_for_changes(changes):
+    """Recalcule les résumés touchés par une liste de couples (clé primaire de l'employé, horodatage)."""
+    by_employee = defaultdict(list)
+    for employee_pk, timestamp in changes:
+        by_employee[employee_pk].append(timestamp)
+    with transaction.atomic():
+        for employee_pk, timestamps in sorted(by_employee.items()):
+            refresh_around(employee_pk, timestamps)
+
+
+def refresh_for_records(records):
+    """Recalcule les résumés touchés par une liste de pointages."""
+    refresh_for_changes((record.employee_id, record.timestamp) for record in records)
+
+
+def rebuild_employee(employee_pk, since=None):
+    """
+    Reconstruit tous les résumés d'un employé (à partir du jour `since` s'il est fourni)
+    en lisant ses pointages une seule fois.
+    Retourne le nombre de résumés créés.
+    """
+    records = AttendanceRecord.objects.filter(employee_id=employee_pk)
+    summaries = AttendanceDaySummary.objects.filter(employee_id=employee_pk)
+    if since is not None:
+        span_start = local_day_bounds(since, since)[0]
+        durations = carried_durations(employee_pk, span_start)
+        records = records.filter(timestamp__gte=span_start)
+        summaries = summaries.filter(date__gte=since)
+    else:
+        durations = DayDurations()
+
+    rows = records.order_by('timestamp', 'id').values_list('timestamp', 'record_type').iterator()
+    new_summaries = build_summaries(employee_pk, summarize_rows(rows, durations), durations, first_day=since)
+    with transaction.atomic():
+        summaries.delete()
+        AttendanceDaySummary.objects.bulk_create(new_summaries, batch_size=500)
+    return len(new_summaries)
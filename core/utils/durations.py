@@ -0,0 +1,129 @@
+# Fichier : durations.py
+#
+# Description : Calcul des durées de présence et de pause par jour local, en un seul
+#               passage sur des pointages triés chronologiquement.
+#
+#               Les pointages sont lus sous forme de tuples (values_list) : aucun objet
+#               modèle, aucune conversion en chaîne. Une entrée est associée à la sortie
+#               qui la suit, un début de pause à la fin de pause qui le suit. Un intervalle
+#               qui passe minuit (équipe de nuit) est réparti entre les jours concernés.
+#               Les écarts sont calculés sur les horodatages UTC : les changements d'heure
+#               n'ont pas d'effet sur les durées.
+#
+#               Utilisé par AttendanceHistoryView et par les résumés journaliers
+#               (core/utils/day_summary.py).
+
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+from ..models import AttendanceRecord
+
+ONE_DAY = timedelta(days=1)
+PRESENCE_TYPES = ('IN', 'OUT')
+BREAK_TYPES = ('BREAK_START', 'BREAK_END')
+
+
+class DayDurations:
+    """
+    Accumulateur des durées par jour local.
+    add() est appelé pour chaque pointage, dans l'ordre chronologique ;
+    worked et breaks associent à chaque jour une durée en secondes.
+    """
+    __slots__ = ('tz', 'worked', 'breaks', 'in_time', 'break_start')
+
+    def __init__(self, in_time=None, break_start=None, tz=None):
+        self.tz = tz or timezone.get_current_timezone()
+        self.worked = defaultdict(float)
+        self.breaks = defaultdict(float)
+        # Intervalles ouverts : (horodatage, jour local) de l'entrée / du début de pause
+        self.in_time = (in_time, self.local_date(in_time)) if in_time else None
+        self.break_start = (break_start, self.local_date(break_start)) if break_start else None
+
+    def local_date(self, timestamp):
+        return timestamp.astimezone(self.tz).date()
+
+    def add(self, timestamp, record_type, day=None):
+        """Ajoute un pointage ; `day` (jour local) est calculé s'il n'est pas fourni."""
+        if day is None:
+            day = timestamp.astimezone(self.tz).date()
+        if record_type == 'IN':
+            self.in_time = (timestamp, day)
+        elif record_type == 'OUT':
+            if self.in_time is not None:
+                self._add_interval(self.worked, self.in_time[0], self.in_time[1], timestamp, day)
+                self.in_time = None
+            # Une pause non terminée ne survit pas à la sortie : elle n'est pas comptée
+            self.break_start = None
+        elif record_type == 'BREAK_START':
+            self.break_start = (timestamp, day)
+        elif record_type == 'BREAK_END':
+            if self.break_start is not None:
+                self._add_interval(self.breaks, self.break_start[0], self.break_start[1], timestamp, day)
+                self.break_start = None
+
+    def _add_interval(self, totals, start, start_day, end, end_day):
+        # Découpage aux minuits locaux (cas rare : seulement si l'intervalle change de jour)
+        while start_day < end_day:
+            next_day = start_day + ONE_DAY
+            midnight = datetime.combine(next_day, time.min, tzinfo=self.tz)
+            totals[start_day] += (midnight - start).total_seconds()
+            start, start_day = midnight, next_day
+        totals[start_day] += (end - start).total_seconds()
+
+    def is_open(self):
+        """Indique si une entrée ou un début de pause attend encore sa clôture."""
+        return self.in_time is not None or self.break_start is not None
+
+
+def last_record_before(employee_pk, record_types, timestamp):
+    """Dernier pointage (horodatage, type) parmi record_types strictement avant timestamp."""
+    return AttendanceRecord.objects.filter(
+        employee_id=employee_pk,
+        record_type__in=record_types,
+        timestamp__lt=timestamp
+    ).order_by('-timestamp', '-id').values_list('timestamp', 'record_type').first()
+
+
+def first_record_after(employee_pk, record_types, timestamp):
+    """Premier pointage (horodatage, type) parmi record_types strictement après timestamp."""
+    return AttendanceRecord.objects.filter(
+        employee_id=employee_pk,
+        record_type__in=record_types,
+        timestamp__gt=timestamp
+    ).order_by('timestamp', 'id').values_list('timestamp', 'record_type').first()
+
+
+def carried_durations(employee_pk, before, tz=None):
+    """
+    Accumulateur initialisé avec les intervalles encore ouverts à l'instant `before`
+    (entrée sans sortie, pause sans fin), pour une période qui commence à cet instant.
+    """
+    last_presence = last_record_before(employee_pk, PRESENCE_TYPES, before)
+    last_break = last_record_before(employee_pk, BREAK_TYPES, before)
+    in_time = last_presence[0] if last_presence and last_presence[1] == 'IN' else None
+    break_start = last_break[0] if last_break and last_break[1] == 'BREAK_START' else None
+    # Pause abandonnée par une sortie postérieure
+    if break_start and last_presence and last_presence[1] == 'OUT' and last_presence[0] > break_start:
+        break_start = None
+    return DayDurations(in_time=in_time, break_start=break_start, tz=tz)
+
+
+def closing_records(employee_pk, durations, start):
+    """
+    Premiers pointages (horodatage, type), à partir de l'instant `start` inclus, des
+    familles dont un intervalle est encore ouvert dans l'accumulateur. Triés
+    chronologiquement ; permettent de clore une session en cours en fin de période.
+    """
+    rows = []
+    for interval, record_types in ((durations.in_time, PRESENCE_TYPES), (durations.break_start, BREAK_TYPES)):
+        if interval is not None:
+            row = AttendanceRecord.objects.filter(
+                employee_id=employee_pk,
+                record_type__in=record_types,
+                timestamp__gte=start
+            ).order_by('timestamp', 'id').values_list('timestamp', 'record_type').first()
+            if row is not None:
+                rows.append(row)
+    return sorted(rows)
@@ -1,45 +1,277 @@
-# utils.py
-import qrcode
-from io import BytesIO
+# Fichier : generate_qr_code.py
+#
+# Description : Service de rendu des QR codes des badges employés, utilisé par
+#               l'administration (aperçu du QR code), le tableau de bord employé et
+#               l'API mobile (image du profil).
+#
+#               Le QR code d'un employé ne change presque jamais : les images rendues
+#               sont mémorisées dans un cache LRU borné (QR_RENDER_CACHE_SIZE entrées),
+#               par clé (contenu, taille des modules, format). Un profil déjà affiché
+#               est servi sans reconstruire la matrice ni rastériser l'image avec PIL.
+#               Le cache LRU est propre à chaque processus ; avec QR_RENDER_CACHE_TIMEOUT > 0,
+#               les images sont aussi conservées dans le cache Django (partagé entre les
+#               workers si CACHES est configuré, ex: Redis).
+#
+#               Formats de sortie :
+#               - PNG (et PNG_DATA_URL, URL data: en base64) : image rastérisée par PIL ;
+#               - SVG : image vectorielle, un seul chemin par ligne de modules, sans PIL ;
+#               - MATRIX : matrice de modules brute (bits compactés en base64), que le
+#                 client dessine lui-même (application mobile, page du kiosque).
+#               Les API de profil choisissent le format par le paramètre ?qr_format=
+#               ou l'en-tête Accept (voir negotiate_format).
+
 import base64
+import hashlib
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+import qrcode
+from django.conf import settings
+from django.core.cache import cache
 from django.utils.html import format_html
 
+# Paramètres du QR code des badges
+DEFAULT_BOX_SIZE = 10
+BORDER = 4
+ERROR_CORRECTION = qrcode.constants.ERROR_CORRECT_L
+
+# Formats de sortie
+PNG = 'PNG'
+PNG_DATA_URL = 'PNG_DATA_URL'
+SVG = 'SVG'
+MATRIX = 'MATRIX'
+
+# Négociation du format dans les API (paramètre ?qr_format= ou en-tête Accept)
+FORMAT_PARAM = 'qr_format'
+FORMAT_NAMES = {'png': PNG, 'svg': SVG, 'matrix': MATRIX}
+SVG_MEDIA_TYPE = 'image/svg+xml'
+MATRIX_MEDIA_TYPE = 'application/vnd.buskoguard.qr-matrix+json'
+
+# Nombre maximal d'images mémorisées par processus
+DEFAULT_CACHE_SIZE = 512
+
+_lock = threading.Lock()
+_memo = OrderedDict()  # {(contenu, taille, format): image rendue}
+_stats = {'hits': 0, 'misses': 0}
+
+
+def _get_cache_size():
+    return getattr(settings, 'QR_RENDER_CACHE_SIZE', DEFAULT_CACHE_SIZE)
+
+
+def _get_cache_timeout():
+    return getattr(settings, 'QR_RENDER_CACHE_TIMEOUT', 0)
+
+
+def _django_cache_key(key):
+    payload, size, fmt = key
+    digest = hashlib.sha256(payload.encode()).hexdigest()[:32]
+    return f'qr_render:{fmt}:{size}:{digest}'
+
+
+def _memo_get(key):
+    with _lock:
+        value = _memo.get(key)
+        if value is not None:
+            _memo.move_to_end(key)
+            _stats['hits'] += 1
+        return value
+
+
+def _memo_set(key, value):
+    with _lock:
+        _stats['misses'] += 1
+        _memo[key] = value
+        _memo.move_to_end(key)
+        while len(_memo) > max(_get_cache_size(), 0):
+            _memo.popitem(last=False)
+
+
+def _make_qr(data, box_size=DEFAULT_BOX_SIZE, border=BORDER, error_correction=ERROR_CORRECTION):
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=error_correction,
+        box_size=box_size,
+        border=border,
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+    return qr
+
+
+def _render_png(data, box_size, error_correction=ERROR_CORRECTION):
+    qr = _make_qr(data, box_size, error_correction=error_correction)
+    img = qr.make_image(fill_color="black", back_color="white")
+    buffer = BytesIO()
+    img.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def render_png(data, box_size=DEFAULT_BOX_SIZE):
+    """
+    Rendu PNG direct, sans mémorisation ni lecture des réglages Django : utilisable
+    dans un processus de rendu (voir utils/badge_sheets.py).
+    """
+    return _render_png(data, box_size)
+
+
+def _render_svg(data, box_size, error_correction=ERROR_CORRECTION):
+    # Matrice avec la zone de silence ; une unité du viewBox = un module
+    matrix = _make_qr(data, error_correction=error_correction).get_matrix()
+    count = len(matrix)
+    path = []
+    for y, row in enumerate(matrix):
+        x = 0
+        while x < count:
+            if not row[x]:
+                x += 1
+                continue
+            start = x
+            while x < count and row[x]:
+                x += 1
+            path.append(f"M{start} {y}h{x - start}v1h-{x - start}z")
+    size = count * box_size
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {count} {count}" '
+        f'width="{size}" height="{size}" shape-rendering="crispEdges">'
+        f'<rect width="{count}" height="{count}" fill="#fff"/>'
+        f'<path d="{"".join(path)}" fill="#000"/></svg>'
+    )
+
+
+def _render_matrix(data, error_correction=ERROR_CORRECTION):
+    # Matrice sans la zone de silence, lignes concaténées, bit de poids fort en premier
+    matrix = _make_qr(data, border=0, error_correction=error_correction).get_matrix()
+    bits = [cell for row in matrix for cell in row]
+    packed = bytearray((len(bits) + 7) // 8)
+    for index, cell in enumerate(bits):
+        if cell:
+            packed[index // 8] |= 0x80 >> (index % 8)
+    return {
+        'size': len(matrix),
+        'border': BORDER,
+        'bits': base64.b64encode(bytes(packed)).decode('ascii'),
+    }
+
+
+def _render(data, box_size, fmt):
+    if fmt == PNG:
+        return _render_png(data, box_size)
+    if fmt == SVG:
+        return _render_svg(data, box_size)
+    if fmt == MATRIX:
+        return _render_matrix(data)
+    if fmt == PNG_DATA_URL:
+        png = render(data, box_size, PNG)
+        return f"data:image/png;base64,{base64.b64encode(png).decode('utf-8')}"
+    raise ValueError(f"Format de QR code inconnu : {fmt}")
+
+
+def render(data, box_size=DEFAULT_BOX_SIZE, fmt=PNG):
+    """
+    Rendu d'un QR code, mémorisé par (contenu, taille, format).
+    Retourne les octets de l'image pour PNG, une URL data: pour PNG_DATA_URL, le
+    document SVG (str) pour SVG et un dictionnaire {size, border, bits} pour MATRIX.
+    Les valeurs retournées sont partagées : ne pas les modifier.
+    """
+    if fmt == MATRIX:
+        # La taille des modules ne change pas la matrice
+        box_size = 1
+    key = (data, box_size, fmt)
+    value = _memo_get(key)
+    if value is not None:
+        return value
+
+    timeout = _get_cache_timeout()
+    if timeout > 0:
+        value = cache.get(_django_cache_key(key))
+    if value is None:
+        value = _render(data, box_size, fmt)
+        if timeout > 0:
+            cache.set(_django_cache_key(key), value, timeout=timeout)
+    _memo_set(key, value)
+    return value
+
+
+def qr_data_url(data, box_size=DEFAULT_BOX_SIZE):
+    """URL data: (PNG en base64) du QR code, ou None si le contenu est vide."""
+    if not data:
+        return None
+    return render(data, box_size, PNG_DATA_URL)
+
+
+def qr_svg(data, box_size=DEFAULT_BOX_SIZE):
+    """Document SVG du QR code, ou None si le contenu est vide."""
+    if not data:
+        return None
+    return render(data, box_size, SVG)
+
+
+def qr_matrix(data):
+    """
+    Matrice du QR code, ou None si le contenu est vide :
+    - size : nombre de modules par côté (sans la zone de silence) ;
+    - border : largeur recommandée de la zone de silence, en modules ;
+    - bits : modules (1 = noir) ligne par ligne, compactés bit de poids fort en premier, en base64.
+    """
+    if not data:
+        return None
+    return dict(render(data, fmt=MATRIX))
+
+
+def negotiate_format(request):
+    """
+    Format de QR code demandé par une requête : paramètre ?qr_format=png|svg|matrix,
+    sinon en-tête Accept (image/svg+xml, MATRIX_MEDIA_TYPE), sinon PNG.
+    Lève ValueError si le paramètre est inconnu.
+    """
+    name = request.GET.get(FORMAT_PARAM)
+    if name:
+        try:
+            return FORMAT_NAMES[name.lower()]
+        except KeyError:
+            raise ValueError(f"Format de QR code inconnu : {name} (png, svg ou matrix)")
+    accept = request.headers.get('Accept', '')
+    if MATRIX_MEDIA_TYPE in accept:
+        return MATRIX
+    if SVG_MEDIA_TYPE in accept:
+        return SVG
+    return PNG
+
+
+def clear_cache():
+    """Vide le cache LRU du processus (le cache Django n'est pas modifié)."""
+    with _lock:
+        _memo.clear()
+        _stats['hits'] = 0
+        _stats['misses'] = 0
+
+
+def get_metrics():
+    """Taille du cache LRU et compteurs de succès (hits) / échecs (misses) du processus."""
+    with _lock:
+        return {'size': len(_memo), 'max_size': _get_cache_size(), **_stats}
+
+
 def generate_qr_code(data, as_html=False, width=150, height=150):
     """
     Génère une image QR code à partir d'une chaîne de caractères.
-    
+
     Args:
         data: La chaîne à encoder dans le QR code
         as_html: Si True, retourne une balise HTML img, sinon retourne l'URL data en base64
         width/height: Dimensions de l'image si as_html=True
-    
+
     Returns:
         Une chaîne contenant soit une URL data en base64, soit une balise img HTML
     """
-    if not data:
+    img_url = qr_data_url(data)
+    if img_url is None:
         return None
-        
-    # Création d'un QR code
-    qr = qrcode.QRCode(
-        version=1,
-        error_correction=qrcode.constants.ERROR_CORRECT_L,
-        box_size=10,
-        border=4,
-    )
-    qr.add_data(data)
-    qr.make(fit=True)
-    
-    # Création d'une image
-    img = qr.make_image(fill_color="black", back_color="white")
-    buffer = BytesIO()
-    img.save(buffer, format="PNG")
-    img_str = base64.b64encode(buffer.getvalue()).decode('utf-8')
-    
-    # URL de l'image en base64
-    img_url = f"data:image/png;base64,{img_str}"
-    
+
     # Retourne soit l'URL, soit une balise HTML img
     if as_html:
-        return format_html('<img src="{}" width="{}" height="{}"/>', 
+        return format_html('<img src="{}" width="{}" height="{}"/>',
                           img_url, width, height)
-    return img_url
\ No newline at end of file
+    return img_url
@@ -0,0 +1,101 @@
+# Fichier : kiosk_token.py
+#
+# Description : Jetons de kiosque signés (HMAC, clé SECRET_KEY) et de courte durée.
+#               Un jeton est délivré par authenticate_card après un scan et porte
+#               l'identité de l'employé ainsi que l'identifiant du kiosque.
+#               record_attendance le vérifie sans aucune écriture en base, ce qui
+#               remplace l'ouverture d'une session Django à chaque scan.
+#
+#               Un jeton n'autorise qu'un seul pointage : il porte un nonce aléatoire,
+#               marqué comme utilisé dans le cache Django (cache.add, atomique) par
+#               consume_kiosk_token. Avec plusieurs workers, le cache doit être partagé
+#               (REDIS_URL) pour qu'un jeton ne puisse pas être rejoué sur un autre worker ;
+#               la vérification core.W001 (core/checks.py) signale un cache local.
+#
+#               Chaque kiosque dispose aussi d'une clé secrète (HMAC de son identifiant,
+#               voir make_kiosk_key et la commande kiosk_key), qui authentifie les appels
+#               faits sans scan préalable (envoi groupé des scans en attente).
+
+import secrets
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+SALT = 'core.kiosk_token'
+KEY_SALT = 'core.kiosk_token.kiosk_key'
+# Durée de validité par défaut d'un jeton, en secondes (temps de choisir l'action sur le kiosque)
+DEFAULT_MAX_AGE = 10
+
+USED_KEY_PREFIX = 'kiosk_token:used:'
+
+# Exceptions levées par read_kiosk_token et consume_kiosk_token
+BadKioskToken = signing.BadSignature
+ExpiredKioskToken = signing.SignatureExpired
+
+
+class UsedKioskToken(BadKioskToken):
+    """Jeton déjà utilisé pour un pointage."""
+
+
+def get_max_age():
+    return getattr(settings, 'KIOSK_TOKEN_MAX_AGE', DEFAULT_MAX_AGE)
+
+
+def make_kiosk_token(employee_pk, kiosk_id=None):
+    """Crée un jeton signé et horodaté pour un employé sur un kiosque donné."""
+    return signing.dumps({'e': employee_pk, 'k': kiosk_id, 'n': secrets.token_urlsafe(12)}, salt=SALT)
+
+
+def _load(token):
+    payload = signing.loads(token, salt=SALT, max_age=get_max_age())
+    if not isinstance(payload, dict) or 'e' not in payload or not payload.get('n'):
+        raise BadKioskToken("Contenu du jeton invalide")
+    return payload
+
+
+def read_kiosk_token(token):
+    """
+    Vérifie la signature et l'âge d'un jeton, sans le consommer.
+    Retourne le tuple (clé primaire de l'employé, identifiant du kiosque).
+    Lève ExpiredKioskToken si le jeton a expiré, BadKioskToken s'il est invalide.
+    """
+    payload = _load(token)
+    return payload['e'], payload.get('k')
+
+
+def _used_key(token):
+    return USED_KEY_PREFIX + _load(token)['n']
+
+
+def consume_kiosk_token(token):
+    """
+    Marque un jeton valide comme utilisé. Lève UsedKioskToken s'il l'a déjà été.
+    Le nonce est conservé au moins aussi longtemps que le jeton est valide.
+    """
+    if not cache.add(_used_key(token), True, timeout=get_max_age() + 1):
+        raise UsedKioskToken("Jeton déjà utilisé")
+
+
+async def aconsume_kiosk_token(token):
+    """Version asynchrone de consume_kiosk_token."""
+    if not await cache.aadd(_used_key(token), True, timeout=get_max_age() + 1):
+        raise UsedKioskToken("Jeton déjà utilisé")
+
+
+def _get_key_secret():
+    # KIOSK_KEY_SECRET permet de révoquer toutes les clés de kiosque sans changer SECRET_KEY
+    return getattr(settings, 'KIOSK_KEY_SECRET', None) or settings.SECRET_KEY
+
+
+def make_kiosk_key(kiosk_id):
+    """Clé secrète d'un kiosque, à configurer sur le kiosque (en-tête X-Kiosk-Key)."""
+    return salted_hmac(KEY_SALT, kiosk_id, secret=_get_key_secret(), algorithm='sha256').hexdigest()
+
+
+def check_kiosk_key(kiosk_id, key):
+    """Indique si `key` est la clé du kiosque `kiosk_id`."""
+    if not isinstance(kiosk_id, str) or not kiosk_id or not isinstance(key, str) or not key:
+        return False
+    return constant_time_compare(make_kiosk_key(kiosk_id), key)
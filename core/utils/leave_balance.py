@@ -0,0 +1,212 @@
+# Fichier : leave_balance.py
+#
+# Description : Soldes de congés par employé et par année (LeaveBalance).
+#
+#               La durée d'une demande est comptée en jours ouvrés (leave_days : jours de
+#               semaine hors jours fériés, voir utils/work_calendar.py). Un changement des
+#               jours fériés recalcule tous les soldes (rebuild_all, signaux de Holiday).
+#
+#               Chaque demande de congé contribue au solde de l'année de sa date de début :
+#               - en attente (PENDING) : days_pending (+ durée) et pending_count (+1) ;
+#               - approuvée (APPROVED) : days_used (+ durée) ;
+#               - rejetée ou annulée (REJECTED) : aucune contribution.
+#               À chaque changement (signaux de core/signals.py, actions groupées de
+#               l'administration), l'ancienne contribution est retirée et la nouvelle
+#               ajoutée par une incrémentation en SQL (UPDATE ... SET x = x + n), dans la
+#               transaction de l'écriture.
+#
+#               Une ligne absente (nouvelle année, nouvel employé) est calculée à partir
+#               des demandes au moment de l'écriture, qui en tiennent déjà compte.
+#               Le quota vient du rôle de l'employé (Role.annual_leave_quota), à défaut
+#               du réglage LEAVE_ANNUAL_QUOTA.
+
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from ..models import Employee, LeaveBalance, LeaveRequest
+from . import work_calendar
+
+# Quota annuel par défaut, en jours
+DEFAULT_QUOTA = 25
+
+# Types de congé imputés sur le quota annuel : une nouvelle demande de ces types est
+# refusée si le solde est insuffisant. Les autres (maladie, etc.) ne sont jamais refusés.
+ANNUAL_LEAVE_TYPES = {'VACATION'}
+
+def default_quota():
+    return getattr(settings, 'LEAVE_ANNUAL_QUOTA', DEFAULT_QUOTA)
+
+
+def quota_for_role(role):
+    """Quota annuel de congés d'un rôle (quota par défaut si le rôle est vide ou sans quota)."""
+    if role is None or role.annual_leave_quota is None:
+        return default_quota()
+    return role.annual_leave_quota
+
+
+# Compteurs d'un solde calculés à partir des demandes
+COUNTER_FIELDS = ('days_used', 'days_pending', 'pending_count')
+
+
+def leave_days(start_date, end_date):
+    """Durée d'un congé en jours ouvrés, jours de début et de fin inclus."""
+    return work_calendar.default_calendar.count_workdays(start_date, end_date)
+
+
+def contribution(status, start_date, end_date):
+    """Contribution d'une demande de congé aux compteurs du solde de son année."""
+    days = leave_days(start_date, end_date)
+    if status == 'APPROVED':
+        return {'days_used': days}
+    if status == 'PENDING':
+        return {'days_pending': days, 'pending_count': 1}
+    return {}
+
+
+def add_change(changes, employee_pk, start_date, end_date, status, sign=1):
+    """
+    Ajoute (sign=1) ou retire (sign=-1) la contribution d'une demande à `changes`,
+    dictionnaire (employé, année) -> Counter des compteurs.
+    """
+    counters = changes[(employee_pk, start_date.year)]
+    for field, value in contribution(status, start_date, end_date).items():
+        counters[field] += sign * value
+
+
+def new_changes():
+    return defaultdict(Counter)
+
+
+def compute_counters(employee_pk, year):
+    """
+    Compteurs du solde d'une année, calculés à partir des demandes (une requête ; la
+    durée en jours ouvrés dépend des jours fériés et n'est pas calculée en SQL).
+    """
+    counters = Counter()
+    for start_date, end_date, status in LeaveRequest.objects.filter(
+        employee_id=employee_pk, start_date__year=year, status__in=['APPROVED', 'PENDING']
+    ).values_list('start_date', 'end_date', 'status'):
+        counters.update(contribution(status, start_date, end_date))
+    return {field: counters[field] for field in COUNTER_FIELDS}
+
+
+def rebuild(employee_pk, year, quota=None):
+    """(Re)calcule le solde d'un employé pour une année et retourne la ligne."""
+    if quota is None:
+        employee = Employee.objects.select_related('role').get(pk=employee_pk)
+        quota = quota_for_role(employee.role)
+    balance, _ = LeaveBalance.objects.update_or_create(
+        employee_id=employee_pk, year=year,
+        defaults={'quota': quota, **compute_counters(employee_pk, year)}
+    )
+    return balance
+
+
+def rebuild_employee(employee_pk):
+    """
+    (Re)calcule tous les soldes d'un employé : années de ses demandes et année en cours.
+    Retourne le nombre de soldes calculés.
+    """
+    employee = Employee.objects.select_related('role').get(pk=employee_pk)
+    quota = quota_for_role(employee.role)
+    years = set(LeaveRequest.objects.filter(employee_id=employee_pk).values_list('start_date__year', flat=True))
+    years.add(timezone.localdate().year)
+    with transaction.atomic():
+        for year in sorted(years):
+            rebuild(employee_pk, year, quota)
+    return len(years)
+
+
+def apply_changes(changes, create=True):
+    """
+    Applique les variations de compteurs à appeler après l'écriture des demandes.
+    Une ligne absente est calculée à partir des demandes si create=True (sinon ignorée,
+    par exemple pendant la suppression d'un employé).
+    """
+    with transaction.atomic():
+        for (employee_pk, year), counters in changes.items():
+            increments = {field: F(field) + value for field, value in counters.items() if value}
+            if not increments:
+                continue
+            if LeaveBalance.objects.filter(employee_id=employee_pk, year=year).update(**increments):
+                continue
+            if not create:
+                continue
+            try:
+                with transaction.atomic():
+                    rebuild(employee_pk, year)
+            except IntegrityError:
+                # Ligne créée entre-temps par une autre transaction
+                LeaveBalance.objects.filter(employee_id=employee_pk, year=year).update(**increments)
+
+
+def rebuild_all():
+    """
+    Recalcule les compteurs de tous les soldes existants, par exemple après une
+    modification des jours fériés (qui change la durée des demandes en jours ouvrés).
+    Une requête pour les demandes, une pour les soldes, puis des mises à jour par lots.
+    Retourne le nombre de soldes recalculés.
+    """
+    counters = defaultdict(Counter)
+    for employee_pk, start_date, end_date, status in LeaveRequest.objects.filter(
+        status__in=['APPROVED', 'PENDING']
+    ).values_list('employee_id', 'start_date', 'end_date', 'status').iterator():
+        counters[(employee_pk, start_date.year)].update(contribution(status, start_date, end_date))
+
+    balances = list(LeaveBalance.objects.only('pk', 'employee_id', 'year', *COUNTER_FIELDS))
+    for balance in balances:
+        values = counters.get((balance.employee_id, balance.year), Counter())
+        for field in COUNTER_FIELDS:
+            setattr(balance, field, values[field])
+    LeaveBalance.objects.bulk_update(balances, COUNTER_FIELDS, batch_size=500)
+    return len(balances)
+
+
+def _balance_totals(employee, year):
+    """Agrégation des lignes de solde d'un employé (une requête)."""
+    year_filter = Q(year=year)
+    return LeaveBalance.objects.filter(employee=employee).aggregate(
+        rows=Count('pk', filter=year_filter),
+        quota=Sum('quota', filter=year_filter),
+        days_used=Sum('days_used', filter=year_filter),
+        days_pending=Sum('days_pending', filter=year_filter),
+        pending_requests=Sum('pending_count'),
+    )
+
+
+def get_balance(employee, year):
+    """
+    Solde de congés d'un employé pour une année, en une seule requête sur ses lignes de solde :
+    - quota, days_used, days_remaining, days_pending : pour l'année ;
+    - pending_requests : demandes en attente, toutes années confondues.
+    Une ligne absente est calculée ; si une requête concurrente la crée en même temps,
+    la ligne de cette requête est relue.
+    """
+    result = _balance_totals(employee, year)
+    if not result['rows']:
+        try:
+            with transaction.atomic():
+                rebuild(employee.pk, year, quota_for_role(employee.role))
+        except IntegrityError:
+            # Ligne créée entre-temps par une autre transaction
+            pass
+        result = _balance_totals(employee, year)
+    return {
+        'quota': result['quota'],
+        'days_used': result['days_used'],
+        'days_remaining': result['quota'] - result['days_used'],
+        'days_pending': result['days_pending'],
+        'pending_requests': result['pending_requests'],
+    }
+
+
+def refresh_quota(balances, quota):
+    """
+    Applique un nouveau quota aux soldes sélectionnés (queryset de LeaveBalance), pour
+    l'année en cours et les suivantes : les soldes des années passées sont conservés.
+    """
+    return balances.filter(year__gte=timezone.localdate().year).exclude(quota=quota).update(quota=quota)
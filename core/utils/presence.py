@@ -0,0 +1,155 @@
+# Fichier : presence.py
+#
+# Description : Gestion de l'état de présence matérialisé (modèle PresenceState).
+#               L'état courant d'un employé (OUT / IN / ON_BREAK) est lu par clé
+#               primaire au lieu de rechercher le dernier pointage dans l'historique.
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+
+from ..models import AttendanceRecord, PresenceState
+
+# Correspondance entre le type du dernier pointage et l'état de présence
+STATE_BY_RECORD_TYPE = {
+    'IN': 'IN',
+    'OUT': 'OUT',
+    'BREAK_START': 'ON_BREAK',
+    'BREAK_END': 'IN',
+}
+
+# Actions de pointage disponibles pour chaque état de présence
+AVAILABLE_ACTIONS = {
+    # Absent (aucun pointage ou dernier = sortie) : seule l'entrée est possible
+    'OUT': [
+        {
+            'value': 'IN',
+            'label': 'Entrée (Clock In)',
+            'description': 'Enregistrer votre arrivée'
+        }
+    ],
+    # Présent (dernier = entrée ou fin de pause) : on peut sortir ou prendre une pause
+    'IN': [
+        {
+            'value': 'OUT',
+            'label': 'Sortie (Clock Out)',
+            'description': 'Enregistrer votre départ'
+        },
+        {
+            'value': 'BREAK_START',
+            'label': 'Début de Pause',
+            'description': 'Commencer une pause'
+        }
+    ],
+    # En pause (dernier = début de pause) : seule la fin de pause est possible
+    'ON_BREAK': [
+        {
+            'value': 'BREAK_END',
+            'label': 'Fin de Pause',
+            'description': 'Terminer votre pause'
+        }
+    ],
+}
+
+
+def get_actions_for_state(state):
+    """Retourne les actions de pointage disponibles pour un état de présence."""
+    return [dict(action) for action in AVAILABLE_ACTIONS[state]]
+
+
+def is_valid_transition(state, record_type):
+    """Indique si un pointage de type record_type est autorisé depuis l'état donné."""
+    return any(action['value'] == record_type for action in AVAILABLE_ACTIONS[state])
+
+
+def _employee_pk(employee):
+    """Accepte une instance Employee ou directement sa clé primaire."""
+    return getattr(employee, 'pk', employee)
+
+
+def _compute_presence_fields(employee_pk):
+    """Déduit les champs de PresenceState du dernier pointage de l'employé."""
+    last_record = AttendanceRecord.objects.filter(
+        employee_id=employee_pk
+    ).order_by('-timestamp', '-id').only('id', 'timestamp', 'record_type').first()
+
+    return {
+        'state': STATE_BY_RECORD_TYPE[last_record.record_type] if last_record else 'OUT',
+        'last_record': last_record,
+        'last_timestamp': last_record.timestamp if last_record else None,
+    }
+
+
+def rebuild_presence_state(employee):
+    """
+    Recalcule l'état de présence d'un employé à partir de son dernier pointage
+    et enregistre le résultat (création de la ligne si nécessaire).
+    Retourne l'objet PresenceState.
+    """
+    employee_pk = _employee_pk(employee)
+    presence, _ = PresenceState.objects.update_or_create(
+        employee_id=employee_pk,
+        defaults=_compute_presence_fields(employee_pk)
+    )
+    return presence
+
+
+def refresh_presence_state(employee):
+    """
+    Recalcule l'état de présence d'un employé sans jamais créer de ligne.
+    Utilisé après la modification ou la suppression d'un pointage : si la ligne
+    n'existe pas encore, elle sera construite à la prochaine lecture.
+    """
+    employee_pk = _employee_pk(employee)
+    PresenceState.objects.filter(employee_id=employee_pk).update(
+        **_compute_presence_fields(employee_pk)
+    )
+
+
+def get_presence_state(employee, for_update=False):
+    """
+    Retourne l'objet PresenceState d'un employé (lecture par clé primaire).
+    Si l'état n'a pas encore été calculé pour cet employé, il est reconstruit
+    à partir de l'historique puis conservé.
+    Avec for_update=True, la ligne est verrouillée jusqu'à la fin de la transaction
+    (doit être appelé dans un bloc transaction.atomic()).
+    """
+    employee_pk = _employee_pk(employee)
+    queryset = PresenceState.objects.all()
+    if for_update:
+        queryset = queryset.select_for_update()
+    try:
+        return queryset.get(employee_id=employee_pk)
+    except PresenceState.DoesNotExist:
+        rebuild_presence_state(employee_pk)
+        return queryset.get(employee_id=employee_pk)
+
+
+async def aget_presence_state(employee):
+    """
+    Version asynchrone de get_presence_state (lecture par clé primaire, sans verrou).
+    La reconstruction éventuelle de l'état est déléguée à un thread.
+    """
+    employee_pk = _employee_pk(employee)
+    try:
+        return await PresenceState.objects.aget(employee_id=employee_pk)
+    except PresenceState.DoesNotExist:
+        return await sync_to_async(rebuild_presence_state)(employee_pk)
+
+
+def apply_record(record, presence=None):
+    """
+    Met à jour l'état de présence après l'insertion d'un pointage.
+    Un pointage antérieur au dernier pointage connu ne modifie pas l'état.
+    S'exécute dans la transaction de l'insertion si elle existe.
+    """
+    with transaction.atomic():
+        if presence is None:
+            presence = get_presence_state(record.employee_id, for_update=True)
+        if presence.last_timestamp is not None and record.timestamp < presence.last_timestamp:
+            return presence
+
+        presence.state = STATE_BY_RECORD_TYPE[record.record_type]
+        presence.last_record = record
+        presence.last_timestamp = record.timestamp
+        presence.save(update_fields=['state', 'last_record', 'last_timestamp'])
+    return presence
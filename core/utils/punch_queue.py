@@ -0,0 +1,295 @@
+# Fichier : punch_queue.py
+#
+# Description : File d'attente locale des pointages pour le mode "write-behind"
+#               (PUNCH_WRITE_BEHIND=True).
+#
+#               Un pointage validé est ajouté à un fichier SQLite local (journal WAL,
+#               synchronous=FULL : l'ajout est durable dès qu'il est confirmé) et le
+#               kiosque reçoit immédiatement sa confirmation. Le processus
+#               flush_punch_queue insère ensuite les pointages en attente dans la base
+#               principale par lots, avec des reprises en cas d'erreur.
+#
+#               Tant qu'un pointage n'a pas été transféré, l'état de présence de la base
+#               principale est en retard : pending_state() donne l'état qui résulte des
+#               pointages encore en attente, utilisé pour valider les pointages suivants.
+#               La file est propre à la machine : tous les processus web d'un même
+#               serveur partagent le même fichier (PUNCH_QUEUE_PATH).
+
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from ..models import AttendanceRecord, Employee
+from . import presence as presence_utils
+from . import scan_ingestion
+
+# Délai d'attente maximal du verrou d'écriture de la file, en secondes
+LOCK_TIMEOUT = 30
+# Durée de conservation des pointages transférés (pour les métriques), en secondes
+DEFAULT_RETENTION = 24 * 3600
+# Fenêtre sur laquelle le délai de transfert est mesuré, en secondes
+METRICS_WINDOW = 300
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS punch_queue (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    idempotency_key TEXT NOT NULL UNIQUE,
+    employee_id INTEGER NOT NULL,
+    record_type TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    location TEXT,
+    note TEXT,
+    kiosk_id TEXT,
+    enqueued_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    flushed_at REAL
+);
+CREATE INDEX IF NOT EXISTS punch_queue_pending_idx ON punch_queue (flushed_at, id);
+CREATE INDEX IF NOT EXISTS punch_queue_employee_idx ON punch_queue (employee_id, flushed_at, id);
+CREATE TABLE IF NOT EXISTS punch_queue_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+_local = threading.local()
+
+
+def is_enabled():
+    return getattr(settings, 'PUNCH_WRITE_BEHIND', False)
+
+
+def get_queue_path():
+    return str(getattr(settings, 'PUNCH_QUEUE_PATH', settings.BASE_DIR / 'punch_queue.sqlite3'))
+
+
+def _connection():
+    """Connexion SQLite propre au thread (les connexions sqlite3 ne se partagent pas entre threads)."""
+    path = get_queue_path()
+    connections = getattr(_local, 'connections', None)
+    if connections is None:
+        connections = _local.connections = {}
+    conn = connections.get(path)
+    if conn is None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # isolation_level=None : les transactions sont ouvertes explicitement (BEGIN IMMEDIATE)
+        conn = sqlite3.connect(path, timeout=LOCK_TIMEOUT, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=FULL')
+        conn.executescript(SCHEMA)
+        connections[path] = conn
+    return conn
+
+
+class _WriteLock:
+    """Transaction SQLite avec verrou d'écriture pris dès le début (BEGIN IMMEDIATE)."""
+
+    def __enter__(self):
+        self.conn = _connection()
+        self.conn.execute('BEGIN IMMEDIATE')
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute('ROLLBACK' if exc_type else 'COMMIT')
+        return False
+
+
+def _pending_state(conn, employee_pk):
+    row = conn.execute(
+        "SELECT record_type FROM punch_queue WHERE employee_id = ? AND flushed_at IS NULL "
+        "ORDER BY id DESC LIMIT 1",
+        (employee_pk,)
+    ).fetchone()
+    return presence_utils.STATE_BY_RECORD_TYPE[row['record_type']] if row else None
+
+
+def pending_state(employee):
+    """
+    État de présence résultant du dernier pointage encore en attente pour cet employé,
+    ou None si aucun pointage n'est en attente.
+    """
+    return _pending_state(_connection(), presence_utils._employee_pk(employee))
+
+
+def _queued_state(conn, employee_pk, since):
+    """
+    État résultant du dernier pointage de la file pour cet employé qui peut manquer
+    à une lecture de la base principale commencée à `since` (pointage en attente, ou
+    transféré depuis), ou None.
+    """
+    row = conn.execute(
+        "SELECT record_type FROM punch_queue WHERE employee_id = ? "
+        "AND (flushed_at IS NULL OR flushed_at >= ?) ORDER BY id DESC LIMIT 1",
+        (employee_pk, since)
+    ).fetchone()
+    return presence_utils.STATE_BY_RECORD_TYPE[row['record_type']] if row else None
+
+
+def enqueue_punch(employee, record_type, location=None, note=None, kiosk_id=None):
+    """
+    Valide le pointage contre l'état de présence (base principale + pointages en attente)
+    et l'ajoute à la file. Retourne le pointage (non enregistré en base, pk=None),
+    ou None si le type est incohérent avec l'état actuel.
+    Le verrou d'écriture de la file sérialise les pointages des différents processus.
+    L'état de la base principale est lu avant de prendre le verrou : seuls la lecture
+    de la file et l'ajout sont faits sous verrou. Un pointage transféré pendant cette
+    lecture est encore visible dans la file (flushed_at postérieur au début de la lecture).
+    """
+    employee_pk = presence_utils._employee_pk(employee)
+    read_started = time.time()
+    database_state = presence_utils.get_presence_state(employee_pk).state
+
+    with _WriteLock() as conn:
+        state = _queued_state(conn, employee_pk, read_started) or database_state
+        if not presence_utils.is_valid_transition(state, record_type):
+            return None
+
+        record = AttendanceRecord(
+            employee_id=employee_pk,
+            record_type=record_type,
+            timestamp=timezone.now(),
+            location=location,
+            note=note,
+            kiosk_id=kiosk_id,
+            idempotency_key=uuid.uuid4().hex,
+        )
+        conn.execute(
+            "INSERT INTO punch_queue (idempotency_key, employee_id, record_type, timestamp, "
+            "location, note, kiosk_id, enqueued_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (record.idempotency_key, employee_pk, record_type, record.timestamp.isoformat(),
+             location, note, kiosk_id, time.time())
+        )
+    return record
+
+
+def flush_pending(batch_size=500):
+    """
+    Transfère un lot de pointages en attente vers la base principale.
+    Les pointages déjà présents (même clé d'idempotence) ne sont pas réinsérés, ce qui
+    rend le transfert rejouable après une erreur. En cas d'erreur, le lot reste en
+    attente (tentatives et dernière erreur enregistrées) et l'exception est propagée.
+    Retourne le nombre de pointages transférés.
+    """
+    conn = _connection()
+    rows = conn.execute(
+        "SELECT * FROM punch_queue WHERE flushed_at IS NULL ORDER BY id LIMIT ?",
+        (batch_size,)
+    ).fetchall()
+    if not rows:
+        return 0
+    row_ids = [row['id'] for row in rows]
+
+    try:
+        keys = [row['idempotency_key'] for row in rows]
+        existing_employees = set(Employee.objects.filter(
+            pk__in={row['employee_id'] for row in rows}
+        ).values_list('pk', flat=True))
+        with transaction.atomic():
+            already_flushed = set(AttendanceRecord.objects.filter(
+                idempotency_key__in=keys
+            ).values_list('idempotency_key', flat=True))
+            records = [
+                AttendanceRecord(
+                    employee_id=row['employee_id'],
+                    record_type=row['record_type'],
+                    timestamp=parse_datetime(row['timestamp']),
+                    location=row['location'],
+                    note=row['note'],
+                    kiosk_id=row['kiosk_id'],
+                    idempotency_key=row['idempotency_key'],
+                )
+                for row in rows
+                # Un employé supprimé entre-temps ne peut plus recevoir de pointage
+                if row['idempotency_key'] not in already_flushed and row['employee_id'] in existing_employees
+            ]
+            scan_ingestion.bulk_insert_records(records)
+    except Exception as e:
+        with _WriteLock() as conn:
+            conn.executemany(
+                "UPDATE punch_queue SET attempts = attempts + 1, last_error = ? WHERE id = ?",
+                [(str(e), row_id) for row_id in row_ids]
+            )
+        raise
+
+    now = time.time()
+    with _WriteLock() as conn:
+        conn.executemany(
+            "UPDATE punch_queue SET flushed_at = ?, last_error = ? WHERE id = ?",
+            [
+                (now, None if row['employee_id'] in existing_employees else "Employé supprimé, pointage ignoré", row['id'])
+                for row in rows
+            ]
+        )
+        conn.execute(
+            "INSERT OR REPLACE INTO punch_queue_meta (key, value) VALUES ('last_flush_at', ?)",
+            (str(now),)
+        )
+    return len(rows)
+
+
+def purge_flushed(retention=DEFAULT_RETENTION):
+    """Supprime les pointages transférés depuis plus de `retention` secondes."""
+    with _WriteLock() as conn:
+        return conn.execute(
+            "DELETE FROM punch_queue WHERE flushed_at IS NOT NULL AND flushed_at < ?",
+            (time.time() - retention,)
+        ).rowcount
+
+
+def get_metrics():
+    """
+    Métriques de la file :
+    - depth : nombre de pointages en attente ;
+    - oldest_pending_age_s : âge du plus ancien pointage en attente (retard du transfert) ;
+    - failing : pointages en attente dont au moins un transfert a échoué, et dernière erreur ;
+    - flush_lag_s : délai entre l'ajout et le transfert sur les METRICS_WINDOW dernières secondes ;
+    - last_flush_at : date du dernier transfert réussi.
+    """
+    conn = _connection()
+    now = time.time()
+    pending = conn.execute(
+        "SELECT COUNT(*) AS depth, MIN(enqueued_at) AS oldest, "
+        "SUM(CASE WHEN attempts > 0 THEN 1 ELSE 0 END) AS failing "
+        "FROM punch_queue WHERE flushed_at IS NULL"
+    ).fetchone()
+    last_error = conn.execute(
+        "SELECT last_error FROM punch_queue WHERE flushed_at IS NULL AND last_error IS NOT NULL "
+        "ORDER BY id DESC LIMIT 1"
+    ).fetchone()
+    lags = sorted(
+        row[0] for row in conn.execute(
+            "SELECT flushed_at - enqueued_at FROM punch_queue WHERE flushed_at >= ?",
+            (now - METRICS_WINDOW,)
+        )
+    )
+    last_flush = conn.execute(
+        "SELECT value FROM punch_queue_meta WHERE key = 'last_flush_at'"
+    ).fetchone()
+
+    return {
+        'enabled': is_enabled(),
+        'depth': pending['depth'],
+        'oldest_pending_age_s': round(now - pending['oldest'], 3) if pending['oldest'] else 0.0,
+        'failing': pending['failing'] or 0,
+        'last_error': last_error['last_error'] if last_error else None,
+        'flush_lag_s': {
+            'count': len(lags),
+            'p50': round(lags[len(lags) // 2], 3) if lags else None,
+            'max': round(lags[-1], 3) if lags else None,
+        },
+        'last_flush_at': datetime.fromtimestamp(
+            float(last_flush['value']), tz=timezone.get_current_timezone()
+        ).isoformat() if last_flush else None,
+    }
@@ -0,0 +1,124 @@
+# Fichier : qr_badge.py
+#
+# Description : Images pré-rendues des QR codes des badges employés (Employee.qr_code_badge).
+#
+#               L'image PNG est rendue une seule fois, quand le QR code est attribué
+#               (EmployeeAdmin.save_model) ou renouvelé (rotate), et enregistrée dans le
+#               stockage par défaut (FileSystemStorage en développement, MediaStorage / B2
+#               en production), avec un en-tête Cache-Control longue durée. Les API de
+#               profil renvoient l'URL de ce fichier au lieu d'une image en base64 dans
+#               le JSON. Elles ne rendent jamais l'image elles-mêmes (pas d'écriture dans
+#               le stockage pendant un GET) : tant que l'image manque ou est périmée, le
+#               profil renvoie l'image en base64, et la commande render_qr_badges la rend.
+#
+#               Le nom du fichier est dérivé du contenu du QR code (empreinte SHA-256) :
+#               une URL ne désigne jamais qu'une seule image, elle peut être mise en cache
+#               sans limite par les navigateurs et l'application mobile. Un nouveau QR code
+#               donne un nouveau fichier ; l'ancien est supprimé après la validation de
+#               la transaction qui enregistre le nouveau.
+
+import hashlib
+import uuid
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from ..models import Employee
+from . import generate_qr_code
+
+# Dossier des images de badge dans le stockage
+BADGE_DIRECTORY = 'badges/qr'
+
+# En-tête Cache-Control des images : une URL ne change jamais de contenu
+BADGE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+def badge_name(qr_code):
+    """Nom du fichier de l'image d'un QR code dans le stockage."""
+    digest = hashlib.sha256(qr_code.encode()).hexdigest()[:32]
+    return f'{BADGE_DIRECTORY}/{digest}.png'
+
+
+def new_qr_code(employee):
+    """Nouveau contenu de QR code pour un employé."""
+    return f"EMP-{employee.employee_id}-{uuid.uuid4().hex[:8].upper()}"
+
+
+def is_current(employee):
+    """Indique si l'image enregistrée correspond au QR code actuel de l'employé."""
+    if not employee.qr_code:
+        return not employee.qr_code_badge
+    return employee.qr_code_badge.name == badge_name(employee.qr_code)
+
+
+def render_badge(employee):
+    """
+    Rend l'image du QR code actuel de l'employé dans le stockage et l'associe à
+    employee.qr_code_badge, sans sauvegarder l'employé. L'image précédente est supprimée
+    après la validation de la transaction en cours : si la sauvegarde de l'employé
+    échoue, sa ligne ne désigne pas un fichier supprimé.
+    Retourne True si le champ a changé.
+    """
+    if is_current(employee):
+        return False
+
+    previous = employee.qr_code_badge.name if employee.qr_code_badge else None
+    if employee.qr_code:
+        name = badge_name(employee.qr_code)
+        if not default_storage.exists(name):
+            content = ContentFile(generate_qr_code.render(employee.qr_code))
+            # Lu par MediaStorage (en-tête Cache-Control du fichier sur B2)
+            content.cache_control = BADGE_CACHE_CONTROL
+            name = default_storage.save(name, content)
+        employee.qr_code_badge.name = name
+    else:
+        employee.qr_code_badge.name = ''
+
+    if previous and previous != employee.qr_code_badge.name:
+        transaction.on_commit(lambda: default_storage.delete(previous))
+    return True
+
+
+def refresh_badge(employee):
+    """Rend l'image si elle manque ou est périmée, et l'enregistre sans déclencher les signaux."""
+    if render_badge(employee):
+        Employee.objects.filter(pk=employee.pk).update(qr_code_badge=employee.qr_code_badge.name)
+        return True
+    return False
+
+
+def rotate(employee):
+    """Attribue un nouveau QR code à l'employé, rend son image et sauvegarde l'employé."""
+    employee.qr_code = new_qr_code(employee)
+    render_badge(employee)
+    employee.save(update_fields=['qr_code', 'qr_code_badge'])
+
+
+def badge_url(employee):
+    """
+    URL de l'image pré-rendue du QR code de l'employé, ou None s'il n'en a pas ou si
+    l'image manque ou est périmée. Ne rend rien : utilisé par les vues en lecture.
+    """
+    if not employee.qr_code or not employee.qr_code_badge or not is_current(employee):
+        return None
+    return employee.qr_code_badge.url
+
+
+def profile_qr_fields(employee, fmt=generate_qr_code.PNG):
+    """
+    Champs du QR code d'une réponse de profil, selon le format demandé :
+    - PNG : qr_code_image, URL de l'image pré-rendue (image en base64 si elle
+      n'est pas encore rendue) ;
+    - SVG : qr_code_svg, document SVG (qr_code_image vide) ;
+    - MATRIX : qr_code_matrix, matrice de modules (qr_code_image vide).
+    Les formats SVG et MATRIX ne rastérisent pas l'image.
+    """
+    fields = {'qr_code_format': fmt.lower(), 'qr_code_image': None}
+    if fmt == generate_qr_code.SVG:
+        fields['qr_code_svg'] = generate_qr_code.qr_svg(employee.qr_code)
+    elif fmt == generate_qr_code.MATRIX:
+        fields['qr_code_matrix'] = generate_qr_code.qr_matrix(employee.qr_code)
+    else:
+        fields['qr_code_image'] = badge_url(employee) or generate_qr_code.qr_data_url(employee.qr_code)
+    return fields
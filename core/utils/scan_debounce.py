@@ -0,0 +1,133 @@
+# Fichier : scan_debounce.py
+#
+# Description : Anti-rebond côté serveur pour les scans du kiosque.
+#               Un badge maintenu sur le lecteur NFC ou un QR code resté devant la
+#               caméra déclenche des appels répétés à authenticate_card. La réponse
+#               d'un scan est conservée dans le cache Django pendant une courte fenêtre
+#               (KIOSK_SCAN_DEBOUNCE_WINDOW, en secondes), pour le couple identifiant
+#               de badge + kiosque : les scans répétés dans la fenêtre reçoivent la
+#               réponse précédente sans aucune requête en base.
+#               Un scan combiné (record_type, auto_record) a sa propre clé, et la réponse
+#               mise en cache est oubliée dès qu'un pointage de l'employé est enregistré
+#               sur ce kiosque (forget, appelé par record_punch) : un nouveau scan
+#               reçoit alors les actions à jour.
+#
+#               Le cache par défaut (LocMemCache) est propre à chaque processus : avec
+#               plusieurs workers, configurer un cache partagé (CACHES) pour que
+#               l'anti-rebond s'applique quel que soit le worker qui reçoit le scan.
+
+import hashlib
+import json
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+# Durée par défaut de la fenêtre anti-rebond, en secondes (0 la désactive)
+DEFAULT_WINDOW = 3
+
+# Seules ces réponses sont rejouées : scan accepté, ou badge inconnu
+DEBOUNCED_STATUSES = (200, 404)
+
+
+def get_window():
+    return getattr(settings, 'KIOSK_SCAN_DEBOUNCE_WINDOW', DEFAULT_WINDOW)
+
+
+def get_cache_key(request):
+    """
+    Clé de cache du scan (identifiant de badge + kiosque), ou None si la requête
+    ne contient pas d'identifiant exploitable.
+    """
+    try:
+        data = json.loads(request.body)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return None
+    if not isinstance(data, dict):
+        return None
+
+    nfc_id = data.get('nfc_id')
+    qr_code = data.get('qr_code')
+    if not nfc_id and not qr_code:
+        return None
+
+    raw = json.dumps([nfc_id, qr_code, data.get('kiosk_id'), data.get('record_type'), bool(data.get('auto_record'))])
+    return 'kiosk_scan:' + hashlib.sha256(raw.encode()).hexdigest()
+
+
+def get_employee_key(user_id, kiosk_id):
+    """Clé de cache mémorisant la dernière clé de scan de l'employé sur le kiosque."""
+    return f'kiosk_scan:employee:{user_id}:{kiosk_id}'
+
+
+def _entries(request, key, response):
+    """Entrées de cache d'une réponse de scan : la réponse, et sa clé pour l'employé scanné."""
+    entries = {key: (response.status_code, response.content)}
+    if response.status_code == 200:
+        user_id = json.loads(response.content).get('user_id')
+        if user_id is not None:
+            kiosk_id = json.loads(request.body).get('kiosk_id')
+            entries[get_employee_key(user_id, kiosk_id)] = key
+    return entries
+
+
+def forget(user_id, kiosk_id):
+    """
+    Oublie la réponse de scan en cache de l'employé sur le kiosque, après
+    l'enregistrement d'un pointage : ses actions disponibles ont changé.
+    """
+    employee_key = get_employee_key(user_id, kiosk_id)
+    key = cache.get(employee_key)
+    if key is not None:
+        cache.delete_many([key, employee_key])
+
+
+def _replay(cached):
+    status, content = cached
+    response = HttpResponse(content, status=status, content_type='application/json')
+    response['X-Scan-Debounced'] = '1'
+    return response
+
+
+def debounce_scan(view_func):
+    """
+    Décorateur des vues de scan du kiosque (synchrones ou asynchrones) :
+    rejoue la réponse mise en cache si le même badge a été scanné sur le même
+    kiosque depuis moins de KIOSK_SCAN_DEBOUNCE_WINDOW secondes.
+    """
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def _wrapped_view(request, *args, **kwargs):
+            window = get_window()
+            key = get_cache_key(request) if window > 0 else None
+            if key is None:
+                return await view_func(request, *args, **kwargs)
+
+            cached = await cache.aget(key)
+            if cached is not None:
+                return _replay(cached)
+
+            response = await view_func(request, *args, **kwargs)
+            if response.status_code in DEBOUNCED_STATUSES:
+                await cache.aset_many(_entries(request, key, response), window)
+            return response
+    else:
+        @wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            window = get_window()
+            key = get_cache_key(request) if window > 0 else None
+            if key is None:
+                return view_func(request, *args, **kwargs)
+
+            cached = cache.get(key)
+            if cached is not None:
+                return _replay(cached)
+
+            response = view_func(request, *args, **kwargs)
+            if response.status_code in DEBOUNCED_STATUSES:
+                cache.set_many(_entries(request, key, response), window)
+            return response
+
+    return _wrapped_view
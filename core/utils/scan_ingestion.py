@@ -0,0 +1,299 @@
+# Fichier : scan_ingestion.py
+#
+# Description : Ingestion en lot des scans envoyés par les kiosques.
+#               Un kiosque qui perd la connexion conserve ses scans localement puis
+#               les envoie en un seul appel. Chaque scan porte son identifiant de
+#               badge, son type de pointage, l'horodatage du kiosque, l'identifiant
+#               du kiosque et une clé d'idempotence.
+#
+#               Les scans sont validés contre la machine à états de présence dans
+#               l'ordre chronologique, puis insérés avec un seul bulk_create.
+#               Le résultat est rendu scan par scan.
+#
+#               Le lot est authentifié par la clé du kiosque (voir kiosk_token.check_kiosk_key) :
+#               tous ses scans appartiennent à ce kiosque. Un horodatage plus ancien que
+#               KIOSK_MAX_BACKDATE est refusé, pour qu'un lot ne puisse pas réécrire
+#               l'historique des pointages.
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from ..models import AttendanceRecord, PresenceState
+from . import credential_index
+from . import data_version
+from . import day_summary
+from . import presence as presence_utils
+from . import stats_cache
+
+# Nombre maximal de scans acceptés dans un lot
+DEFAULT_MAX_SCANS = 500
+# Avance maximale tolérée de l'horloge d'un kiosque, en secondes
+DEFAULT_MAX_CLOCK_SKEW = 300
+# Ancienneté maximale d'un scan envoyé en différé, en secondes (durée d'une coupure)
+DEFAULT_MAX_BACKDATE = 24 * 3600
+
+RECORD_TYPES = dict(AttendanceRecord.RECORD_TYPES)
+IDEMPOTENCY_KEY_MAX_LENGTH = AttendanceRecord._meta.get_field('idempotency_key').max_length
+KIOSK_ID_MAX_LENGTH = AttendanceRecord._meta.get_field('kiosk_id').max_length
+
+
+def get_max_scans():
+    return getattr(settings, 'KIOSK_BATCH_MAX_SCANS', DEFAULT_MAX_SCANS)
+
+
+def get_max_backdate():
+    return getattr(settings, 'KIOSK_MAX_BACKDATE', DEFAULT_MAX_BACKDATE)
+
+
+def _result(index, scan, status, **extra):
+    """Construit le résultat d'un scan du lot."""
+    result = {
+        'index': index,
+        'idempotency_key': scan.get('idempotency_key') if isinstance(scan, dict) else None,
+        'status': status,  # 'created', 'duplicate' ou 'rejected'
+    }
+    result.update(extra)
+    return result
+
+
+def parse_scan(scan, kiosk_id=None):
+    """
+    Valide et normalise un scan reçu du kiosque authentifié `kiosk_id`.
+    Retourne un tuple (scan normalisé, None) ou (None, message d'erreur).
+    """
+    if not isinstance(scan, dict):
+        return None, "Format de scan invalide"
+
+    nfc_id = scan.get('nfc_id')
+    qr_code = scan.get('qr_code')
+    if not nfc_id and not qr_code:
+        return None, "Aucun identifiant NFC ou QR code fourni"
+
+    record_type = scan.get('record_type')
+    if record_type not in RECORD_TYPES:
+        return None, "Type de pointage invalide"
+
+    idempotency_key = scan.get('idempotency_key')
+    if not isinstance(idempotency_key, str) or not idempotency_key or len(idempotency_key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+        return None, "Clé d'idempotence manquante ou invalide"
+
+    raw_timestamp = scan.get('timestamp')
+    try:
+        timestamp = parse_datetime(raw_timestamp) if isinstance(raw_timestamp, str) else None
+    except ValueError:
+        timestamp = None
+    if timestamp is None:
+        return None, "Horodatage invalide (format ISO 8601 attendu)"
+    if timezone.is_naive(timestamp):
+        # Un horodatage sans fuseau est interprété dans le fuseau du site
+        timestamp = timezone.make_aware(timestamp)
+    max_skew = getattr(settings, 'KIOSK_MAX_CLOCK_SKEW', DEFAULT_MAX_CLOCK_SKEW)
+    age = (timezone.now() - timestamp).total_seconds()
+    if -age > max_skew:
+        return None, "Horodatage dans le futur"
+    if age > get_max_backdate():
+        return None, "Horodatage trop ancien"
+
+    if scan.get('kiosk_id') not in (None, '', kiosk_id):
+        return None, "Scan émis par un autre kiosque"
+    if kiosk_id is not None and (not isinstance(kiosk_id, str) or len(kiosk_id) > KIOSK_ID_MAX_LENGTH):
+        return None, "Identifiant de kiosque invalide"
+
+    return {
+        'nfc_id': nfc_id,
+        'qr_code': qr_code,
+        'record_type': record_type,
+        'timestamp': timestamp,
+        'kiosk_id': kiosk_id,
+        'idempotency_key': idempotency_key,
+        'location': scan.get('location'),
+        'note': scan.get('note'),
+    }, None
+
+
+def lock_presence_states(employee_pks):
+    """
+    Verrouille (select_for_update) les états de présence des employés donnés,
+    dans un ordre fixe pour éviter les interblocages, en créant les lignes manquantes.
+    Doit être appelé dans un bloc transaction.atomic().
+    Retourne un dict {clé primaire de l'employé: PresenceState}.
+    """
+    employee_pks = sorted(set(employee_pks))
+    existing = set(PresenceState.objects.filter(
+        employee_id__in=employee_pks
+    ).values_list('employee_id', flat=True))
+    for employee_pk in employee_pks:
+        if employee_pk not in existing:
+            presence_utils.rebuild_presence_state(employee_pk)
+    return {
+        presence.employee_id: presence
+        for presence in PresenceState.objects.select_for_update().filter(
+            employee_id__in=employee_pks
+        ).order_by('employee_id')
+    }
+
+
+def bulk_insert_records(records, presences=None):
+    """
+    Insère des pointages (portant chacun une clé d'idempotence) en une seule requête,
+    puis met à jour l'état de présence de chaque employé avec son dernier pointage.
+    bulk_create n'émet pas de signaux : les traitements des signaux post_save des
+    pointages doivent être reproduits ici.
+    Doit être appelé dans un bloc transaction.atomic().
+    """
+    if not records:
+        return records
+    if presences is None:
+        presences = lock_presence_states(record.employee_id for record in records)
+
+    AttendanceRecord.objects.bulk_create(records)
+    if any(record.pk is None for record in records):
+        # MySQL ne renvoie pas les clés primaires générées par une insertion groupée
+        # (clé d'idempotence unique par kiosque)
+        created_ids = {
+            (kiosk_id, key): pk
+            for kiosk_id, key, pk in AttendanceRecord.objects.filter(
+                idempotency_key__in=[record.idempotency_key for record in records]
+            ).values_list('kiosk_id', 'idempotency_key', 'id')
+        }
+        for record in records:
+            record.pk = created_ids[(record.kiosk_id, record.idempotency_key)]
+
+    last_records = {}
+    for record in sorted(records, key=lambda record: record.timestamp):
+        last_records[record.employee_id] = record
+    for employee_pk, record in last_records.items():
+        presence_utils.apply_record(record, presences[employee_pk])
+    day_summary.refresh_for_records(records)
+    employee_pks = {record.employee_id for record in records}
+    data_version.bump(employee_pks)
+    stats_cache.invalidate(employee_pks)
+    return records
+
+
+def stored_record_ids(kiosk_id, keys):
+    """
+    Pointages du kiosque déjà enregistrés pour ces clés d'idempotence : {clé: id du pointage}.
+    Les clés sont propres à chaque kiosque : celles d'un autre kiosque sont ignorées.
+    """
+    return dict(AttendanceRecord.objects.filter(
+        kiosk_id=kiosk_id,
+        idempotency_key__in=list(keys)
+    ).values_list('idempotency_key', 'id'))
+
+
+def _insert_pending(pending, results, scans, kiosk_id):
+    """
+    Rejoue la machine à états pour les scans valides et insère les nouveaux pointages,
+    dans une transaction. Renseigne `results` et retourne {clé d'idempotence: id du pointage}.
+    Lève IntegrityError si un lot concurrent a enregistré une des clés entre-temps.
+    """
+    with transaction.atomic():
+        employee_pks = sorted({scan['employee_pk'] for _, scan in pending})
+
+        # 2. Verrouillage des états de présence concernés
+        presences = lock_presence_states(employee_pks)
+
+        # 3. Scans déjà enregistrés lors d'un envoi précédent
+        record_ids = stored_record_ids(kiosk_id, (scan['idempotency_key'] for _, scan in pending))
+
+        # 4. Rejeu de la machine à états dans l'ordre chronologique
+        states = {
+            employee_pk: (presence.state, presence.last_timestamp)
+            for employee_pk, presence in presences.items()
+        }
+        to_create = []
+        for index, scan in sorted(pending, key=lambda item: (item[1]['timestamp'], item[0])):
+            key = scan['idempotency_key']
+            if key in record_ids:
+                results[index] = _result(index, scan, 'duplicate', record_id=record_ids[key])
+                continue
+
+            employee_pk = scan['employee_pk']
+            state, last_timestamp = states[employee_pk]
+            if last_timestamp is not None and scan['timestamp'] < last_timestamp:
+                results[index] = _result(index, scan, 'rejected', error="Horodatage antérieur au dernier pointage enregistré")
+                continue
+            if not presence_utils.is_valid_transition(state, scan['record_type']):
+                results[index] = _result(
+                    index, scan, 'rejected',
+                    error=f"Type de pointage '{scan['record_type']}' incohérent avec l'état actuel"
+                )
+                continue
+
+            record = AttendanceRecord(
+                employee_id=employee_pk,
+                record_type=scan['record_type'],
+                timestamp=scan['timestamp'],
+                location=scan['location'],
+                note=scan['note'],
+                kiosk_id=scan['kiosk_id'],
+                idempotency_key=key,
+            )
+            to_create.append((index, record))
+            states[employee_pk] = (presence_utils.STATE_BY_RECORD_TYPE[scan['record_type']], scan['timestamp'])
+
+        # 5. Insertion en une seule requête et mise à jour de l'état de présence
+        bulk_insert_records([record for _, record in to_create], presences)
+
+    for index, record in to_create:
+        record_ids[record.idempotency_key] = record.pk
+        results[index] = _result(
+            index, scans[index], 'created',
+            record_id=record.pk,
+            record_type=record.record_type,
+            timestamp=timezone.localtime(record.timestamp).isoformat(),
+        )
+    return record_ids
+
+
+def ingest_scans(scans, kiosk_id=None):
+    """
+    Valide et enregistre un lot de scans du kiosque `kiosk_id`.
+    Retourne une liste de résultats dans l'ordre des scans reçus :
+    - 'created' : pointage enregistré (record_id, timestamp) ;
+    - 'duplicate' : clé d'idempotence déjà enregistrée par ce kiosque (record_id du pointage existant) ;
+    - 'rejected' : scan refusé (error).
+    """
+    results = [None] * len(scans)
+    pending = []  # [(index, scan normalisé)]
+    batch_duplicates = []  # [(index, clé)] : clé déjà présente plus tôt dans le lot
+    seen_keys = {}  # clé d'idempotence -> index de sa première occurrence
+
+    # 1. Validation et résolution des badges (index en mémoire, sans requête en base)
+    for index, scan in enumerate(scans):
+        parsed, error = parse_scan(scan, kiosk_id)
+        if error:
+            results[index] = _result(index, scan, 'rejected', error=error)
+            continue
+        if parsed['idempotency_key'] in seen_keys:
+            batch_duplicates.append((index, parsed['idempotency_key']))
+            continue
+        seen_keys[parsed['idempotency_key']] = index
+
+        badge = credential_index.get_badge_record(nfc_id=parsed['nfc_id'], qr_code=parsed['qr_code'])
+        if badge is None:
+            results[index] = _result(index, scan, 'rejected', error="Aucun employé trouvé avec cet identifiant")
+            continue
+        parsed['employee_pk'] = badge['user_id']
+        pending.append((index, parsed))
+
+    if pending:
+        try:
+            _insert_pending(pending, results, scans, kiosk_id)
+        except IntegrityError:
+            # Lot concurrent portant les mêmes clés, enregistré après la vérification de
+            # l'étape 3 : la transaction a été annulée, le lot est rejoué une fois et ces
+            # scans sont alors rendus comme doublons des pointages déjà enregistrés
+            _insert_pending(pending, results, scans, kiosk_id)
+
+    for index, key in batch_duplicates:
+        first = results[seen_keys[key]]
+        if first['status'] == 'rejected':
+            results[index] = _result(index, scans[index], 'rejected', error=first['error'])
+        else:
+            results[index] = _result(index, scans[index], 'duplicate', record_id=first['record_id'])
+
+    return results
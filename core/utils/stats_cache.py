@@ -0,0 +1,110 @@
+# Fichier : stats_cache.py
+#
+# Description : Cache des statistiques du tableau de bord employé (AttendanceStatsView),
+#               par employé et par mois, dans le cache Django.
+#
+#               Les statistiques ne changent que lorsque l'employé pointe ou qu'une de ses
+#               demandes de congé change : l'entrée du mois en cours est supprimée à chaque
+#               écriture sur ses pointages ou ses demandes de congé (signaux de core/signals.py,
+#               scan_ingestion.bulk_insert_records et actions groupées de l'administration).
+#               Elle porte aussi la date de son calcul : le nombre de jours ouvrés écoulés
+#               change chaque jour, une entrée d'un jour précédent est recalculée.
+#
+#               Une modification du calendrier (jours fériés) change les jours ouvrés de
+#               tous les employés : invalidate_all() incrémente la génération du cache, qui
+#               fait partie de chaque clé, sans parcourir les entrées.
+#
+#               Les compteurs de succès / échecs du cache sont exposés par get_metrics().
+#               Le cache par défaut (LocMemCache) est propre à chaque processus : avec
+#               plusieurs workers, configurer un cache partagé (CACHES).
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+# Durée de vie par défaut d'une entrée, en secondes
+DEFAULT_TTL = 3600
+
+HITS_KEY = 'attendance_stats:hits'
+MISSES_KEY = 'attendance_stats:misses'
+GENERATION_KEY = 'attendance_stats:generation'
+
+
+def get_ttl():
+    return getattr(settings, 'STATS_CACHE_TTL', DEFAULT_TTL)
+
+
+def get_cache_key(employee_pk, day):
+    generation = cache.get(GENERATION_KEY, 0)
+    return f'attendance_stats:{generation}:{employee_pk}:{day:%Y-%m}'
+
+
+def _count(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Compteur absent (premier appel ou entrée expirée)
+        cache.add(key, 0, timeout=None)
+        cache.incr(key)
+
+
+def get_or_compute(employee_pk, today, compute):
+    """
+    Statistiques de l'employé pour le mois de `today`, lues dans le cache ou
+    calculées par compute() puis mises en cache.
+    """
+    if get_ttl() <= 0:
+        return compute()
+
+    key = get_cache_key(employee_pk, today)
+    cached = cache.get(key)
+    if cached is not None and cached['as_of'] == today.isoformat():
+        _count(HITS_KEY)
+        return cached['data']
+
+    _count(MISSES_KEY)
+    data = compute()
+    cache.set(key, {'as_of': today.isoformat(), 'data': data}, timeout=get_ttl())
+    return data
+
+
+def invalidate(employee_pks):
+    """
+    Supprime les statistiques en cache des employés donnés. La suppression est
+    répétée après la validation de la transaction en cours, pour écarter une entrée
+    recalculée entre-temps à partir des données d'avant l'écriture.
+    """
+    keys = [get_cache_key(pk, timezone.localdate()) for pk in set(employee_pks)]
+    if not keys:
+        return
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def _next_generation():
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.add(GENERATION_KEY, 0, timeout=None)
+        cache.incr(GENERATION_KEY)
+
+
+def invalidate_all():
+    """
+    Écarte les statistiques en cache de tous les employés (changement du calendrier).
+    Comme invalidate(), l'opération est répétée après la validation de la transaction.
+    """
+    _next_generation()
+    transaction.on_commit(_next_generation)
+
+
+def get_metrics():
+    """Compteurs de succès (hits) et d'échecs (misses) du cache, et taux de succès."""
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / (hits + misses), 3) if hits + misses else None,
+    }
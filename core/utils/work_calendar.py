@@ -0,0 +1,161 @@
+# Fichier : work_calendar.py
+#
+# Description : Calendrier des jours ouvrés (lundi-vendredi, hors jours fériés).
+#
+#               - Le nombre de jours de semaine entre deux dates est calculé en temps
+#                 constant (semaines complètes + reste de moins de 7 jours), sans
+#                 parcourir les jours un par un.
+#               - Les jours fériés (modèle Holiday) sont chargés une fois par année et
+#                 conservés en mémoire ; le cache est invalidé par les signaux
+#                 post_save/post_delete de Holiday (voir core/signals.py). Comme
+#                 l'index des badges, chaque processus possède son propre cache, marqué
+#                 par la génération du cache Django au moment de son chargement :
+#                 invalidate() incrémente cette génération (partagée si CACHES est
+#                 configuré, ex: Redis), et chaque lecture la compare à celle du cache
+#                 local. Un jour férié modifié dans un processus est donc pris en compte
+#                 par les autres dès leur lecture suivante (durées des congés et soldes
+#                 cohérents avec leave_balance.rebuild_all). La durée de vie maximale
+#                 (WORK_CALENDAR_TTL) reste une sécurité si le cache n'est pas partagé.
+#
+#               Utilisé par les statistiques du tableau de bord (jours ouvrés et absences),
+#               par la durée des congés en jours ouvrés (utils/leave_balance.py), et
+#               réutilisable par les rapports.
+
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+from ..models import Holiday
+
+# Durée de vie maximale du cache des jours fériés, en secondes
+DEFAULT_TTL = 3600
+
+# Jours travaillés (0 = lundi ... 6 = dimanche)
+DEFAULT_WORKDAYS = (0, 1, 2, 3, 4)
+
+GENERATION_KEY = 'work_calendar:generation'
+
+_lock = threading.Lock()
+_holidays_by_year = {}  # {année: frozenset des dates fériées}
+_loaded_at = 0.0
+_generation = None  # génération du cache au moment du chargement des jours fériés
+
+
+def _get_ttl():
+    return getattr(settings, 'WORK_CALENDAR_TTL', DEFAULT_TTL)
+
+
+def _load_year(year):
+    """Jours fériés d'une année : fériés datés de l'année et fériés récurrents (une requête)."""
+    days = set()
+    for holiday_date, recurring in Holiday.objects.filter(
+        Q(recurring=True) | Q(date__year=year)
+    ).values_list('date', 'recurring'):
+        if not recurring:
+            days.add(holiday_date)
+            continue
+        try:
+            days.add(holiday_date.replace(year=year))
+        except ValueError:
+            # 29 février d'une année non bissextile
+            pass
+    return frozenset(days)
+
+
+def holidays(year):
+    """Ensemble des jours fériés d'une année, lu en mémoire après le premier appel."""
+    global _loaded_at, _generation
+    generation = cache.get(GENERATION_KEY, 0)
+    with _lock:
+        if _generation != generation or time.monotonic() - _loaded_at > _get_ttl():
+            _holidays_by_year.clear()
+            _loaded_at = time.monotonic()
+            _generation = generation
+        days = _holidays_by_year.get(year)
+    if days is None:
+        days = _load_year(year)
+        with _lock:
+            if _generation == generation:
+                _holidays_by_year[year] = days
+    return days
+
+
+def _next_generation():
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        # Compteur absent (premier appel ou cache vidé)
+        cache.add(GENERATION_KEY, 0, timeout=None)
+        cache.incr(GENERATION_KEY)
+
+
+def invalidate():
+    """
+    Vide le cache local des jours fériés et incrémente la génération partagée : les
+    autres processus rechargent les jours fériés à leur prochaine lecture. Comme pour
+    l'index des badges, l'incrémentation est répétée après la validation de la
+    transaction en cours (appelé après toute modification de Holiday).
+    """
+    with _lock:
+        _holidays_by_year.clear()
+    _next_generation()
+    transaction.on_commit(_next_generation)
+
+
+class WorkCalendar:
+    """
+    Calendrier des jours ouvrés.
+    Exemple : WorkCalendar().count_workdays(date(2025, 1, 1), date(2025, 1, 31))
+    """
+
+    def __init__(self, workdays=DEFAULT_WORKDAYS):
+        self.workdays = frozenset(workdays)
+
+    def count_weekdays(self, start_date, end_date):
+        """Nombre de jours travaillés de la semaine entre deux dates incluses (hors jours fériés)."""
+        total = (end_date - start_date).days + 1
+        if total <= 0:
+            return 0
+        full_weeks, remainder = divmod(total, 7)
+        first_weekday = start_date.weekday()
+        # Les jours restants (moins d'une semaine) suivent le jour de la semaine de start_date
+        extra = sum(1 for offset in range(remainder) if (first_weekday + offset) % 7 in self.workdays)
+        return full_weeks * len(self.workdays) + extra
+
+    def holidays_between(self, start_date, end_date):
+        """Jours fériés tombant un jour travaillé de la semaine, entre deux dates incluses."""
+        days = []
+        for year in range(start_date.year, end_date.year + 1):
+            days.extend(
+                day for day in holidays(year)
+                if start_date <= day <= end_date and day.weekday() in self.workdays
+            )
+        return sorted(days)
+
+    def count_workdays(self, start_date, end_date):
+        """Nombre de jours ouvrés entre deux dates incluses (jours de semaine hors jours fériés)."""
+        if end_date < start_date:
+            return 0
+        return self.count_weekdays(start_date, end_date) - len(self.holidays_between(start_date, end_date))
+
+    def is_workday(self, day):
+        """Indique si un jour est ouvré."""
+        return day.weekday() in self.workdays and day not in holidays(day.year)
+
+    def add_workdays(self, start_date, count):
+        """Date du count-ième jour ouvré après start_date (start_date exclu)."""
+        day = start_date
+        while count > 0:
+            day += timedelta(days=1)
+            if self.is_workday(day):
+                count -= 1
+        return day
+
+
+# Calendrier par défaut (lundi-vendredi)
+default_calendar = WorkCalendar()
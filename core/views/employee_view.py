@@ -1,7 +1,7 @@
 from django.shortcuts import render, redirect
 from django.contrib.auth import authenticate, login, logout, get_user_model
 from django.contrib import messages
-from django.views.decorators.http import require_POST
+from django.views.decorators.http import require_GET, require_POST
 from django.views.decorators.csrf import csrf_protect
 from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
@@ -28,14 +28,25 @@ import json
 from datetime import datetime, timedelta
 import calendar
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.http import StreamingHttpResponse
+from django.utils.decorators import method_decorator
 from ..models import LeaveRequest
 
-from ..models import AttendanceRecord, LeaveRequest
+from ..models import AttendanceRecord, Employee, LeaveRequest
 from ..utils import generate_qr_code
+from ..utils import qr_badge
+from ..utils import attendance_stats
+from ..utils import attendance_history
+from ..utils import dashboard
+from ..utils import data_version
+from ..utils import leave_balance
+from ..utils import work_calendar
+from ..utils import stats_cache
 
 # Importation du modèle User personnalisé
 User = get_user_model()
 
+
 def login_view(request):
     # Vérifier si l'utilisateur est déjà connecté
     if request.user.is_authenticated:
@@ -82,58 +93,69 @@ def home_view(request):
     return render(request, 'employee_interface.html')
 
 
+@require_GET
+def stats_cache_metrics(request):
+    """
+    Vue de supervision du cache des statistiques du tableau de bord employé :
+    succès, échecs et taux de succès. Réservée au personnel (is_staff).
+    """
+    if not request.user.is_authenticated or not request.user.is_staff:
+        return JsonResponse({
+            "success": False,
+            "error": "Accès réservé au personnel"
+        }, status=403)
+
+    return JsonResponse({
+        "success": True,
+        **stats_cache.get_metrics()
+    })
+
 
+
+@method_decorator(data_version.conditional_dashboard_view, name='get')
 class EmployeeProfileDataView(LoginRequiredMixin, View):
     """Récupère les données de profil pour le dashboard"""
     def get(self, request):
-        employee = request.user.employee_profile
-        
-        # Génération du QR code en base64 (suivant la même méthode que dans admin.py)
-        qr_image_url = None
-        if employee.qr_code:
-            # Utiliser la même logique que dans admin.py
-            import qrcode
-            from io import BytesIO
-            import base64
-            
-            # Création d'un QR code
-            qr = qrcode.QRCode(
-                version=1,
-                error_correction=qrcode.constants.ERROR_CORRECT_L,
-                box_size=10,
-                border=4,
-            )
-            qr.add_data(employee.qr_code)
-            qr.make(fit=True)
-            
-            # Création d'une image à partir du QR code
-            img = qr.make_image(fill_color="black", back_color="white")
-            buffer = BytesIO()
-            img.save(buffer, format="PNG")
-            img_str = base64.b64encode(buffer.getvalue()).decode('utf-8')
-            
-            # URL de l'image au format base64
-            qr_image_url = f"data:image/png;base64,{img_str}"
-        
+        # Format du QR code : ?qr_format=png|svg|matrix ou en-tête Accept
+        try:
+            qr_format = generate_qr_code.negotiate_format(request)
+        except ValueError as e:
+            return JsonResponse({
+                'success': False,
+                'error': str(e)
+            }, status=400)
+        return JsonResponse(self.get_data(request.user.employee_profile, qr_format))
+    
+    def get_data(self, employee, qr_format=generate_qr_code.PNG):
+        """Données de profil de l'employé (utilisées aussi par DashboardView)"""
         data = {
             'employee_id': employee.employee_id,
             'name': f"{employee.user.first_name} {employee.user.last_name}",
             'department': employee.department.name if employee.department else None,
             'role': employee.role.name if employee.role else None,
             'qr_code_data': employee.qr_code,
-            'qr_code_image': qr_image_url
         }
-        return JsonResponse(data)
+        # PNG : URL de l'image pré-rendue (immuable) ; SVG ou matrice : rendus sans
+        # rastérisation (voir utils/qr_badge.py et utils/generate_qr_code.py)
+        data.update(qr_badge.profile_qr_fields(employee, qr_format))
+        return data
     
+@method_decorator(data_version.conditional_dashboard_view, name='get')
 class AttendanceStatsView(LoginRequiredMixin, View):
     """Récupère les statistiques de présence et congés"""
     
-    # Quota annuel de congés (à ajuster selon votre politique)
-    ANNUAL_LEAVE_QUOTA = 25  
-    
     def get(self, request):
-        employee = request.user.employee_profile
-        today = timezone.now().date()
+        return JsonResponse(self.get_data(request.user.employee_profile, timezone.localdate()))
+    
+    def get_data(self, employee, today):
+        """
+        Statistiques du mois en cours, en cache jusqu'au prochain pointage ou
+        changement de demande de congé (voir utils/stats_cache.py)
+        """
+        return stats_cache.get_or_compute(employee.pk, today, lambda: self._compute_stats(employee, today))
+    
+    def _compute_stats(self, employee, today):
+        """Calcule les statistiques du mois en cours et les congés de l'année"""
         current_year = today.year
         
         # --- Statistiques du mois en cours ---
@@ -141,63 +163,24 @@ class AttendanceStatsView(LoginRequiredMixin, View):
         days_in_month = calendar.monthrange(today.year, today.month)[1]
         month_end = month_start.replace(day=days_in_month)
         
-        # 1. Nombre de jours avec pointage dans le mois
-        days_present = AttendanceRecord.objects.filter(
-            employee=employee,
-            record_type='IN',
-            timestamp__date__gte=month_start,
-            timestamp__date__lte=today
-        ).dates('timestamp', 'day').count()
-        
-        # 2. Calcul du total d'heures travaillées ce mois-ci
-        # Regroupe les entrées et sorties par jour pour calculer les heures
-        attendance_records = AttendanceRecord.objects.filter(
-            employee=employee,
-            timestamp__date__gte=month_start,
-            timestamp__date__lte=today,
-            record_type__in=['IN', 'OUT']
-        ).order_by('timestamp')
-        
-        total_hours = 0
-        in_time = None
-        
-        for record in attendance_records:
-            if record.record_type == 'IN':
-                in_time = record.timestamp
-            elif record.record_type == 'OUT' and in_time is not None:
-                # Calcul de la différence en heures
-                delta = record.timestamp - in_time
-                total_hours += delta.total_seconds() / 3600
-                in_time = None
+        # 1. Nombre de jours avec pointage et 2. total d'heures travaillées ce mois-ci
+        # (lus dans les résumés journaliers, voir utils/attendance_stats.py)
+        month_stats = attendance_stats.summary_period_stats(employee, month_start, today)
+        days_present = month_stats['days_present']
+        total_hours = month_stats['worked'].total_seconds() / 3600
         
         # 3. Jours d'absence (jours ouvrés - jours présent)
-        # Note: Ceci est une approximation, il faudrait idéalement tenir compte
-        # du calendrier des jours ouvrés spécifique à votre entreprise
-        workdays_so_far = self._count_workdays(month_start, today)
+        # Jours ouvrés : lundi-vendredi hors jours fériés (voir utils/work_calendar.py)
+        workdays_so_far = work_calendar.default_calendar.count_workdays(month_start, today)
         absences = workdays_so_far - days_present
         
         # --- Statistiques de congés pour l'année ---
-        # 1. Calcul des jours de congés approuvés/utilisés
-        leave_requests = LeaveRequest.objects.filter(
-            employee=employee,
-            status='APPROVED',
-            start_date__year=current_year
-        )
-        
-        leave_days_used = 0
-        for leave in leave_requests:
-            # +1 car on compte le jour de début et le jour de fin
-            delta = (leave.end_date - leave.start_date).days + 1
-            leave_days_used += delta
-        
-        # 2. Calcul des jours de congés restants
-        leave_days_remaining = self.ANNUAL_LEAVE_QUOTA - leave_days_used
-        
-        # 3. Congés en attente
-        pending_leave_requests = LeaveRequest.objects.filter(
-            employee=employee,
-            status='PENDING'
-        ).count()
+        # Solde de l'année : quota du rôle, jours utilisés et demandes en attente
+        # (lus dans les soldes de congés, voir utils/leave_balance.py)
+        balance = leave_balance.get_balance(employee, current_year)
+        leave_days_used = balance['days_used']
+        leave_days_remaining = balance['days_remaining']
+        pending_leave_requests = balance['pending_requests']
         
         # --- Formatage des résultats ---
         data = {
@@ -212,23 +195,14 @@ class AttendanceStatsView(LoginRequiredMixin, View):
             'leave': {
                 'days_used': leave_days_used,
                 'days_remaining': leave_days_remaining,
-                'total_quota': self.ANNUAL_LEAVE_QUOTA,
+                'total_quota': balance['quota'],
                 'pending_requests': pending_leave_requests
             }
         }
         
-        return JsonResponse(data)
-    
-    def _count_workdays(self, start_date, end_date):
-        """Compte le nombre de jours ouvrés entre deux dates (lundi-vendredi)"""
-        days = 0
-        current_date = start_date
-        while current_date <= end_date:
-            if current_date.weekday() < 5:  # 0-4 correspond à lundi-vendredi
-                days += 1
-            current_date += timedelta(days=1)
-        return days
+        return data
     
+@method_decorator(data_version.conditional_dashboard_view, name='get')
 class AttendanceHistoryView(LoginRequiredMixin, View):
     """Récupère l'historique des pointages avec filtres et calcul des durées"""
     
@@ -255,7 +229,7 @@ class AttendanceHistoryView(LoginRequiredMixin, View):
                 pass
         else:
             # Période prédéfinie
-            today = timezone.now().date()
+            today = timezone.localdate()
             if period == 'day':
                 start_date = today
                 end_date = today
@@ -274,85 +248,62 @@ class AttendanceHistoryView(LoginRequiredMixin, View):
         
         # 2. Type de pointage
         record_type = request.GET.get('record_type')
+        type_filter = record_type if record_type and record_type != 'ALL' else None
         
-        # --- Construction de la requête ---
-        query = AttendanceRecord.objects.filter(employee=employee)
+        # 3. Pagination par curseur : `cursor` (renvoyé par la page précédente) et
+        #    `limit` (nombre de jours par page)
+        try:
+            page_days = int(request.GET.get('limit', attendance_history.DEFAULT_PAGE_DAYS))
+            cursor = request.GET.get('cursor')
+            cursor_day = attendance_history.decode_cursor(cursor) if cursor else None
+        except ValueError:
+            return JsonResponse({
+                'success': False,
+                'error': 'Paramètre de pagination invalide'
+            }, status=400)
+        page_days = max(1, min(page_days, attendance_history.MAX_PAGE_DAYS))
         
-        if start_date:
-            query = query.filter(timestamp__date__gte=start_date)
-        if end_date:
-            query = query.filter(timestamp__date__lte=end_date)
-        if record_type and record_type != 'ALL':
-            query = query.filter(record_type=record_type)
-            
-        # Récupération des enregistrements, ordonnés par date/heure
-        records = query.order_by('timestamp')
-        
-        # --- Organisation et traitement des données ---
-        # Regrouper les pointages par jour pour faciliter l'affichage
-        days_data = defaultdict(list)
-        for record in records:
-            day_str = record.timestamp.strftime('%Y-%m-%d')
-            days_data[day_str].append({
-                'id': record.id,
-                'time': record.timestamp.strftime('%H:%M:%S'),
-                'type': record.record_type,
-                'type_display': record.get_record_type_display(),
-                'location': record.location or '',
-                'note': record.note or ''
-            })
+        period_data = {
+            'start': start_date.strftime('%Y-%m-%d') if start_date else None,
+            'end': end_date.strftime('%Y-%m-%d') if end_date else None,
+        }
         
-        # Calcul des durées de présence par jour
-        days_summary = {}
-        for day, day_records in days_data.items():
-            # Initialisation des variables pour le calcul
-            total_duration = 0
-            in_time = None
-            break_start = None
-            
-            # Parcourir les pointages du jour chronologiquement
-            for record in sorted(day_records, key=lambda x: x['time']):
-                if record['type'] == 'IN':
-                    in_time = datetime.strptime(record['time'], '%H:%M:%S')
-                elif record['type'] == 'OUT' and in_time is not None:
-                    out_time = datetime.strptime(record['time'], '%H:%M:%S')
-                    # Ajouter la durée entre entrée et sortie
-                    delta = out_time - in_time
-                    total_duration += delta.total_seconds()
-                    in_time = None  # Réinitialiser pour le prochain cycle
-                elif record['type'] == 'BREAK_START':
-                    break_start = datetime.strptime(record['time'], '%H:%M:%S')
-                elif record['type'] == 'BREAK_END' and break_start is not None:
-                    break_end = datetime.strptime(record['time'], '%H:%M:%S')
-                    # Soustraire la durée de la pause
-                    delta = break_end - break_start
-                    total_duration -= delta.total_seconds()
-                    break_start = None  # Réinitialiser pour la prochaine pause
-            
-            # Convertir le total en heures et minutes
-            hours = int(total_duration // 3600)
-            minutes = int((total_duration % 3600) // 60)
+        # --- Réponse en flux (NDJSON) ---
+        # Un jour par ligne, page après page, puis une ligne de fin : la mémoire
+        # utilisée ne dépend pas de l'étendue de la période.
+        if request.GET.get('format') == 'ndjson' or 'application/x-ndjson' in request.headers.get('Accept', ''):
+            def stream():
+                total_records = 0
+                pages = attendance_history.iter_history_pages(
+                    employee, start_date, end_date, type_filter, cursor_day, page_days
+                )
+                for days in pages:
+                    for day in days:
+                        total_records += len(day['records'])
+                        yield json.dumps(day) + '\n'
+                yield json.dumps({
+                    'success': True,
+                    'end': True,
+                    'period': period_data,
+                    'filter': record_type or 'ALL',
+                    'total_records': total_records
+                }) + '\n'
             
-            # Stocker le résumé du jour
-            days_summary[day] = {
-                'total_hours': hours,
-                'total_minutes': minutes,
-                'formatted_duration': f'{hours}h {minutes:02d}min',
-                'records_count': len(day_records)
-            }
+            response = StreamingHttpResponse(stream(), content_type='application/x-ndjson')
+            response['X-Accel-Buffering'] = 'no'  # Pas de mise en tampon par nginx
+            return response
         
-        # --- Formatage du résultat ---
-        result = []
-        for day, records in sorted(days_data.items(), reverse=True):  # Tri des jours (plus récent d'abord)
-            day_date = datetime.strptime(day, '%Y-%m-%d')
-            day_info = {
-                'date': day,
-                'day_name': day_date.strftime('%A'),  # Nom du jour (lundi, mardi, etc.)
-                'formatted_date': day_date.strftime('%d %B %Y'),  # Format lisible
-                'records': sorted(records, key=lambda x: x['time']),  # Tri par heure
-                'summary': days_summary.get(day, {'formatted_duration': '0h 00min'})
-            }
-            result.append(day_info)
+        return JsonResponse(self.get_page_data(employee, start_date, end_date, record_type, cursor_day, page_days))
+    
+    def get_page_data(self, employee, start_date, end_date, record_type=None, cursor_day=None,
+                      page_days=attendance_history.DEFAULT_PAGE_DAYS):
+        """Une page de l'historique entre deux dates locales (utilisée aussi par DashboardView)"""
+        type_filter = record_type if record_type and record_type != 'ALL' else None
+        
+        # --- Page de résultats ---
+        days, next_day = attendance_history.history_page(
+            employee, start_date, end_date, type_filter, cursor_day, page_days
+        )
         
         # --- Construction de la réponse ---
         response_data = {
@@ -362,121 +313,194 @@ class AttendanceHistoryView(LoginRequiredMixin, View):
                 'end': end_date.strftime('%Y-%m-%d') if end_date else None,
             },
             'filter': record_type or 'ALL',
-            'days': result,
-            'total_records': sum(len(records) for records in days_data.values())
+            'days': days,
+            'total_records': sum(len(day['records']) for day in days),
+            'pagination': {
+                'limit': page_days,
+                'has_more': next_day is not None,
+                'next_cursor': attendance_history.encode_cursor(next_day) if next_day else None
+            }
         }
         
-        return JsonResponse(response_data)
+        return response_data
 
+@method_decorator(data_version.conditional_dashboard_view, name='get')
 class LeaveRequestListView(LoginRequiredMixin, View):
     """Vue pour lister les demandes de congé avec filtrage par statut"""
     
+    # Nombre de demandes par page (paramètre page_size)
+    DEFAULT_PAGE_SIZE = 50
+    MAX_PAGE_SIZE = 200
+    
     def get(self, request):
         employee = request.user.employee_profile
         
         # Filtre par statut (PENDING, APPROVED, REJECTED, ou ALL)
         status_filter = request.GET.get('status', 'ALL')
-        
-        # Construction de la requête
-        query = LeaveRequest.objects.filter(employee=employee)
-        if status_filter != 'ALL':
-            query = query.filter(status=status_filter)
             
         # Filtre par année
         year = request.GET.get('year')
-        if year and year.isdigit():
-            query = query.filter(start_date__year=int(year))
-            
-        # Tri par date de demande (plus récentes en premier)
-        leaves = query.order_by('-request_date')
-        
-        # Formatage des résultats
-        results = []
-        for leave in leaves:
-            # Calcul de la durée en jours
-            duration = (leave.end_date - leave.start_date).days + 1
-            
-            # Formatage des dates pour l'affichage
-            start_formatted = leave.start_date.strftime('%d %b %Y')
-            end_formatted = leave.end_date.strftime('%d %b %Y')
-            
-            # Vérification si la demande peut être annulée
-            can_cancel = leave.status == 'PENDING'
-            
-            # Nom du responsable ayant traité la demande (si applicable)
-            processed_by = None
-            if leave.response_by:
-                processed_by = f"{leave.response_by.user.first_name} {leave.response_by.user.last_name}".strip()
-                if not processed_by:
-                    processed_by = leave.response_by.user.username
-            
-            results.append({
-                'id': leave.id,
-                'start_date': leave.start_date.strftime('%Y-%m-%d'),
-                'end_date': leave.end_date.strftime('%Y-%m-%d'),
-                'start_date_display': start_formatted,
-                'end_date_display': end_formatted,
-                'duration': duration,
-                'type': leave.leave_type,
-                'type_display': leave.get_leave_type_display(),
-                'reason': leave.reason,
-                'status': leave.status,
-                'status_display': leave.get_status_display(),
-                'request_date': leave.request_date.strftime('%Y-%m-%d %H:%M'),
-                'response_date': leave.response_date.strftime('%Y-%m-%d %H:%M') if leave.response_date else None,
-                'processed_by': processed_by,
-                'can_cancel': can_cancel
-            })
+        year = int(year) if year and year.isdigit() else None
         
-        # Statistiques des congés
-        stats = self._get_leave_stats(employee)
+        # Pagination (page à partir de 1, taille de page bornée)
+        try:
+            page = max(1, int(request.GET.get('page', 1)))
+            page_size = max(1, min(int(request.GET.get('page_size', self.DEFAULT_PAGE_SIZE)), self.MAX_PAGE_SIZE))
+        except ValueError:
+            return JsonResponse({
+                'success': False,
+                'error': 'Paramètre de pagination invalide'
+            }, status=400)
         
-        return JsonResponse({
+        return JsonResponse(self.get_data(employee, status_filter, year, page, page_size))
+    
+    def get_data(self, employee, status_filter='ALL', year=None, page=1, page_size=DEFAULT_PAGE_SIZE, recent=0):
+        """
+        Page de la liste des demandes et statistiques (utilisée aussi par DashboardView) ;
+        si recent > 0, ajoute les `recent` dernières demandes, tous statuts confondus
+        """
+        # Construction du filtre de la liste
+        selection = Q()
+        if status_filter != 'ALL':
+            selection &= Q(status=status_filter)
+        if year:
+            selection &= Q(start_date__year=year)
+        
+        # Statistiques des congés et nombre de demandes de la liste (agrégation et solde)
+        stats = self._get_leave_stats(employee, selection)
+        total_count = stats.pop('selected_count')
+            
+        # Page demandée, tri par date de demande (plus récentes en premier) ; le
+        # responsable et son utilisateur sont lus par jointure (une seule requête)
+        offset = (page - 1) * page_size
+        leaves = self._leave_queryset(employee).filter(selection)[offset:offset + page_size]
+        results = [self._format_leave(leave) for leave in leaves]
+        
+        total_pages = max(1, -(-total_count // page_size))
+        data = {
             'success': True,
             'leaves': results,
             'count': len(results),
             'status_filter': status_filter,
-            'stats': stats
-        })
+            'stats': stats,
+            'pagination': {
+                'page': page,
+                'page_size': page_size,
+                'total_count': total_count,
+                'total_pages': total_pages,
+                'has_next': page < total_pages
+            }
+        }
+        if recent:
+            data['recent'] = [self._format_leave(leave) for leave in self._leave_queryset(employee)[:recent]]
+        return data
     
-    def _get_leave_stats(self, employee):
-        """Calcule les statistiques des demandes de congé"""
-        current_year = timezone.now().year
-        
-        # Comptage par statut
-        pending_count = LeaveRequest.objects.filter(
-            employee=employee, 
-            status='PENDING'
-        ).count()
-        
-        approved_count = LeaveRequest.objects.filter(
-            employee=employee, 
-            status='APPROVED'
-        ).count()
-        
-        rejected_count = LeaveRequest.objects.filter(
-            employee=employee, 
-            status='REJECTED'
-        ).count()
-        
-        # Jours approuvés cette année
-        approved_requests = LeaveRequest.objects.filter(
-            employee=employee,
-            status='APPROVED',
-            start_date__year=current_year
-        )
+    def _leave_queryset(self, employee):
+        """Demandes de l'employé, plus récentes en premier, avec le responsable et son utilisateur"""
+        return LeaveRequest.objects.filter(employee=employee).select_related(
+            'response_by__user'
+        ).order_by('-request_date', '-id')
+    
+    def _format_leave(self, leave):
+        """Formatage d'une demande de congé pour l'affichage"""
+        # Calcul de la durée en jours ouvrés
+        duration = leave_balance.leave_days(leave.start_date, leave.end_date)
         
-        days_used = 0
-        for leave in approved_requests:
-            days_used += (leave.end_date - leave.start_date).days + 1
+        # Formatage des dates pour l'affichage
+        start_formatted = leave.start_date.strftime('%d %b %Y')
+        end_formatted = leave.end_date.strftime('%d %b %Y')
+        
+        # Vérification si la demande peut être annulée
+        can_cancel = leave.status == 'PENDING'
+        
+        # Nom du responsable ayant traité la demande (si applicable)
+        processed_by = None
+        if leave.response_by:
+            processed_by = f"{leave.response_by.user.first_name} {leave.response_by.user.last_name}".strip()
+            if not processed_by:
+                processed_by = leave.response_by.user.username
         
         return {
-            'pending_count': pending_count,
-            'approved_count': approved_count,
-            'rejected_count': rejected_count,
-            'total_count': pending_count + approved_count + rejected_count,
-            'days_used_this_year': days_used
+            'id': leave.id,
+            'start_date': leave.start_date.strftime('%Y-%m-%d'),
+            'end_date': leave.end_date.strftime('%Y-%m-%d'),
+            'start_date_display': start_formatted,
+            'end_date_display': end_formatted,
+            'duration': duration,
+            'type': leave.leave_type,
+            'type_display': leave.get_leave_type_display(),
+            'reason': leave.reason,
+            'status': leave.status,
+            'status_display': leave.get_status_display(),
+            'request_date': leave.request_date.strftime('%Y-%m-%d %H:%M'),
+            'response_date': leave.response_date.strftime('%Y-%m-%d %H:%M') if leave.response_date else None,
+            'processed_by': processed_by,
+            'can_cancel': can_cancel
         }
+    
+    def _get_leave_stats(self, employee, selection):
+        """
+        Calcule les statistiques des demandes de congé et le nombre de demandes
+        vérifiant le filtre de la liste (une seule requête d'agrégation) ; les jours
+        utilisés de l'année, en jours ouvrés, sont lus dans le solde de congés
+        """
+        result = attendance_stats.leave_request_stats(employee, selection)
+        balance = leave_balance.get_balance(employee, timezone.localdate().year)
+        return {
+            'pending_count': result['pending_count'],
+            'approved_count': result['approved_count'],
+            'rejected_count': result['rejected_count'],
+            'total_count': result['total_count'],
+            'days_used_this_year': balance['days_used'],
+            'selected_count': result['selected_count']
+        }
+
+@method_decorator(data_version.conditional_dashboard_view, name='get')
+class DashboardView(LoginRequiredMixin, View):
+    """
+    Données de démarrage du tableau de bord en une seule réponse : profil, statistiques
+    du mois, historique de la semaine en cours et demandes de congé (en attente et récentes).
+    Chaque section a le même contenu que la réponse de l'API correspondante.
+    """
+    
+    # Nombre de demandes de congé récentes (tous statuts)
+    RECENT_LEAVES = 5
+    
+    def get(self, request):
+        # Format du QR code de la section profil (comme /api/profile/)
+        try:
+            qr_format = generate_qr_code.negotiate_format(request)
+        except ValueError as e:
+            return JsonResponse({
+                'success': False,
+                'error': str(e)
+            }, status=400)
+        
+        # Employé, utilisateur, département et rôle lus une seule fois (jointure)
+        employee = get_object_or_404(
+            Employee.objects.select_related('user', 'department', 'role'),
+            pk=request.user.pk
+        )
+        today = timezone.localdate()
+        week_start = today - timedelta(days=today.weekday())
+        
+        # Sections indépendantes, calculées en parallèle si possible (voir utils/dashboard.py)
+        sections = dashboard.compute_sections({
+            'history': lambda: AttendanceHistoryView().get_page_data(employee, week_start, today),
+            'profile': lambda: EmployeeProfileDataView().get_data(employee, qr_format),
+            'stats': lambda: AttendanceStatsView().get_data(employee, today),
+            'leaves': lambda: LeaveRequestListView().get_data(
+                employee, status_filter='PENDING', recent=self.RECENT_LEAVES
+            ),
+        })
+        
+        return JsonResponse({
+            'success': True,
+            'profile': sections['profile'],
+            'stats': sections['stats'],
+            'history': sections['history'],
+            'leaves': sections['leaves']
+        })
 
 class LeaveRequestCreateView(LoginRequiredMixin, View):
     """Vue pour créer une nouvelle demande de congé"""
@@ -539,7 +563,26 @@ class LeaveRequestCreateView(LoginRequiredMixin, View):
                     'error': 'Cette période chevauche une demande de congé déjà approuvée.'
                 }, status=400)
             
-            # Création de la demande de congé
+            # Durée en jours ouvrés (week-ends et jours fériés exclus)
+            duration = leave_balance.leave_days(start_date, end_date)
+            if duration == 0:
+                return JsonResponse({
+                    'success': False, 
+                    'error': 'La période demandée ne contient aucun jour ouvré.'
+                }, status=400)
+            
+            # Vérification du solde de congés de l'année (demandes approuvées et en attente),
+            # pour les congés imputés sur le quota annuel uniquement
+            if leave_type in leave_balance.ANNUAL_LEAVE_TYPES:
+                balance = leave_balance.get_balance(employee, start_date.year)
+                available = balance['days_remaining'] - balance['days_pending']
+                if duration > available:
+                    return JsonResponse({
+                        'success': False, 
+                        'error': f'Solde de congés insuffisant : {max(available, 0)} jour(s) disponible(s) en {start_date.year}.'
+                    }, status=400)
+            
+            # Création de la demande de congé (le solde est mis à jour dans la même transaction)
             with transaction.atomic():
                 leave_request = LeaveRequest.objects.create(
                     employee=employee,
@@ -551,9 +594,6 @@ class LeaveRequestCreateView(LoginRequiredMixin, View):
                     request_date=timezone.now()
                 )
             
-            # Calcul de la durée
-            duration = (end_date - start_date).days + 1
-            
             return JsonResponse({
                 'success': True,
                 'id': leave_request.id,
@@ -597,10 +637,11 @@ class LeaveRequestActionView(LoginRequiredMixin, View):
                         'error': 'Seules les demandes en attente peuvent être annulées.'
                     }, status=400)
                 
-                # Annulation de la demande
-                leave_request.status = 'REJECTED'  # Ou utiliser un statut spécifique 'CANCELLED'
-                leave_request.response_date = timezone.now()
-                leave_request.save()
+                # Annulation de la demande (le solde est mis à jour dans la même transaction)
+                with transaction.atomic():
+                    leave_request.status = 'REJECTED'  # Ou utiliser un statut spécifique 'CANCELLED'
+                    leave_request.response_date = timezone.now()
+                    leave_request.save()
                 
                 return JsonResponse({
                     'success': True,
@@ -633,8 +674,8 @@ class LeaveRequestDetailView(LoginRequiredMixin, View):
                 employee=employee
             )
             
-            # Calcul de la durée
-            duration = (leave.end_date - leave.start_date).days + 1
+            # Calcul de la durée en jours ouvrés
+            duration = leave_balance.leave_days(leave.start_date, leave.end_date)
             
             # Nom du responsable ayant traité la demande (si applicable)
             processed_by = None
@@ -0,0 +1,128 @@
+# Fichier : kiosk_async_view.py
+#
+# Description : Versions asynchrones des vues du kiosque, pour un déploiement ASGI
+#               (gunicorn + workers uvicorn, voir entrypoint.sh). Elles utilisent l'ORM
+#               asynchrone de Django : une requête en attente de la base ne bloque
+#               plus un thread de worker.
+#
+#               Les vues sont activées à la place des vues synchrones (mêmes URL)
+#               lorsque KIOSK_ASYNC_VIEWS=True. La validation et la construction des
+#               réponses sont partagées avec kiosk_view.py. L'ORM asynchrone ne gère
+#               pas encore les transactions : l'insertion d'un pointage (verrou sur
+#               l'état de présence + création) reste donc exécutée dans un thread via
+#               sync_to_async.
+
+from asgiref.sync import sync_to_async
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+import json
+
+from ..models import Employee
+from ..utils import credential_index
+from ..utils import kiosk_token
+from ..utils.scan_debounce import debounce_scan
+from ..utils import presence as presence_utils
+from ..utils import punch_queue
+from .kiosk_view import (
+    RECORD_TYPES, error_response, get_available_actions, punch_fields, punch_request_error,
+    punch_response, read_request_token, read_scan_request, record_punch, request_token,
+    requested_record_type, scan_punch_response, scan_response, token_error_response,
+)
+
+
+async def get_available_actions_async(employee):
+    """
+    Version asynchrone de get_available_actions : lecture de l'état de présence
+    par clé primaire avec l'ORM asynchrone.
+    """
+    if punch_queue.is_enabled():
+        # La file locale est un fichier SQLite : lecture déléguée à un thread
+        return await sync_to_async(get_available_actions)(employee)
+    presence = await presence_utils.aget_presence_state(employee)
+    return presence_utils.get_actions_for_state(presence.state)
+
+
+@csrf_exempt
+@require_POST
+@debounce_scan
+async def authenticate_card_async(request):
+    """
+    Version asynchrone de authenticate_card (mêmes paramètres et mêmes réponses).
+    """
+    try:
+        # Charger les données de la requête et vérifier l'identifiant NFC ou QR code
+        data, error = read_scan_request(request)
+        if error:
+            return error
+
+        # Rechercher l'employé correspondant dans l'index des badges
+        badge = await credential_index.aget_badge_record(nfc_id=data.get('nfc_id'), qr_code=data.get('qr_code'))
+        if not badge:
+            return error_response("Aucun employé trouvé avec cet identifiant", 404)
+
+        available_actions = await get_available_actions_async(badge['user_id'])
+
+        # Mode combiné : action demandée par le kiosque, ou action unique possible
+        record_type = requested_record_type(data, available_actions)
+        if record_type:
+            if record_type not in RECORD_TYPES:
+                return error_response("Type de pointage invalide", 400)
+            attendance = await sync_to_async(record_punch)(badge['user_id'], record_type, **punch_fields(data))
+            return scan_punch_response(badge, attendance, record_type, available_actions)
+
+        return scan_response(badge, data, available_actions)
+
+    except json.JSONDecodeError:
+        return error_response("Format JSON invalide", 400)
+    except Exception as e:
+        return error_response(f"Erreur serveur: {str(e)}", 500)
+
+
+@csrf_exempt
+@require_POST
+async def record_attendance_async(request):
+    """
+    Version asynchrone de record_attendance (mêmes paramètres et mêmes réponses).
+    """
+    try:
+        # Charger les données de la requête
+        data = json.loads(request.body)
+
+        # Identifier l'employé autorisé : jeton de kiosque signé, ou session Django
+        token = request_token(request, data)
+        if token:
+            authorized_pk, error = read_request_token(token, data.get('kiosk_id'))
+            if error:
+                return error
+            # Jeton à usage unique : un seul pointage par scan
+            try:
+                await kiosk_token.aconsume_kiosk_token(token)
+            except kiosk_token.UsedKioskToken as e:
+                return token_error_response(e)
+        else:
+            user = await request.auser()
+            if not user.is_authenticated:
+                return error_response("Utilisateur non authentifié", 401)
+            authorized_pk = user.id
+
+        # Vérifier l'identifiant de l'employé et le type de pointage
+        error = punch_request_error(data)
+        if error:
+            return error
+
+        try:
+            employee = await Employee.objects.select_related('user').aget(employee_id=data['employee_id'])
+        except Employee.DoesNotExist:
+            return error_response("Employé non trouvé", 404)
+
+        # Vérifier que l'utilisateur authentifié est bien l'employé concerné
+        if authorized_pk != employee.pk:
+            return error_response("Non autorisé à enregistrer un pointage pour cet employé", 403)
+
+        attendance = await sync_to_async(record_punch)(employee, data['record_type'], **punch_fields(data))
+        return punch_response(employee, attendance, data['record_type'])
+
+    except json.JSONDecodeError:
+        return error_response("Format JSON invalide", 400)
+    except Exception as e:
+        return error_response(f"Erreur serveur: {str(e)}", 500)
@@ -1,24 +1,19 @@
 from django.shortcuts import render
 from django.http import JsonResponse
-from django.views.decorators.csrf import ensure_csrf_cookie
-from django.views.decorators.http import require_GET
-from django.views.decorators.http import require_POST
-import json
-from django.views.decorators.csrf import csrf_exempt
-from django.contrib.auth import login
-from ..models import Employee,AttendanceRecord
+from django.views.decorators.csrf import csrf_exempt, ensure_csrf_cookie
+from django.views.decorators.http import require_GET, require_POST
 from django.utils import timezone
-from django.urls import reverse
-from django.views.decorators.csrf import csrf_protect
-
-
-
-
-
-
-
-
+from django.db import transaction
+import json
 
+from ..models import Employee, AttendanceRecord
+from ..utils import credential_index
+from ..utils import kiosk_token
+from ..utils import scan_debounce
+from ..utils.scan_debounce import debounce_scan
+from ..utils import presence as presence_utils
+from ..utils import punch_queue
+from ..utils import scan_ingestion
 
 
 @ensure_csrf_cookie
@@ -39,91 +34,62 @@ def kiosk_view(request):
     
     return render(request, 'kiosk.html')
 
-# views.py
-from django.http import JsonResponse
-from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_POST
-from django.contrib.auth import login
-from django.utils import timezone
-import json
-
-from ..models import Employee, User, AttendanceRecord
-
 @csrf_exempt
 @require_POST
+@debounce_scan
 def authenticate_card(request):
     """
     Vue pour authentifier un employé via son identifiant NFC ou QR code.
     Reçoit les données au format JSON et retourne le statut de l'authentification
     ainsi que les actions de pointage disponibles.
+    
+    Mode combiné (scan + pointage en une seule requête) :
+    - record_type: (optionnel) L'action voulue, enregistrée directement si elle est valide
+    - auto_record: (optionnel) Si vrai et qu'une seule action est possible, elle est enregistrée
+    - location, note, kiosk_id: (optionnels) Transmis au pointage
+    Lorsqu'un pointage est enregistré, la réponse contient "recorded": true et les
+    informations de confirmation (voir record_attendance).
+    
+    Sinon, la réponse contient un jeton de kiosque signé ("kiosk_token"), valable
+    quelques secondes et pour un seul pointage de cet employé sur ce kiosque (kiosk_id),
+    à transmettre à record_attendance. Aucune session n'est ouverte : un scan n'écrit rien en base.
+    
+    Un même scan (badge, kiosque et mode combiné) répété pendant la fenêtre
+    anti-rebond (KIOSK_SCAN_DEBOUNCE_WINDOW) reçoit la réponse précédente,
+    avec l'en-tête X-Scan-Debounced, jusqu'au pointage suivant de l'employé
+    (voir utils/scan_debounce.py).
     """
     try:
-        # Charger les données de la requête
-        data = json.loads(request.body)
-        
-        # Vérifier si on a un identifiant NFC ou QR code
-        nfc_id = data.get('nfc_id')
-        qr_code = data.get('qr_code')
-        
-        if not nfc_id and not qr_code:
-            return JsonResponse({
-                "success": False,
-                "error": "Aucun identifiant NFC ou QR code fourni"
-            }, status=400)
+        # Charger les données de la requête et vérifier l'identifiant NFC ou QR code
+        data, error = read_scan_request(request)
+        if error:
+            return error
             
-        # Rechercher l'employé correspondant
-        employee = None
-        
-        if nfc_id:
-            try:
-                employee = Employee.objects.get(nfc_id=nfc_id)
-            except Employee.DoesNotExist:
-                pass
-                
-        if qr_code and not employee:
-            try:
-                employee = Employee.objects.get(qr_code=qr_code)
-            except Employee.DoesNotExist:
-                pass
-                
-        if not employee:
-            return JsonResponse({
-                "success": False,
-                "error": "Aucun employé trouvé avec cet identifiant"
-            }, status=404)
-            
-        # Authentifier l'utilisateur
-        user = employee.user
-        
-        # Connexion de l'utilisateur à la session (optionnel)
-        if request.session.session_key is None:
-            request.session.create()
-        login(request, user)
+        # Rechercher l'employé correspondant dans l'index des badges (sans requête en base)
+        badge = credential_index.get_badge_record(nfc_id=data.get('nfc_id'), qr_code=data.get('qr_code'))
+        if not badge:
+            return error_response("Aucun employé trouvé avec cet identifiant", 404)
         
         # Déterminer les actions de pointage disponibles en fonction du dernier pointage
-        available_actions = get_available_actions(employee)
+        # (la clé primaire d'un employé est l'id de son utilisateur)
+        available_actions = get_available_actions(badge['user_id'])
         
-        # Retourner les informations de base de l'employé et les actions disponibles
-        return JsonResponse({
-            "success": True,
-            "employee_id": employee.employee_id,
-            "name": f"{user.first_name} {user.last_name}".strip() or user.username,
-            "user_id": user.id,
-            "department": employee.department.name if employee.department else None,
-            "role": employee.role.name if employee.role else None,
-            "available_actions": available_actions
-        })
+        # Mode combiné : action demandée par le kiosque, ou action unique possible
+        record_type = requested_record_type(data, available_actions)
+        if record_type:
+            if record_type not in RECORD_TYPES:
+                return error_response("Type de pointage invalide", 400)
+            attendance = record_punch(badge['user_id'], record_type, **punch_fields(data))
+            return scan_punch_response(badge, attendance, record_type, available_actions)
+        
+        # Retourner les informations de base de l'employé, les actions disponibles
+        # et le jeton qui autorise le pointage suivant
+        return scan_response(badge, data, available_actions)
         
     except json.JSONDecodeError:
-        return JsonResponse({
-            "success": False,
-            "error": "Format JSON invalide"
-        }, status=400)
+        return error_response("Format JSON invalide", 400)
     except Exception as e:
-        return JsonResponse({
-            "success": False,
-            "error": f"Erreur serveur: {str(e)}"
-        }, status=500)
+        return error_response(f"Erreur serveur: {str(e)}", 500)
 
 @csrf_exempt
 @require_POST
@@ -134,6 +100,9 @@ def record_attendance(request):
     Le corps de la requête doit contenir:
     - employee_id: L'identifiant de l'employé
     - record_type: Le type de pointage ('IN', 'OUT', 'BREAK_START', 'BREAK_END')
+    - kiosk_token: Le jeton délivré par authenticate_card (ou l'en-tête X-Kiosk-Token),
+      valable pour un seul pointage ; à défaut, l'utilisateur doit être connecté par session
+    - kiosk_id: (optionnel) L'identifiant du kiosque, qui doit correspondre au jeton
     - location: (optionnel) Le lieu du pointage
     - note: (optionnel) Une note associée au pointage
     
@@ -142,83 +111,112 @@ def record_attendance(request):
     - En cas d'échec: {"success": false, "error": "Message d'erreur"}
     """
     try:
-        # Vérifier que l'utilisateur est authentifié
-        if not request.user.is_authenticated:
-            return JsonResponse({
-                "success": False,
-                "error": "Utilisateur non authentifié"
-            }, status=401)
-            
         # Charger les données de la requête
         data = json.loads(request.body)
         
-        # Récupérer l'employé à partir de son ID
-        employee_id = data.get('employee_id')
-        if not employee_id:
-            return JsonResponse({
-                "success": False,
-                "error": "ID employé non fourni"
-            }, status=400)
+        # Identifier l'employé autorisé : jeton de kiosque signé, ou session Django
+        token = request_token(request, data)
+        if token:
+            authorized_pk, error = read_request_token(token, data.get('kiosk_id'))
+            if error:
+                return error
+            # Jeton à usage unique : un seul pointage par scan
+            try:
+                kiosk_token.consume_kiosk_token(token)
+            except kiosk_token.UsedKioskToken as e:
+                return token_error_response(e)
+        elif request.user.is_authenticated:
+            authorized_pk = request.user.id
+        else:
+            return error_response("Utilisateur non authentifié", 401)
             
-        try:
-            employee = Employee.objects.get(employee_id=employee_id)
+        # Vérifier l'identifiant de l'employé et le type de pointage
+        error = punch_request_error(data)
+        if error:
+            return error
             
-            # Vérifier que l'utilisateur connecté est bien l'employé concerné
-            if request.user.id != employee.user.id:
-                return JsonResponse({
-                    "success": False,
-                    "error": "Non autorisé à enregistrer un pointage pour cet employé"
-                }, status=403)
-                
+        # Récupérer l'employé à partir de son ID
+        try:
+            employee = Employee.objects.select_related('user').get(employee_id=data['employee_id'])
         except Employee.DoesNotExist:
+            return error_response("Employé non trouvé", 404)
+            
+        # Vérifier que l'utilisateur authentifié est bien l'employé concerné
+        if authorized_pk != employee.pk:
+            return error_response("Non autorisé à enregistrer un pointage pour cet employé", 403)
+            
+        # Vérifier que le type de pointage est cohérent avec le dernier état et
+        # créer l'enregistrement
+        attendance = record_punch(employee, data['record_type'], **punch_fields(data))
+        
+        # Retourner les informations pour le popup de confirmation
+        return punch_response(employee, attendance, data['record_type'])
+        
+    except json.JSONDecodeError:
+        return error_response("Format JSON invalide", 400)
+    except Exception as e:
+        return error_response(f"Erreur serveur: {str(e)}", 500)
+
+
+@csrf_exempt
+@require_POST
+def record_attendance_batch(request):
+    """
+    Vue pour enregistrer en une seule requête un lot de scans mis en attente par un kiosque
+    (par exemple après une perte de connexion). Aucune session n'est nécessaire :
+    le lot est authentifié par la clé du kiosque (en-tête X-Kiosk-Key, voir la commande
+    kiosk_key), puis chaque scan par son identifiant de badge.
+    
+    Le corps de la requête doit contenir:
+    - kiosk_id: L'identifiant du kiosque, auquel appartiennent tous les scans du lot
+    - scans: La liste des scans, chacun contenant:
+        - nfc_id ou qr_code: L'identifiant du badge
+        - record_type: Le type de pointage ('IN', 'OUT', 'BREAK_START', 'BREAK_END')
+        - timestamp: L'horodatage du scan sur le kiosque (ISO 8601), au plus
+          KIOSK_MAX_BACKDATE secondes dans le passé
+        - idempotency_key: Une clé unique générée par le kiosque pour ce scan
+        - kiosk_id, location, note: (optionnels)
+    
+    Retourne:
+    - {"success": true, "results": [...], "created": n, "duplicates": n, "rejected": n}
+      où chaque résultat indique le statut du scan ('created', 'duplicate' ou 'rejected')
+    - En cas d'échec global: {"success": false, "error": "Message d'erreur"}
+    """
+    try:
+        data = json.loads(request.body)
+        if not isinstance(data, dict):
+            data = {}
+            
+        # Authentifier le kiosque avant de lire les scans
+        kiosk_id = data.get('kiosk_id')
+        if not kiosk_token.check_kiosk_key(kiosk_id, request.headers.get('X-Kiosk-Key')):
             return JsonResponse({
                 "success": False,
-                "error": "Employé non trouvé"
-            }, status=404)
+                "error": "Clé de kiosque manquante ou invalide"
+            }, status=401)
             
-        # Récupérer le type de pointage
-        record_type = data.get('record_type')
-        if not record_type or record_type not in dict(AttendanceRecord.RECORD_TYPES):
+        scans = data.get('scans')
+        if not isinstance(scans, list) or not scans:
             return JsonResponse({
                 "success": False,
-                "error": "Type de pointage invalide"
+                "error": "Aucun scan fourni"
             }, status=400)
             
-        # Vérifier que le type de pointage est cohérent avec le dernier état
-        available_actions = get_available_actions(employee)
-        valid_types = [action['value'] for action in available_actions]
-        
-        if record_type not in valid_types:
+        max_scans = scan_ingestion.get_max_scans()
+        if len(scans) > max_scans:
             return JsonResponse({
                 "success": False,
-                "error": f"Type de pointage '{record_type}' incohérent avec l'état actuel"
+                "error": f"Trop de scans dans le lot (maximum {max_scans})"
             }, status=400)
             
-        # Créer l'enregistrement de pointage
-        timestamp = timezone.now()
-        attendance = AttendanceRecord.objects.create(
-            employee=employee,
-            record_type=record_type,
-            timestamp=timestamp,
-            location=data.get('location'),
-            note=data.get('note')
-        )
+        results = scan_ingestion.ingest_scans(scans, kiosk_id=kiosk_id)
         
-        # Obtenir la représentation du type de pointage
-        record_type_display = dict(AttendanceRecord.RECORD_TYPES).get(record_type, record_type)
-        
-        # Obtenir le nom de l'employé
-        user = employee.user
-        employee_name = f"{user.first_name} {user.last_name}".strip() or user.username
-        
-        # Retourner les informations pour le popup de confirmation
         return JsonResponse({
             "success": True,
-            "record_id": attendance.id,
-            "timestamp": timestamp.strftime('%d/%m/%Y %H:%M:%S'),
-            "record_type": record_type_display,
-            "employee_name": employee_name,
-            "available_actions": get_available_actions(employee)  # Retourne les nouvelles actions disponibles
+            "results": results,
+            "created": sum(1 for result in results if result['status'] == 'created'),
+            "duplicates": sum(1 for result in results if result['status'] == 'duplicate'),
+            "rejected": sum(1 for result in results if result['status'] == 'rejected'),
         })
         
     except json.JSONDecodeError:
@@ -232,65 +230,225 @@ def record_attendance(request):
             "error": f"Erreur serveur: {str(e)}"
         }, status=500)
 
+# --- Outils partagés avec les vues asynchrones (kiosk_async_view.py) ---
+
+RECORD_TYPES = dict(AttendanceRecord.RECORD_TYPES)
+
+
+def error_response(message, status, **extra):
+    """Réponse d'erreur des API du kiosque."""
+    return JsonResponse({
+        "success": False,
+        "error": message,
+        **extra
+    }, status=status)
+
+
+def read_scan_request(request):
+    """
+    Corps JSON d'un scan. Retourne (données, None), ou (None, réponse d'erreur) si
+    aucun identifiant NFC ou QR code n'est fourni. Lève JSONDecodeError.
+    """
+    data = json.loads(request.body)
+    if not isinstance(data, dict) or (not data.get('nfc_id') and not data.get('qr_code')):
+        return None, error_response("Aucun identifiant NFC ou QR code fourni", 400)
+    return data, None
+
+
+def employee_info(badge):
+    """Informations de l'employé renvoyées au kiosque après un scan."""
+    return {
+        "employee_id": badge['employee_id'],
+        "name": badge['name'],
+        "user_id": badge['user_id'],
+        "department": badge['department'],
+        "role": badge['role'],
+    }
+
+
+def requested_record_type(data, available_actions):
+    """Pointage demandé en mode combiné : record_type, ou l'action unique possible avec auto_record."""
+    record_type = data.get('record_type')
+    if not record_type and data.get('auto_record') and len(available_actions) == 1:
+        record_type = available_actions[0]['value']
+    return record_type
+
+
+def punch_fields(data):
+    """Champs facultatifs du pointage transmis par le kiosque."""
+    return {
+        'location': data.get('location'),
+        'note': data.get('note'),
+        'kiosk_id': data.get('kiosk_id'),
+    }
+
+
+def scan_response(badge, data, available_actions):
+    """Réponse d'un scan sans pointage : actions disponibles et jeton du pointage suivant."""
+    return JsonResponse({
+        "success": True,
+        "recorded": False,
+        **employee_info(badge),
+        "available_actions": available_actions,
+        "kiosk_token": kiosk_token.make_kiosk_token(badge['user_id'], data.get('kiosk_id')),
+        "kiosk_token_expires_in": kiosk_token.get_max_age()
+    })
+
+
+def scan_punch_response(badge, attendance, record_type, available_actions):
+    """Réponse d'un scan en mode combiné, après la tentative de pointage."""
+    if attendance is None:
+        return error_response(
+            f"Type de pointage '{record_type}' incohérent avec l'état actuel", 400,
+            available_actions=available_actions
+        )
+    return JsonResponse({
+        "success": True,
+        "recorded": True,
+        **employee_info(badge),
+        **punch_confirmation(attendance, badge['name'])
+    })
+
+
+def request_token(request, data):
+    """Jeton de kiosque de la requête (corps ou en-tête X-Kiosk-Token)."""
+    return data.get('kiosk_token') or request.headers.get('X-Kiosk-Token')
+
+
+def punch_request_error(data):
+    """Vérifie l'identifiant de l'employé et le type de pointage d'une demande de pointage."""
+    if not data.get('employee_id'):
+        return error_response("ID employé non fourni", 400)
+    if data.get('record_type') not in RECORD_TYPES:
+        return error_response("Type de pointage invalide", 400)
+    return None
+
+
+def punch_response(employee, attendance, record_type):
+    """Réponse de record_attendance (l'employé doit avoir été chargé avec son utilisateur)."""
+    if attendance is None:
+        return error_response(f"Type de pointage '{record_type}' incohérent avec l'état actuel", 400)
+    user = employee.user
+    employee_name = f"{user.first_name} {user.last_name}".strip() or user.username
+    return JsonResponse({
+        "success": True,
+        **punch_confirmation(attendance, employee_name)
+    })
+
+
+def token_error_response(error):
+    """Réponse à un jeton de kiosque refusé (exception de utils/kiosk_token.py)."""
+    if isinstance(error, kiosk_token.ExpiredKioskToken):
+        message = "Jeton de kiosque expiré, veuillez scanner à nouveau votre badge"
+    elif isinstance(error, kiosk_token.UsedKioskToken):
+        message = "Jeton de kiosque déjà utilisé, veuillez scanner à nouveau votre badge"
+    else:
+        message = "Jeton de kiosque invalide"
+    return JsonResponse({
+        "success": False,
+        "error": message
+    }, status=401)
+
+
+def read_request_token(token, kiosk_id):
+    """
+    Vérifie un jeton de kiosque (signature, âge, kiosque), sans le consommer.
+    Retourne (clé primaire de l'employé autorisé, None) ou (None, réponse d'erreur).
+    """
+    try:
+        authorized_pk, token_kiosk_id = kiosk_token.read_kiosk_token(token)
+    except kiosk_token.BadKioskToken as e:
+        return None, token_error_response(e)
+    if token_kiosk_id != kiosk_id:
+        return None, JsonResponse({
+            "success": False,
+            "error": "Jeton émis pour un autre kiosque"
+        }, status=403)
+    return authorized_pk, None
+
+
+def record_punch(employee, record_type, location=None, note=None, kiosk_id=None):
+    """
+    Vérifie que le type de pointage est cohérent avec l'état de présence courant
+    et crée l'enregistrement. Retourne le pointage créé, ou None si le type est
+    incohérent avec l'état actuel.
+    La ligne d'état de présence reste verrouillée jusqu'à la fin de la transaction,
+    ce qui évite les doubles pointages concurrents ; elle est mise à jour par le
+    signal post_save du pointage.
+    Accepte une instance Employee ou sa clé primaire.
+    Un pointage enregistré oublie le scan anti-rebond de l'employé sur le kiosque.
+    
+    En mode write-behind (PUNCH_WRITE_BEHIND=True), le pointage est ajouté à la file
+    locale (voir utils/punch_queue.py) et retourné sans être enregistré en base (pk=None).
+    """
+    if punch_queue.is_enabled():
+        attendance = punch_queue.enqueue_punch(
+            employee, record_type, location=location, note=note, kiosk_id=kiosk_id
+        )
+    else:
+        with transaction.atomic():
+            presence = presence_utils.get_presence_state(employee, for_update=True)
+            if not presence_utils.is_valid_transition(presence.state, record_type):
+                return None
+                
+            attendance = AttendanceRecord.objects.create(
+                employee_id=getattr(employee, 'pk', employee),
+                record_type=record_type,
+                timestamp=timezone.now(),
+                location=location,
+                note=note,
+                kiosk_id=kiosk_id
+            )
+            
+    # Le scan précédent de l'employé sur ce kiosque ne doit plus être rejoué
+    if attendance is not None:
+        scan_debounce.forget(getattr(employee, 'pk', employee), kiosk_id)
+    return attendance
+
+
+def punch_confirmation(attendance, employee_name):
+    """Informations affichées par le kiosque dans le popup de confirmation d'un pointage."""
+    return {
+        "record_id": attendance.id,
+        # Pointage en file d'attente (mode write-behind), pas encore enregistré en base
+        "queued": attendance.pk is None,
+        "timestamp": attendance.timestamp.strftime('%d/%m/%Y %H:%M:%S'),
+        "record_type": attendance.get_record_type_display(),
+        "employee_name": employee_name,
+        # Nouvelles actions disponibles, déduites du pointage qui vient d'être créé
+        "available_actions": presence_utils.get_actions_for_state(
+            presence_utils.STATE_BY_RECORD_TYPE[attendance.record_type]
+        )
+    }
 
 def get_available_actions(employee):
     """
     Détermine les actions de pointage disponibles pour un employé 
-    en fonction de son dernier enregistrement.
+    en fonction de son état de présence courant.
+    Accepte une instance Employee ou sa clé primaire ; l'état est lu par
+    clé primaire dans la table PresenceState (en mode write-behind, le dernier
+    pointage encore en file d'attente est prioritaire).
     """
-    # Récupérer le dernier pointage de l'employé
-    last_record = AttendanceRecord.objects.filter(
-        employee=employee
-    ).order_by('-timestamp').first()
-    
-    # Définir les actions disponibles en fonction du dernier état
-    if not last_record or last_record.record_type == 'OUT':
-        # Si pas de pointage ou dernier = sortie, seule l'entrée est possible
-        return [{
-            'value': 'IN',
-            'label': 'Entrée (Clock In)',
-            'description': 'Enregistrer votre arrivée'
-        }]
-    elif last_record.record_type == 'IN':
-        # Si dernier = entrée, on peut sortir ou prendre une pause
-        return [
-            {
-                'value': 'OUT',
-                'label': 'Sortie (Clock Out)',
-                'description': 'Enregistrer votre départ'
-            },
-            {
-                'value': 'BREAK_START',
-                'label': 'Début de Pause',
-                'description': 'Commencer une pause'
-            }
-        ]
-    elif last_record.record_type == 'BREAK_START':
-        # Si dernier = début de pause, seule la fin de pause est possible
-        return [{
-            'value': 'BREAK_END',
-            'label': 'Fin de Pause',
-            'description': 'Terminer votre pause'
-        }]
-    elif last_record.record_type == 'BREAK_END':
-        # Si dernier = fin de pause, on peut sortir ou reprendre une pause
-        return [
-            {
-                'value': 'OUT',
-                'label': 'Sortie (Clock Out)',
-                'description': 'Enregistrer votre départ'
-            },
-            {
-                'value': 'BREAK_START',
-                'label': 'Début de Pause',
-                'description': 'Commencer une nouvelle pause'
-            }
-        ]
-    
-    # Par défaut, autoriser toutes les actions (ne devrait pas arriver)
-    return [
-        {'value': 'IN', 'label': 'Entrée (Clock In)', 'description': 'Enregistrer votre arrivée'},
-        {'value': 'OUT', 'label': 'Sortie (Clock Out)', 'description': 'Enregistrer votre départ'},
-        {'value': 'BREAK_START', 'label': 'Début de Pause', 'description': 'Commencer une pause'},
-        {'value': 'BREAK_END', 'label': 'Fin de Pause', 'description': 'Terminer votre pause'}
-    ]
\ No newline at end of file
+    state = punch_queue.pending_state(employee) if punch_queue.is_enabled() else None
+    if state is None:
+        state = presence_utils.get_presence_state(employee).state
+    return presence_utils.get_actions_for_state(state)
+
+
+@require_GET
+def punch_queue_metrics(request):
+    """
+    Vue de supervision de la file d'attente des pointages (mode write-behind) :
+    profondeur de la file, retard du transfert vers la base principale et erreurs.
+    Réservée au personnel (is_staff).
+    """
+    if not request.user.is_authenticated or not request.user.is_staff:
+        return JsonResponse({
+            "success": False,
+            "error": "Accès réservé au personnel"
+        }, status=403)
+        
+    return JsonResponse({
+        "success": True,
+        **punch_queue.get_metrics()
+    })
@@ -9,10 +9,8 @@ from django.conf import settings
 
 from ..serializers import EmployeeProfileSerializer, LoginSerializer
 from ..models import Employee
-
-import qrcode
-from io import BytesIO
-import base64
+from ..utils import generate_qr_code
+from ..utils import qr_badge
 
 class CustomTokenObtainPairView(TokenObtainPairView):
     """Vue personnalisée pour l'obtention de token JWT"""
@@ -93,31 +91,34 @@ class EmployeeProfileAPIView(APIView):
         
         employee = request.user.employee_profile
         
-        # Génération du QR code en base64
-        qr_image_url = None
-        if employee.qr_code:
-            # Création d'un QR code
-            qr = qrcode.QRCode(
-                version=1,
-                error_correction=qrcode.constants.ERROR_CORRECT_L,
-                box_size=10,
-                border=4,
+        # Format du QR code : ?qr_format=png|svg|matrix ou en-tête Accept
+        try:
+            qr_format = generate_qr_code.negotiate_format(request)
+        except ValueError as e:
+            return Response(
+                {'error': str(e)}, 
+                status=status.HTTP_400_BAD_REQUEST
             )
-            qr.add_data(employee.qr_code)
-            qr.make(fit=True)
-            
-            # Création d'une image à partir du QR code
-            img = qr.make_image(fill_color="black", back_color="white")
-            buffer = BytesIO()
-            img.save(buffer, format="PNG")
-            img_str = base64.b64encode(buffer.getvalue()).decode('utf-8')
-            
-            # URL de l'image au format base64
-            qr_image_url = f"data:image/png;base64,{img_str}"
         
         # Sérialiser les données
         serializer = EmployeeProfileSerializer(employee)
         data = serializer.data
-        data['qr_code_image'] = qr_image_url
+        data['qr_code_format'] = qr_format.lower()
+        data['qr_code_image'] = None
+        data['qr_code_image_url'] = None
+        if qr_format == generate_qr_code.SVG:
+            # Document SVG, dessiné par le client
+            data['qr_code_svg'] = generate_qr_code.qr_svg(employee.qr_code)
+        elif qr_format == generate_qr_code.MATRIX:
+            # Matrice de modules brute, dessinée par le client
+            data['qr_code_matrix'] = generate_qr_code.qr_matrix(employee.qr_code)
+        else:
+            # URL de l'image pré-rendue du QR code (immuable, peut être mise en cache),
+            # None tant que l'image n'est pas rendue (commande render_qr_badges)
+            data['qr_code_image_url'] = qr_badge.badge_url(employee)
+            # Image en base64 seulement si l'image n'est pas encore rendue, ou sur demande
+            # (?qr_inline=1) pour les versions de l'application qui la décodent
+            if request.query_params.get('qr_inline') == '1' or not data['qr_code_image_url']:
+                data['qr_code_image'] = generate_qr_code.qr_data_url(employee.qr_code)
         
         return Response(data, status=status.HTTP_200_OK)
\ No newline at end of file
@@ -175,6 +175,11 @@ class MediaStorage(Storage):
             'Content-Length': str(len(file_data))
         }
         
+        # En-tête Cache-Control servi avec le fichier (ex: images immuables des badges)
+        cache_control = getattr(content, 'cache_control', None)
+        if cache_control:
+            headers['X-Bz-Info-b2-cache-control'] = quote(cache_control)
+        
         # Upload
         response = requests.post(
             upload_data['uploadUrl'],
@@ -6,7 +6,14 @@
 # Collecter les fichiers statiques
 python manage.py collectstatic --noinput
 
+# Signaler un cache non partagé entre les workers (jetons de kiosque à usage unique, invalidations)
+python manage.py check --deploy --tag caches
+
 
 
 # Démarrer Gunicorn
-exec gunicorn --bind 0.0.0.0:8000 config.wsgi:application
\ No newline at end of file
+# SERVER_MODE=asgi : workers uvicorn, requis par les vues asynchrones du kiosque (KIOSK_ASYNC_VIEWS=True)
+if [ "$SERVER_MODE" = "asgi" ]; then
+    exec gunicorn --bind 0.0.0.0:8000 -k uvicorn_worker.UvicornWorker config.asgi:application
+fi
+exec gunicorn --bind 0.0.0.0:8000 config.wsgi:application
@@ -121,7 +121,8 @@ const NFCReader = (function () {
                                 'Content-Type': 'application/json',
                                 'X-CSRFToken': csrfToken,
                             },
-                            body: JSON.stringify({ nfc_id: nfcId }),
+                            // auto_record: si une seule action est possible, le serveur l'enregistre directement
+                            body: JSON.stringify({ nfc_id: nfcId, auto_record: true, kiosk_id: window.kiosk.getKioskId() }),
                         });
                         const data = await response.json();
 
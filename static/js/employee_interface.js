@@ -17,6 +17,7 @@ const state = {
     attendanceHistory: {
         period: 'week',
         filter: 'ALL',
+        cursors: [null],
         data: null
     },
     leaveRequests: {
@@ -28,11 +29,8 @@ const state = {
 
 // ====== INITIALISATION ======
 document.addEventListener('DOMContentLoaded', function() {
-    // Charger les données initiales
-    loadProfileData();
-    loadStatsData();
-    loadAttendanceHistory();
-    loadLeaveRequests();
+    // Charger les données initiales (une seule requête)
+    loadDashboard();
 
     // Configurer les écouteurs d'événements pour la navigation
     setupEventListeners();
@@ -233,6 +231,41 @@ function setupRequestItemListeners() {
 
 // ====== API DATA LOADING ======
 
+// Charger toutes les données du tableau de bord en une seule requête
+// (profil, statistiques, historique de la semaine, demandes en attente)
+function loadDashboard() {
+    fetch('/api/dashboard/')
+        .then(response => {
+            if (!response.ok) {
+                throw new Error('Erreur lors du chargement du tableau de bord');
+            }
+            return response.json();
+        })
+        .then(data => {
+            state.profile = data.profile;
+            updateProfileUI();
+            state.stats = data.stats;
+            updateStatsUI();
+            
+            state.attendanceHistory.cursors = [null, data.history.pagination.next_cursor];
+            data.history.current_page = 1;
+            data.history.total_pages = data.history.pagination.has_more ? 2 : 1;
+            state.attendanceHistory.data = data.history;
+            updateAttendanceHistoryUI();
+            
+            state.leaveRequests.data = data.leaves;
+            updateLeaveRequestsUI();
+        })
+        .catch(error => {
+            console.error('Erreur:', error);
+            // En cas d'échec, chargement section par section
+            loadProfileData();
+            loadStatsData();
+            loadAttendanceHistory();
+            loadLeaveRequests();
+        });
+}
+
 // Charger les données de profil
 function loadProfileData() {
     fetch('/api/profile/')
@@ -273,35 +306,9 @@ function loadStatsData() {
 
 // Charger l'historique des pointages
 function loadAttendanceHistory() {
-    let url = `/api/attendance/history/?period=${state.attendanceHistory.period}`;
-    
-    if (state.attendanceHistory.filter !== 'ALL') {
-        url += `&record_type=${state.attendanceHistory.filter}`;
-    }
-    
-    if (state.attendanceHistory.customStartDate && state.attendanceHistory.customEndDate) {
-        url += `&start_date=${state.attendanceHistory.customStartDate}&end_date=${state.attendanceHistory.customEndDate}`;
-    }
-    
-    fetch(url)
-        .then(response => {
-            if (!response.ok) {
-                throw new Error('Erreur lors du chargement de l\'historique');
-            }
-            return response.json();
-        })
-        .then(data => {
-            if (data.success) {
-                state.attendanceHistory.data = data;
-                updateAttendanceHistoryUI();
-            } else {
-                throw new Error(data.error || 'Erreur inconnue');
-            }
-        })
-        .catch(error => {
-            console.error('Erreur:', error);
-            // Afficher une notification d'erreur
-        });
+    // Nouvelle recherche : les curseurs des pages déjà chargées ne sont plus valables
+    state.attendanceHistory.cursors = [null];
+    loadAttendanceHistoryPage(1);
 }
 
 // Charger les demandes de congé
@@ -819,8 +826,13 @@ function updatePagination(currentPage = 1, totalPages = 1) {
 
 // Charger une page spécifique de l'historique
 function loadAttendanceHistoryPage(page) {
-    // Modifier l'URL pour inclure le numéro de page
-    let url = `/api/attendance/history/?period=${state.attendanceHistory.period}&page=${page}`;
+    // Pagination par curseur : chaque page donne le curseur de la suivante
+    const cursor = state.attendanceHistory.cursors[page - 1];
+    let url = `/api/attendance/history/?period=${state.attendanceHistory.period}`;
+    
+    if (cursor) {
+        url += `&cursor=${encodeURIComponent(cursor)}`;
+    }
     
     if (state.attendanceHistory.filter !== 'ALL') {
         url += `&record_type=${state.attendanceHistory.filter}`;
@@ -840,6 +852,9 @@ function loadAttendanceHistoryPage(page) {
         })
         .then(data => {
             if (data.success) {
+                state.attendanceHistory.cursors[page] = data.pagination.next_cursor;
+                data.current_page = page;
+                data.total_pages = data.pagination.has_more ? page + 1 : page;
                 state.attendanceHistory.data = data;
                 updateAttendanceHistoryUI();
             } else {
@@ -38,6 +38,16 @@ document.addEventListener('DOMContentLoaded', function () {
     // Token CSRF (essentiel pour les requêtes POST vers Django)
     const csrfToken = document.querySelector('input[name="csrfmiddlewaretoken"]').value;
 
+    // Identifiant persistant de ce kiosque (généré au premier lancement)
+    let kioskId = localStorage.getItem('buskoguard_kiosk_id');
+    if (!kioskId) {
+        kioskId = `KIOSK-${Math.random().toString(36).slice(2, 10).toUpperCase()}`;
+        localStorage.setItem('buskoguard_kiosk_id', kioskId);
+    }
+
+    // Jeton signé délivré par le serveur après un scan, requis pour enregistrer le pointage
+    let currentKioskToken = null;
+
     // --- Gestion de l'affichage des écrans ---
     function showScreen(screenName) {
         // Cacher tous les écrans
@@ -97,6 +107,14 @@ document.addEventListener('DOMContentLoaded', function () {
         confirmationModal.classList.add('active');
     }
 
+    // Affiche la confirmation d'un pointage enregistré (réponse de record_attendance
+    // ou de authenticate_card en mode combiné)
+    function showPunchConfirmation(data) {
+        // Parse timestamp: "14/05/2025 23:30:05" -> date and time parts
+        const [respDate, respTime] = data.timestamp.split(' ');
+        showConfirmationMessage(true, `Pointage '${data.record_type}' enregistré !`, data.employee_name, respDate, respTime);
+    }
+
     // --- Logique d'authentification et d'actions ---
 
     // Simule la réception des données de l'employé et des actions disponibles
@@ -105,6 +123,14 @@ document.addEventListener('DOMContentLoaded', function () {
         // employeeData devrait contenir: { name, employee_id, department, role, available_actions }
         // (tel que retourné par votre vue Django `authenticate_card`)
 
+        // Mode combiné : le pointage a déjà été enregistré par le serveur lors du scan
+        if (employeeData.recorded) {
+            showPunchConfirmation(employeeData);
+            showScreen('initial');
+            return;
+        }
+
+        currentKioskToken = employeeData.kiosk_token;
         if (employeeNameDisplay) employeeNameDisplay.textContent = employeeData.name;
         // Vous pouvez ajouter l'affichage de l'ID, département, rôle si nécessaire ici
         // document.getElementById('employee-id-display').textContent = employeeData.employee_id;
@@ -174,6 +200,8 @@ document.addEventListener('DOMContentLoaded', function () {
                 body: JSON.stringify({
                     employee_id: employeeId,
                     record_type: recordType,
+                    kiosk_id: kioskId,
+                    kiosk_token: currentKioskToken,
                     // 'location' et 'note' peuvent être ajoutés ici si nécessaire
                 }),
             });
@@ -181,16 +209,11 @@ document.addEventListener('DOMContentLoaded', function () {
             const data = await response.json();
 
             if (data.success) {
-                // Parse timestamp: "14/05/2025 23:30:05" -> date and time parts
-                const [respDate, respTime] = data.timestamp.split(' ');
-                showConfirmationMessage(true, `Pointage '${data.record_type}' enregistré !`, data.employee_name, respDate, respTime);
-                // Mettre à jour les actions disponibles après un pointage réussi
-                if (data.available_actions) {
-                    updateActionButtons(data.available_actions, employeeId);
-                } else {
-                    // Si pas d'actions, peut-être retourner à l'accueil ou afficher un message
-                    showScreen('initial');
-                }
+                showPunchConfirmation(data);
+                // Le jeton de kiosque ne vaut que pour un pointage : retour à l'accueil,
+                // le pointage suivant demande un nouveau scan
+                currentKioskToken = null;
+                showScreen('initial');
             } else {
                 showConfirmationMessage(false, "Erreur de Pointage", data.error || "Une erreur est survenue.", null, null);
                 // Réactiver le bouton si erreur pour permettre une nouvelle tentative
@@ -302,6 +325,7 @@ document.addEventListener('DOMContentLoaded', function () {
             handleAuthenticationSuccess: handleAuthenticationSuccess,
             showScreen: showScreen,
             getCSRFToken: () => csrfToken,
+            getKioskId: () => kioskId,
             showConfirmationMessage: showConfirmationMessage
             // ... d'autres fonctions si nécessaire
         };
@@ -56,7 +56,8 @@ const QRScanner = (function () {
                         'Content-Type': 'application/json',
                         'X-CSRFToken': csrfToken,
                     },
-                    body: JSON.stringify({ qr_code: decodedText }),
+                    // auto_record: si une seule action est possible, le serveur l'enregistre directement
+                    body: JSON.stringify({ qr_code: decodedText, auto_record: true, kiosk_id: window.kiosk.getKioskId() }),
                 });
 
                 const data = await response.json();